@@ -1,4 +1,6 @@
 #!/usr/bin/env python3
+import os
+
 import aws_cdk as cdk
 from constructs import Construct
 from aws_cdk import (
@@ -16,6 +18,11 @@ from aws_cdk import (
 )
 from aws_cdk import aws_lambda_python_alpha as _lambda_python
 
+from build_bundle import build_bundle
+
+# lambda/ with botocore/boto3 data trimmed to the S3 models, rebuilt on every synth
+LAMBDA_BUNDLE = os.path.relpath(build_bundle())
+
 class SubstackBackupStack(Stack):
     def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
@@ -39,7 +46,7 @@ class SubstackBackupStack(Stack):
         layer = _lambda_python.PythonLayerVersion(
             self,
             "ScraperLayer",
-            entry="lambda",  # Only include lambda directory for dependencies
+            entry=LAMBDA_BUNDLE,  # Only include the lambda bundle for dependencies
             compatible_runtimes=[_lambda.Runtime.PYTHON_3_11],
         )
 
@@ -49,7 +56,7 @@ class SubstackBackupStack(Stack):
             self, "substack-back-up-original",
             runtime=_lambda.Runtime.PYTHON_3_11,
             handler="lambda_function.lambda_handler",
-            code=_lambda.Code.from_asset("lambda"),
+            code=_lambda.Code.from_asset(LAMBDA_BUNDLE),
             timeout=Duration.minutes(15),
             memory_size=1024,  # Increased memory for scraping
             layers=[layer],
@@ -65,7 +72,7 @@ class SubstackBackupStack(Stack):
             self, "withliberty-static-upload",
             runtime=_lambda.Runtime.PYTHON_3_11,
             handler="lambda.static_upload_lambda.lambda_handler",
-            code=_lambda.Code.from_asset(".", exclude=["*.pyc", "__pycache__", "*.git*", "node_modules", "tests", "*.md", "cdk.out", "*.py", "!lambda/*.py", "!static_stie/**"]),
+            code=_lambda.Code.from_asset(".", exclude=["*.pyc", "__pycache__", "*.git*", "node_modules", "tests", "*.md", "cdk.out", "build", "lambda/botocore/data", "lambda/boto3/data", "*.py", "!lambda/*.py", "!static_stie/**"]),
             timeout=Duration.minutes(15),  # Longer timeout for scraping
             memory_size=1024,  # More memory for scraping
             layers=[layer],  # Add the scraping dependencies layer
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Builds the Lambda bundle: a copy of lambda/ whose vendored botocore and boto3 only keep the data for
+the AWS services the handlers call. botocore ships models for hundreds of services, which are most of
+the deployment package; clients, paginators and endpoint resolution only need the service's own
+directory plus the shared endpoint and retry files.
+
+    python build_bundle.py                     # writes build/lambda
+    python build_bundle.py --with-cloudfront   # also keeps the CloudFront models
+
+app.py runs this on every synth, so the functions and the layer are always built from a fresh bundle.
+"""
+import argparse
+import os
+import shutil
+from typing import Callable, Iterable, List, Set, Tuple
+
+ROOT_DIR: str = os.path.dirname(os.path.abspath(__file__))
+LAMBDA_DIR: str = os.path.join(ROOT_DIR, "lambda")
+BUNDLE_DIR: str = os.path.join(ROOT_DIR, "build", "lambda")
+KEEP_SERVICES: Tuple[str, ...] = ("s3",)  # Every AWS service the handlers create a client for
+OPTIONAL_SERVICES: Tuple[str, ...] = ("cloudfront",)
+DROPPED_DATA_FILES: Set[str] = {"examples-1.json"}  # Documentation examples, never read by clients
+VENDORED_PACKAGES: Tuple[str, ...] = ("boto3", "botocore", "s3transfer")  # Trimmed copies ship in the bundle itself
+
+
+def directory_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, file))
+        for root, _, files in os.walk(path)
+        for file in files
+    )
+
+
+def make_ignore(source: str, services: Iterable[str]) -> Callable[[str, List[str]], Set[str]]:
+    """
+    copytree ignore callback that skips bytecode, the data of unused services, all but the newest API
+    version of the services kept, and documentation examples
+    """
+    services = set(services)
+    botocore_data = os.path.join(source, "botocore", "data")
+    boto3_data = os.path.join(source, "boto3", "data")
+
+    def ignore(directory: str, names: List[str]) -> Set[str]:
+        ignored = {name for name in names if name == "__pycache__" or name.endswith(".pyc")}
+        if directory in (botocore_data, boto3_data):
+            ignored.update(
+                name for name in names
+                if os.path.isdir(os.path.join(directory, name)) and name not in services
+            )
+        elif os.path.dirname(directory) == botocore_data:
+            versions = sorted(name for name in names if os.path.isdir(os.path.join(directory, name)))
+            ignored.update(versions[:-1])
+        elif os.path.dirname(os.path.dirname(directory)) == botocore_data:
+            ignored.update(name for name in names if name in DROPPED_DATA_FILES)
+        return ignored
+
+    return ignore
+
+
+def write_layer_requirements(source: str, dest: str) -> None:
+    """
+    Copies requirements.txt without boto3/botocore/s3transfer: the bundle already vendors trimmed copies,
+    so the layer should not install the full ones again
+    """
+    with open(os.path.join(source, "requirements.txt"), "r", encoding="utf-8") as file:
+        lines = file.read().splitlines()
+    kept = [line for line in lines if line.split("==")[0].strip().lower() not in VENDORED_PACKAGES]
+    with open(os.path.join(dest, "requirements.txt"), "w", encoding="utf-8") as file:
+        file.write("\n".join(kept) + "\n")
+
+
+def build_bundle(source: str = LAMBDA_DIR, dest: str = BUNDLE_DIR, services: Iterable[str] = KEEP_SERVICES) -> str:
+    """
+    Copies source to dest, replacing any previous bundle, with botocore and boto3 data trimmed to services
+    """
+    services = tuple(services)
+    if os.path.exists(dest):
+        shutil.rmtree(dest)
+    shutil.copytree(source, dest, ignore=make_ignore(source, services))
+    write_layer_requirements(source, dest)
+
+    before = directory_size(os.path.join(source, "botocore", "data")) + directory_size(os.path.join(source, "boto3", "data"))
+    after = directory_size(os.path.join(dest, "botocore", "data")) + directory_size(os.path.join(dest, "boto3", "data"))
+    print(
+        f"📦 Built {dest} for {', '.join(services)}: AWS data {before / (1024 * 1024):.1f} MB -> "
+        f"{after / (1024 * 1024):.1f} MB, bundle {directory_size(dest) / (1024 * 1024):.1f} MB"
+    )
+    return dest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Lambda bundle with trimmed botocore data.")
+    parser.add_argument("-o", "--output", type=str, default=BUNDLE_DIR, help="Bundle directory to (re)create.")
+    parser.add_argument(
+        "--with-cloudfront", action="store_true", help="Also keep the CloudFront models, e.g. for cache invalidations."
+    )
+    args = parser.parse_args()
+    services = KEEP_SERVICES + (OPTIONAL_SERVICES if args.with_cloudfront else ())
+    build_bundle(dest=args.output, services=services)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import hashlib
+import mimetypes
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from bs4 import Tag
+
+from sinks import LocalSink, OutputSink
+
+ASSET_PREFIX: str = "assets/media/"  # Where mirrored assets live, relative to the posts linking to them
+ASSET_MAX_WORKERS: int = int(os.getenv("ASSET_MAX_WORKERS", "8"))  # Concurrent asset downloads
+ASSET_MAX_BYTES: int = int(os.getenv("ASSET_MAX_BYTES", str(20 * 1024 * 1024)))  # Larger assets keep their remote URL
+ASSET_BUDGET_BYTES: int = int(os.getenv("ASSET_BUDGET_BYTES", str(500 * 1024 * 1024)))  # Total downloaded per run
+ASSET_BUDGET_SECONDS: float = float(os.getenv("ASSET_BUDGET_SECONDS", "300"))  # No new downloads start after this
+ASSET_CHUNK_SIZE: int = 64 * 1024
+ASSET_CONTENT_TYPES: Tuple[str, ...] = ("image/", "video/", "audio/")
+ASSET_ELEMENTS: Tuple[str, ...] = ("img", "video", "audio", "source")  # Elements whose src is mirrored
+
+
+class AssetSkipped(Exception):
+    """
+    Raised when an asset is not mirrored, e.g. because it is too large or the run's budget is spent
+    """
+    pass
+
+
+def asset_extension(url: str, content_type: Optional[str]) -> str:
+    """
+    File extension for an asset, from its Content-Type or else its URL
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    extension = mimetypes.guess_extension(media_type) if media_type else None
+    if extension is None:
+        extension = os.path.splitext(urlparse(url).path)[1].lower()
+    return {".jpe": ".jpg", ".jpeg": ".jpg"}.get(extension, extension) or ".bin"
+
+
+def extract_asset_urls(content: Optional[Tag]) -> List[str]:
+    """
+    Remote image and media URLs referenced by a post body, in document order without duplicates
+    """
+    if content is None:
+        return []
+    urls = []
+    for element in content.find_all(ASSET_ELEMENTS):
+        src = element.get("src")
+        if src and urlparse(src).scheme in ("http", "https") and src not in urls:
+            urls.append(src)
+    return urls
+
+
+def rewrite_asset_links(content: Optional[Tag], links: Dict[str, str]) -> int:
+    """
+    Points mirrored elements at their local copies and returns how many were rewritten. srcset is
+    dropped, since it lists remote variants, and an image link around a mirrored image opens the
+    local copy instead of the full-size remote one.
+    """
+    if content is None or not links:
+        return 0
+    rewritten = 0
+    for element in content.find_all(ASSET_ELEMENTS):
+        link = links.get(element.get("src"))
+        if link is None:
+            continue
+        element["src"] = link
+        element.attrs.pop("srcset", None)
+        rewritten += 1
+        anchor = element.find_parent("a")
+        if anchor is not None and anchor.get("href") and any(parent is content for parent in anchor.parents):
+            anchor["href"] = link
+    return rewritten
+
+
+def asset_upload_args(local_path: str) -> Dict[str, str]:
+    """
+    S3 upload settings for a mirrored asset. Its name is its content hash, so it can be cached forever.
+    """
+    return {
+        "ContentType": mimetypes.guess_type(local_path)[0] or "application/octet-stream",
+        "CacheControl": "public, max-age=31536000, immutable",
+    }
+
+
+class AssetMirror:
+    """
+    Downloads the images and media posts link to and stores each distinct file once in each of
+    save_dirs through the output sink, named by the SHA-256 of its content (assets/media/<sha256>.<ext>).
+    Downloads run on a small thread pool shared by all posts; a URL is only downloaded once per run, and the per-asset size limit, the byte budget
+    and the time budget keep mirroring within the Lambda timeout. Assets that are not mirrored keep
+    their remote URL.
+    """
+    def __init__(
+        self,
+        fetch: Callable[..., requests.Response],
+        save_dirs: Iterable[str],
+        max_workers: int = ASSET_MAX_WORKERS,
+        max_asset_bytes: int = ASSET_MAX_BYTES,
+        budget_bytes: int = ASSET_BUDGET_BYTES,
+        budget_seconds: float = ASSET_BUDGET_SECONDS,
+        sink: Optional[OutputSink] = None,
+    ):
+        self.fetch = fetch
+        self.save_dirs: List[str] = list(save_dirs)
+        self.sink: OutputSink = sink if sink is not None else LocalSink()
+        self.max_workers: int = max(1, max_workers)
+        self.max_asset_bytes: int = max_asset_bytes
+        self.budget_bytes: int = budget_bytes
+        self.deadline: float = time.monotonic() + budget_seconds
+        self.stats: Dict[str, int] = {"downloaded": 0, "deduplicated": 0, "skipped": 0, "failed": 0, "bytes": 0}
+        self._lock = threading.Lock()
+        self._futures: Dict[str, "Future[str]"] = {}
+        self._stored: Dict[str, str] = {}  # Content SHA-256 -> file name
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def mirror(self, urls: Iterable[str]) -> Dict[str, str]:
+        """
+        Mirrors the given URLs and returns the local link of each one that was mirrored
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="assets")
+            futures = {}
+            for url in urls:
+                if url not in self._futures:
+                    self._futures[url] = self._executor.submit(self.download, url)
+                futures[url] = self._futures[url]
+        links = {}
+        for url, future in futures.items():
+            try:
+                links[url] = future.result()
+            except AssetSkipped:
+                pass
+            except Exception as e:
+                print(f"❌ Error mirroring asset {url}: {e}")
+        return links
+
+    def download(self, url: str) -> str:
+        """
+        Downloads one asset and returns its link, relative to the post. Runs on the asset pool.
+        """
+        try:
+            return self.store(*self.read(url))
+        except AssetSkipped:
+            self.count("skipped")
+            raise
+        except Exception:
+            self.count("failed")
+            raise
+
+    def reserve(self, size: int) -> None:
+        with self._lock:
+            if self.stats["bytes"] + size > self.budget_bytes:
+                raise AssetSkipped("asset download budget spent")
+            self.stats["bytes"] += size
+
+    def count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def read(self, url: str) -> Tuple[bytes, str]:
+        """
+        Streams one asset within the size limit and the run's budgets, returning its content and extension
+        """
+        if time.monotonic() > self.deadline:
+            raise AssetSkipped("asset time budget spent")
+        response = self.fetch(url, stream=True)
+        try:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            if not content_type.lower().startswith(ASSET_CONTENT_TYPES):
+                raise AssetSkipped(f"unexpected content type {content_type!r}")
+            if int(response.headers.get("Content-Length") or 0) > self.max_asset_bytes:
+                raise AssetSkipped("over the size limit")
+
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=ASSET_CHUNK_SIZE):
+                size += len(chunk)
+                if size > self.max_asset_bytes:
+                    raise AssetSkipped("over the size limit")
+                self.reserve(len(chunk))
+                chunks.append(chunk)
+        finally:
+            response.close()
+        return b"".join(chunks), asset_extension(url, content_type)
+
+    def store(self, content: bytes, extension: str) -> str:
+        """
+        Writes content unless an identical file was already stored, and returns its link
+        """
+        sha256 = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            name = self._stored.get(sha256)
+            duplicate = name is not None
+            if not duplicate:
+                name = self._stored[sha256] = f"{sha256}{extension}"
+            self.stats["deduplicated" if duplicate else "downloaded"] += 1
+        if not duplicate:
+            for save_dir in self.save_dirs:
+                self.sink.write(os.path.join(save_dir, name), content, asset_upload_args(name), immutable=True)
+        return ASSET_PREFIX + name
+
+    def close(self) -> None:
+        """
+        Waits for running downloads and prints what was mirrored
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        stats = self.stats
+        if any(stats[key] for key in ("downloaded", "deduplicated", "skipped", "failed")):
+            print(
+                f"🖼️ Mirrored {stats['downloaded']} assets ({stats['bytes'] / (1024 * 1024):.1f} MB), "
+                f"{stats['deduplicated']} duplicates, {stats['skipped']} skipped, {stats['failed']} failed"
+            )
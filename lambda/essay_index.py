@@ -0,0 +1,315 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from s3_utils import read_json_object
+
+ESSAYS_DATA_KEY = 'essays-data.json'
+FILE_LIST_KEY = 'file-list.json'
+# Concurrent S3 GETs during a full rebuild; the S3 client's max_pool_connections should match
+REBUILD_MAX_WORKERS = int(os.environ.get('INDEX_REBUILD_WORKERS', '16'))
+# extract_metadata_from_content never looks past this many lines
+METADATA_MAX_LINES = 30
+# First ranged GET for a file's header; widened (doubled) only when the header turns out longer
+METADATA_HEAD_BYTES = 8192
+METADATA_READ_CHUNK = 1024
+
+
+def extract_metadata_from_content(content, filename):
+    """Extract metadata from markdown content using improved logic"""
+    lines = content.split('\n')
+    title = ''
+    subtitle = ''
+    date = ''
+    like_count = '0'
+    
+    # Extract title from first line (usually starts with #)
+    for i in range(min(10, len(lines))):
+        line = lines[i].strip()
+        if line.startswith('# '):
+            title = line[2:].strip()
+            break
+        elif line.startswith('## '):
+            title = line[3:].strip()
+            break
+    
+    # If no title found, use filename
+    if not title:
+        title = filename.replace('.md', '').replace('-', ' ').replace('_', ' ')
+        title = ' '.join(word.capitalize() for word in title.split())
+    
+    # Try to extract subtitle from second heading
+    for i in range(min(20, len(lines))):
+        line = lines[i].strip()
+        if line.startswith('### ') and not subtitle:
+            subtitle = line[4:].strip()
+            break
+    
+    # Try to extract date from file content (look for date patterns)
+    # First look for the **Date** format used in these files
+    for i in range(min(30, len(lines))):
+        line = lines[i].strip()
+        if line.startswith('**') and '**' in line and re.search(r'\d{4}', line):
+            # Extract date from **May 10, 2025** format
+            date_match = re.search(r'\*\*(.*?)\*\*', line)
+            if date_match:
+                date = date_match.group(1).strip()
+                break
+    
+    # If no date found in ** format, try other patterns
+    if not date:
+        date_patterns = [
+            r'(\w{3}\s+\d{1,2},\s+\d{4})',
+            r'(\d{1,2}/\d{1,2}/\d{4})',
+            r'(\d{4}-\d{2}-\d{2})'
+        ]
+        
+        for i in range(min(30, len(lines))):
+            line = lines[i]
+            for pattern in date_patterns:
+                match = re.search(pattern, line)
+                if match:
+                    date = match.group(1)
+                    break
+            if date:
+                break
+    
+    # Look for like count
+    for i in range(min(30, len(lines))):
+        line = lines[i]
+        like_match = re.search(r'\*\*Likes:\*\*\s*(\d+)', line)
+        if like_match:
+            like_count = like_match.group(1)
+            break
+    
+    # If no date found, use default
+    if not date:
+        date = 'Date not found'
+    
+    return {
+        'title': title,
+        'subtitle': subtitle,
+        'like_count': like_count,
+        'date': date
+    }
+
+def essay_sort_key(essay):
+    """Sort key for essays by date, with undated essays last when sorting newest first"""
+    try:
+        if essay['date'] == 'Date not found':
+            return datetime.min
+        return datetime.strptime(essay['date'], '%b %d, %Y')
+    except:
+        return datetime.min
+
+def is_test_article(title, filename):
+    """Test articles are kept out of the published index"""
+    return 'test' in title.lower() or 'test' in filename.lower()
+
+def fallback_metadata(md_key, include_html_link=True):
+    """Basic index entry for a file whose content could not be read"""
+    filename = os.path.basename(md_key)
+    entry = {
+        'title': filename.replace('.md', '').replace('-', ' ').title(),
+        'subtitle': '',
+        'like_count': '0',
+        'date': 'Date not found',
+        'file_link': md_key
+    }
+    if include_html_link:
+        entry['html_link'] = md_key.replace('.md', '.html')
+    return entry
+
+def rebuild_requested(event):
+    """A full index rebuild is requested with {"rebuild_index": true} in the event or REBUILD_INDEX=true"""
+    if isinstance(event, dict) and event.get('rebuild_index'):
+        return True
+    return os.environ.get('REBUILD_INDEX', 'false').lower() == 'true'
+
+def index_only_requested(event):
+    """Scraping is skipped and only the index updated with {"index_only": true} in the event or INDEX_ONLY=true"""
+    if isinstance(event, dict) and event.get('index_only'):
+        return True
+    return os.environ.get('INDEX_ONLY', 'false').lower() == 'true'
+
+def load_index(s3_client, bucket_name):
+    """Load the current essays-data.json, or return None if it is missing or not in the expected shape"""
+    essays = read_json_object(s3_client, bucket_name, ESSAYS_DATA_KEY)
+    if not isinstance(essays, list) or not all(isinstance(e, dict) and 'title' in e and 'file_link' in e for e in essays):
+        print(f"⚠️ {ESSAYS_DATA_KEY} is missing or corrupt")
+        return None
+    return essays
+
+def index_entry_from_scrape(essay, include_html_link=True):
+    """
+    Convert an entry of start_scraping's essays_data to the index format.
+    Articles are uploaded at the top level of the bucket, so links are just the filenames.
+    """
+    entry = {
+        'title': essay['title'],
+        'subtitle': essay['subtitle'],
+        'like_count': essay['like_count'],
+        'date': essay['date'],
+        'file_link': os.path.basename(essay['file_link'])
+    }
+    if include_html_link:
+        entry['html_link'] = os.path.basename(essay['html_link'])
+    return entry
+
+def merge_index(existing_essays, new_essays):
+    """
+    Merge newly scraped essays into the existing index.
+    A new entry replaces an existing one with the same file, and is skipped if another file already has its title.
+    """
+    new_links = {essay['file_link'] for essay in new_essays}
+    essays_data = [essay for essay in existing_essays if essay['file_link'] not in new_links]
+    titles = {essay['title'].lower().strip() for essay in essays_data}
+    
+    for essay in new_essays:
+        title_lower = essay['title'].lower().strip()
+        if title_lower in titles:
+            print(f"⏭️ Skipping duplicate title: {essay['title']} (from {essay['file_link']})")
+            continue
+        if is_test_article(title_lower, essay['file_link']):
+            print(f"⏭️ Skipping test article: {essay['title']} (from {essay['file_link']})")
+            continue
+        titles.add(title_lower)
+        essays_data.append(essay)
+        print(f"✅ Added: {essay['file_link']} - {essay['title']} ({essay['date']})")
+    
+    essays_data.sort(key=essay_sort_key, reverse=True)
+    return essays_data
+
+def header_is_complete(lines):
+    """
+    True once these first lines of a file determine everything extract_metadata_from_content
+    looks for, so reading further cannot change its result
+    """
+    if len(lines) >= METADATA_MAX_LINES:
+        return True
+    stripped = [line.strip() for line in lines]
+    has_title = len(lines) >= 10 or any(line.startswith(('# ', '## ')) for line in stripped)
+    has_subtitle = len(lines) >= 20 or any(line.startswith('### ') for line in stripped)
+    has_date = any(
+        line.startswith('**') and re.search(r'\d{4}', line) and re.search(r'\*\*(.*?)\*\*', line)
+        for line in stripped
+    )
+    has_likes = any(re.search(r'\*\*Likes:\*\*\s*(\d+)', line) for line in lines)
+    return has_title and has_subtitle and has_date and has_likes
+
+def read_markdown_head(s3_client, bucket_name, md_key, head_bytes=METADATA_HEAD_BYTES):
+    """
+    Read only the start of an .md file, enough for extract_metadata_from_content.
+    Uses ranged GETs and stops reading each body as soon as the header is resolved;
+    the next range (twice as large) is only requested if the header is longer than that.
+    """
+    from botocore.exceptions import ClientError
+
+    data = b''
+    start = 0
+    size = None
+    while True:
+        end = start + head_bytes - 1
+        try:
+            response = s3_client.get_object(Bucket=bucket_name, Key=md_key, Range=f'bytes={start}-{end}')
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'InvalidRange':  # Empty object
+                return data.decode('utf-8', errors='replace')
+            raise
+        content_range = response.get('ContentRange', '')
+        if '/' in content_range:
+            size = int(content_range.rsplit('/', 1)[1])
+        
+        body = response['Body']
+        try:
+            while True:
+                chunk = body.read(METADATA_READ_CHUNK)
+                if not chunk:
+                    break
+                data += chunk
+                # Only complete lines count; the last one may continue in the next chunk
+                lines = data.decode('utf-8', errors='replace').split('\n')[:-1]
+                if header_is_complete(lines):
+                    return '\n'.join(lines[:METADATA_MAX_LINES])
+        finally:
+            body.close()
+        
+        if size is None or len(data) >= size:
+            return data.decode('utf-8', errors='replace')
+        start = len(data)
+        head_bytes *= 2
+
+def read_metadata(s3_client, bucket_name, md_key):
+    """Download the header of one .md file and extract its metadata"""
+    content = read_markdown_head(s3_client, bucket_name, md_key)
+    return extract_metadata_from_content(content, os.path.basename(md_key))
+
+def read_all_metadata(s3_client, bucket_name, md_keys, max_workers=REBUILD_MAX_WORKERS):
+    """
+    Read metadata for many .md files concurrently.
+    Returns (md_key, metadata, error) tuples in the order of md_keys, whatever order the GETs finish in.
+    A failed GET only affects its own tuple.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [executor.submit(read_metadata, s3_client, bucket_name, md_key) for md_key in md_keys]
+        results = []
+        for md_key, future in zip(md_keys, futures):
+            try:
+                results.append((md_key, future.result(), None))
+            except Exception as e:
+                results.append((md_key, None, e))
+        return results
+
+def rebuild_index(s3_client, bucket_name, md_keys, include_html_link=True, skip_test_articles=True,
+                  max_workers=REBUILD_MAX_WORKERS):
+    """Build the essay index from scratch by reading every .md file"""
+    essays_data = []
+    unique_keys = []
+    processed_files = set()  # Track processed files to avoid duplicates
+    processed_titles = set()  # Track processed titles to avoid content duplicates
+    
+    for md_file in md_keys:
+        # Skip if we've already processed this file
+        if md_file in processed_files:
+            print(f"⏭️ Skipping duplicate file: {md_file}")
+            continue
+        processed_files.add(md_file)
+        unique_keys.append(md_file)
+    
+    # Download in parallel, then merge in listing order so the result does not depend on timing
+    for md_file, metadata, error in read_all_metadata(s3_client, bucket_name, unique_keys, max_workers):
+        filename = os.path.basename(md_file)
+        if error is None:
+            # Check for duplicate title (case-insensitive)
+            title_lower = metadata['title'].lower().strip()
+            if title_lower in processed_titles:
+                print(f"⏭️ Skipping duplicate title: {metadata['title']} (from {filename})")
+                continue
+            
+            # Filter out test articles
+            if skip_test_articles and is_test_article(title_lower, filename):
+                print(f"⏭️ Skipping test article: {metadata['title']} (from {filename})")
+                continue
+            
+            processed_titles.add(title_lower)
+            
+            # Add file links
+            metadata['file_link'] = md_file
+            if include_html_link:
+                metadata['html_link'] = md_file.replace('.md', '.html')
+            
+            essays_data.append(metadata)
+            print(f"✅ Processed: {filename} - {metadata['title']} ({metadata['date']})")
+        else:
+            print(f"❌ Error processing {md_file}: {str(error)}")
+            # Add a basic entry even if processing fails, but skip test articles
+            entry = fallback_metadata(md_file, include_html_link)
+            if skip_test_articles and is_test_article(entry['title'], filename):
+                print(f"⏭️ Skipping test article (error case): {filename}")
+                continue
+            essays_data.append(entry)
+    
+    # Sort essays by date (newest first)
+    essays_data.sort(key=essay_sort_key, reverse=True)
+    return essays_data
@@ -0,0 +1,222 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; without it pages are stored gzip-compressed
+    zstandard = None
+
+INDEX_NAME: str = "index.json"  # Maps each URL to its cached fetches
+COMPRESSION: str = os.getenv("PAGE_CACHE_COMPRESSION", "zstd" if zstandard else "gzip")  # "zstd" or "gzip"
+SUFFIXES: Dict[str, str] = {"gzip": ".html.gz", "zstd": ".html.zst"}
+
+
+def compress(content: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(content)
+    return gzip.compress(content, compresslevel=6)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Page was cached with zstd, but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class PageCache(ABC):
+    """
+    Content-addressed store of raw post pages. Each page body is compressed and stored once under
+    its SHA-256 (pages/<sha256>.html.gz); index.json records every fetch of a URL with its fetch time
+    and hash, so the scraper can be re-run on the cached pages without any network requests. It also
+    maps each mirrored asset URL to its local link, so a re-run links to the copies instead of the CDN.
+    """
+    VERSION: int = 1
+
+    def __init__(self, codec: str = COMPRESSION):
+        if codec not in SUFFIXES:
+            raise ValueError(f"Unknown page cache compression {codec!r}, expected gzip or zstd")
+        if codec == "zstd" and zstandard is None:
+            print("⚠️ zstandard is not installed, caching pages with gzip")
+            codec = "gzip"
+        self.codec: str = codec
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._assets: Dict[str, str] = {}  # Remote asset URL -> assets/media/<sha256>.<ext>
+        self.changed: bool = False
+
+    @abstractmethod
+    def read(self, name: str) -> Optional[bytes]:
+        """
+        Returns the stored object called name, or None if it does not exist
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def write(self, name: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def _load(self) -> None:
+        """
+        Reads index.json the first time it is needed. Call with the lock held.
+        """
+        if self._index is not None:
+            return
+        data = self.read(INDEX_NAME)
+        parsed = json.loads(data) if data else {}
+        valid = isinstance(parsed, dict) and parsed.get("version") == self.VERSION
+        self._index = parsed["pages"] if valid else {}
+        assets = parsed.get("assets") if valid else None
+        self._assets = assets if isinstance(assets, dict) else {}
+
+    @property
+    def index(self) -> Dict[str, List[Dict[str, Any]]]:
+        with self._lock:
+            self._load()
+            return self._index
+
+    @property
+    def assets(self) -> Dict[str, str]:
+        """
+        Every recorded asset URL with its local link
+        """
+        with self._lock:
+            self._load()
+            return dict(self._assets)
+
+    def record_assets(self, links: Dict[str, str]) -> None:
+        """
+        Records the local links of mirrored assets, keyed by their remote URL
+        """
+        with self._lock:
+            self._load()
+            for url, link in links.items():
+                if self._assets.get(url) != link:
+                    self._assets[url] = link
+                    self.changed = True
+
+    def asset_links(self, urls: Iterable[str]) -> Dict[str, str]:
+        """
+        The recorded local links of those of urls that were mirrored before
+        """
+        with self._lock:
+            self._load()
+            return {url: self._assets[url] for url in urls if url in self._assets}
+
+    def put(self, url: str, content: bytes, fetched_at: Optional[str] = None) -> str:
+        """
+        Stores a fetched page and returns its SHA-256. A body identical to the URL's latest cached
+        fetch is not stored or recorded again.
+        """
+        sha256 = hashlib.sha256(content).hexdigest()
+        index = self.index
+        with self._lock:
+            fetches = index.setdefault(url, [])
+            if fetches and fetches[-1]["sha256"] == sha256:
+                return sha256
+            known = any(f["sha256"] == sha256 for entries in index.values() for f in entries)
+        if not known:
+            self.write(f"pages/{sha256}{SUFFIXES[self.codec]}", compress(content, self.codec))
+        with self._lock:
+            fetches.append({
+                "fetched_at": fetched_at or datetime.now(timezone.utc).isoformat(),
+                "sha256": sha256,
+                "codec": self.codec,
+                "size": len(content),
+            })
+            self.changed = True
+        return sha256
+
+    def get(self, url: str) -> Optional[bytes]:
+        """
+        Returns the most recently cached body of url, or None if it was never cached
+        """
+        fetches = self.index.get(url)
+        if not fetches:
+            return None
+        latest = fetches[-1]
+        data = self.read(f"pages/{latest['sha256']}{SUFFIXES[latest['codec']]}")
+        return decompress(data, latest["codec"]) if data is not None else None
+
+    def urls(self) -> List[str]:
+        """
+        Cached URLs, most recently fetched first
+        """
+        index = self.index
+        return sorted(index, key=lambda url: index[url][-1]["fetched_at"], reverse=True)
+
+    def flush(self) -> None:
+        """
+        Writes the index if pages or assets were added since it was loaded
+        """
+        if not self.changed:
+            return
+        with self._lock:
+            data = json.dumps(
+                {"version": self.VERSION, "pages": self._index, "assets": self._assets}, indent=2
+            ).encode("utf-8")
+            self.changed = False
+        self.write(INDEX_NAME, data)
+
+
+class LocalPageCache(PageCache):
+    """
+    Page cache in a local directory
+    """
+    def __init__(self, directory: str, codec: str = COMPRESSION):
+        super().__init__(codec)
+        self.directory: str = directory
+
+    def read(self, name: str) -> Optional[bytes]:
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as file:
+            return file.read()
+
+    def write(self, name: str, data: bytes) -> None:
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(data)
+
+
+class S3PageCache(PageCache):
+    """
+    Page cache under a prefix of an S3 bucket
+    """
+    def __init__(self, s3_client: Any, bucket_name: str, prefix: str = "page-cache/", codec: str = COMPRESSION):
+        super().__init__(codec)
+        self.s3_client = s3_client
+        self.bucket_name: str = bucket_name
+        self.prefix: str = prefix if not prefix or prefix.endswith("/") else prefix + "/"
+
+    def read(self, name: str) -> Optional[bytes]:
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=self.prefix + name)
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read()
+
+    def write(self, name: str, data: bytes) -> None:
+        self.s3_client.put_object(Bucket=self.bucket_name, Key=self.prefix + name, Body=data)
+
+
+def open_page_cache(location: str) -> PageCache:
+    """
+    Opens a page cache from a local directory path or an s3://bucket/prefix URL
+    """
+    if location.startswith("s3://"):
+        from s3_utils import create_s3_client
+
+        parsed = urlparse(location)
+        return S3PageCache(create_s3_client(), parsed.netloc, parsed.path.lstrip("/"))
+    return LocalPageCache(location)
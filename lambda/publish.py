@@ -0,0 +1,132 @@
+import gzip
+import mimetypes
+import os
+import re
+import threading
+
+# Content-Encoding stored with compressible files: gzip, br (needs the brotli package) or none.
+# S3 keeps one body per key, so every client gets this encoding; gzip is the one all of them accept
+PUBLISH_ENCODING = os.environ.get('PUBLISH_ENCODING', 'gzip').lower()
+# Cache-Control for fingerprinted files, whose key changes whenever their content does
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Cache-Control for everything else: browsers and CloudFront check back after a minute and get a 304 if unchanged
+REVALIDATE_CACHE_CONTROL = os.environ.get('PUBLISH_CACHE_CONTROL', 'public, max-age=60, must-revalidate')
+# Content types worth compressing; images and media are compressed already
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+# Stored as-is whatever their type: markdown headers are read back with ranged GETs, which need plain bytes
+UNCOMPRESSED_SUFFIXES = ('.md',)
+# Below this a body fits in a packet or two anyway
+MIN_COMPRESS_BYTES = 512
+# Content-addressed keys: mirrored media are named by their SHA-256
+IMMUTABLE_PREFIXES = ('assets/media/',)
+# Static asset types that may carry a build hash in their name, e.g. style.3f9a2c1b.css. Articles never
+# count: post slugs can end in a date like weekly-notes-20240115, and re-scraping rewrites them in place
+FINGERPRINTED_EXTENSIONS = ('.css', '.js', '.mjs', '.woff', '.woff2', '.ttf', '.otf', '.eot')
+FINGERPRINT_PATTERN = re.compile(r'[.-][0-9a-f]{8,}$')
+
+
+def is_fingerprinted(key):
+    """Whether a key names one version of its content for good, so it can be cached forever"""
+    if key.startswith(IMMUTABLE_PREFIXES):
+        return True
+    stem, extension = os.path.splitext(os.path.basename(key))
+    return extension.lower() in FINGERPRINTED_EXTENSIONS and bool(FINGERPRINT_PATTERN.search(stem))
+
+
+def cache_control(key):
+    """Cache-Control for a key: immutable when fingerprinted, short and revalidating otherwise"""
+    return IMMUTABLE_CACHE_CONTROL if is_fingerprinted(key) else REVALIDATE_CACHE_CONTROL
+
+
+def resolve_encoding(encoding):
+    """The encoding actually used: br falls back to gzip when brotli is not installed, none disables compression"""
+    if encoding in ('', 'none', 'identity'):
+        return None
+    if encoding == 'br':
+        try:
+            import brotli  # noqa: F401
+        except ImportError:
+            print("ℹ️ brotli is not installed, precompressing with gzip instead")
+            return 'gzip'
+        return 'br'
+    if encoding != 'gzip':
+        raise ValueError(f"Unknown PUBLISH_ENCODING {encoding!r}, expected gzip, br or none")
+    return 'gzip'
+
+
+def compress(body, encoding):
+    """Compress body at the highest level; output is deterministic, so unchanged files keep their hash"""
+    if encoding == 'br':
+        import brotli
+        return brotli.compress(body, quality=11)
+    return gzip.compress(body, compresslevel=9, mtime=0)
+
+
+def decode_body(body, content_encoding):
+    """Undo a stored Content-Encoding; S3 returns precompressed objects as stored"""
+    if content_encoding == 'gzip':
+        return gzip.decompress(body)
+    if content_encoding == 'br':
+        import brotli
+        return brotli.decompress(body)
+    return body
+
+
+class Publisher:
+    """
+    Sets the headers browsers and CloudFront need on every published object: ContentType, Cache-Control
+    and, for text files, a precompressed body with its Content-Encoding. Keeps totals for a bytes-saved report.
+    """
+
+    def __init__(self, encoding=PUBLISH_ENCODING):
+        self.encoding = resolve_encoding(encoding)
+        self.files = 0
+        self.compressed = 0
+        self.original_bytes = 0
+        self.published_bytes = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, key, body, extra_args=None):
+        """Return (body, extra_args) to upload for key; headers already in extra_args are kept"""
+        extra_args = dict(extra_args or {})
+        if 'ContentType' not in extra_args:
+            extra_args['ContentType'] = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+        extra_args.setdefault('CacheControl', cache_control(key))
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        published = body
+        if (
+            self.encoding
+            and 'ContentEncoding' not in extra_args
+            and len(body) >= MIN_COMPRESS_BYTES
+            and extra_args['ContentType'].startswith(COMPRESSIBLE_TYPES)
+            and not key.endswith(UNCOMPRESSED_SUFFIXES)
+        ):
+            compressed = compress(body, self.encoding)
+            if len(compressed) < len(body):
+                published = compressed
+                extra_args['ContentEncoding'] = self.encoding
+
+        with self._lock:
+            self.files += 1
+            self.compressed += published is not body
+            self.original_bytes += len(body)
+            self.published_bytes += len(published)
+        return published, extra_args
+
+    def put_object(self, s3_client, bucket_name, key, body, content_type):
+        """Upload one object with publishing headers"""
+        body, extra_args = self.prepare(key, body, {'ContentType': content_type})
+        return s3_client.put_object(Bucket=bucket_name, Key=key, Body=body, **extra_args)
+
+    def report(self):
+        """Print how much precompression saved, and return the saved bytes"""
+        saved = self.original_bytes - self.published_bytes
+        percent = 100 * saved / self.original_bytes if self.original_bytes else 0
+        print(
+            f"🗜️ Precompressed {self.compressed} of {self.files} published files with {self.encoding or 'no encoding'}: "
+            f"{self.original_bytes / 1024:.1f} KB -> {self.published_bytes / 1024:.1f} KB, "
+            f"saved {saved / 1024:.1f} KB ({percent:.0f}%)"
+        )
+        return saved
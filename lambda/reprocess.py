@@ -0,0 +1,303 @@
+"""
+Rebuilds the scraper's outputs offline, e.g. after a change to the converters or the HTML template.
+Posts are converted in a process pool (conversion is CPU-bound), and only outputs whose input or
+CONVERTER_VERSION changed since the last run are rewritten.
+
+    python lambda/reprocess.py --cache page-cache -d substack_md_files --html-directory substack_html_pages
+    python lambda/reprocess.py --markdown substack_md_files --html-directory substack_html_pages
+"""
+import argparse
+import hashlib
+import json
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from page_cache import PageCache, open_page_cache
+from scrape import (
+    BASE_HTML_DIR,
+    BASE_MD_DIR,
+    BASE_SUBSTACK_URL,
+    CONVERTER_VERSION,
+    HTML_PARSER,
+    HTML_RENDER_MODE,
+    SELECTOR_PROFILE_PATH,
+    BaseSubstackScraper,
+    SelectorProfile,
+    parse_post_page,
+)
+
+STATE_FILE: str = "reprocess-state.json"  # Input hash and converter version of every output written
+
+_converter: Optional["OfflineConverter"] = None  # One per worker process, created by init_worker
+
+
+class OfflineConverter(BaseSubstackScraper):
+    """
+    Scraper used only for its conversion methods: it discovers no posts and makes no requests. Assets
+    in assets (remote URL -> local link, from the page cache) keep the links an earlier run mirrored.
+    """
+    def __init__(self, *args: Any, assets: Optional[Dict[str, str]] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.assets: Dict[str, str] = assets or {}
+
+    def known_asset_links(self, urls: List[str]) -> Dict[str, str]:
+        return {url: self.assets[url] for url in urls if url in self.assets}
+
+    def iter_discovered_urls(self) -> Iterator[str]:
+        return iter([])
+
+    def get_url_soup(self, url: str) -> None:
+        raise NotImplementedError("OfflineConverter does not fetch posts")
+
+    def convert_page(self, url: str, content: bytes) -> Dict[str, Any]:
+        """
+        Converts a raw post page the way process_post does, without the fetch and bookkeeping
+        """
+        soup = parse_post_page(content, self.parser, self.selectors)
+        if self.selectors.select_one("paywall", soup):
+            return {"status": "premium"}
+        title, subtitle, like_count, date, _, body = self.extract_post_fields(soup)
+        md_filename = self.get_filename_from_url(url, filetype=".md")
+        if 'test' in title.lower() or 'test' in md_filename.lower():
+            return {"status": "test"}
+        self.link_assets(body)
+        md, html = self.render_post(title, subtitle, like_count, date, body)
+        return {"status": "ok", "md": md, "html": html}
+
+
+def create_converter(
+    base_substack_url: str, md_save_dir: str, html_save_dir: str, parser: str, html_render: str,
+    selectors: Dict[str, Any], assets: Optional[Dict[str, str]] = None,
+) -> OfflineConverter:
+    return OfflineConverter(
+        base_substack_url, md_save_dir, html_save_dir, max_workers=1, requests_per_second=0,
+        parser=parser, html_render=html_render, selectors=SelectorProfile.from_dict(selectors), mirror_assets=False,
+        assets=assets,
+    )
+
+
+def init_worker(*args: Any) -> None:
+    global _converter
+    _converter = create_converter(*args)
+
+
+def convert_page(url: str, content: bytes) -> Dict[str, Any]:
+    return _converter.convert_page(url, content)
+
+
+def convert_markdown(md: str) -> Dict[str, Any]:
+    return {"status": "ok", "html": _converter.md_to_html(md)}
+
+
+def read_text(filepath: str) -> str:
+    with open(filepath, "r", encoding="utf-8") as file:
+        return file.read()
+
+
+def load_state(filepath: str) -> Dict[str, Dict[str, Any]]:
+    if not os.path.exists(filepath):
+        return {}
+    with open(filepath, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_state(filepath: str, state: Dict[str, Dict[str, Any]]) -> None:
+    with open(filepath, "w", encoding="utf-8") as file:
+        json.dump(state, file, indent=2, sort_keys=True)
+
+
+def iter_results(
+    executor: ProcessPoolExecutor, fn: Callable[..., Dict[str, Any]], jobs: Iterable[Tuple[Any, Tuple[Any, ...]]],
+    window: int,
+) -> Iterator[Tuple[Any, "Future[Dict[str, Any]]"]]:
+    """
+    Submits (key, args) jobs with at most window in flight, so inputs are only loaded as workers
+    free up, and yields (key, future) in submission order
+    """
+    job_iter = iter(jobs)
+    pending = deque((key, executor.submit(fn, *args)) for key, args in islice(job_iter, window))
+    while pending:
+        key, future = pending.popleft()
+        for next_key, args in islice(job_iter, 1):
+            pending.append((next_key, executor.submit(fn, *args)))
+        yield key, future
+
+
+class Reprocessor:
+    """
+    Works out which outputs are stale and rewrites them from cached pages or existing markdown
+    """
+    def __init__(
+        self,
+        base_substack_url: str,
+        md_save_dir: str,
+        html_save_dir: str,
+        max_workers: Optional[int] = None,
+        parser: str = HTML_PARSER,
+        html_render: str = HTML_RENDER_MODE,
+        selectors: Optional[SelectorProfile] = None,
+        state_file: str = STATE_FILE,
+        force: bool = False,
+    ):
+        selectors = selectors if selectors is not None else SelectorProfile.load(SELECTOR_PROFILE_PATH)
+        self.converter_args = (base_substack_url, md_save_dir, html_save_dir, parser, html_render, selectors.to_dict())
+        self.converter: OfflineConverter = create_converter(*self.converter_args)
+        self.html_root: str = html_save_dir
+        self.max_workers: int = max_workers or os.cpu_count() or 1
+        self.version: str = f"{CONVERTER_VERSION}/{self.converter.html_render}"
+        self.state_file: str = state_file
+        self.state: Dict[str, Dict[str, Any]] = {} if force else load_state(state_file)
+        self.stats: Dict[str, int] = {"converted": 0, "skipped": 0, "unchanged": 0, "failed": 0}
+        self.assets: Dict[str, str] = {}  # Mirrored asset links, passed to each worker once
+
+    def is_current(self, key: str, input_sha256: str, outputs: List[str]) -> bool:
+        entry = self.state.get(key)
+        return (
+            entry is not None
+            and entry.get("input_sha256") == input_sha256
+            and entry.get("converter_version") == self.version
+            and (entry.get("status") != "ok" or all(os.path.exists(path) for path in outputs))
+        )
+
+    def run(
+        self, fn: Callable[..., Dict[str, Any]],
+        jobs: List[Tuple[str, str, List[str], Callable[[], Tuple[Any, ...]]]],
+        write: Callable[[List[str], Dict[str, Any]], None],
+    ) -> Dict[str, int]:
+        """
+        jobs are (key, input_sha256, output paths, load_args) tuples. Stale jobs are converted by fn in
+        the process pool and their results passed to write.
+        """
+        stale = []
+        for key, input_sha256, outputs, load_args in jobs:
+            if self.is_current(key, input_sha256, outputs):
+                self.stats["unchanged"] += 1
+            else:
+                stale.append((key, input_sha256, outputs, load_args))
+        print(f"🔁 {len(stale)} of {len(jobs)} outputs are stale")
+        if not stale:
+            return self.stats
+
+        details = {key: (input_sha256, outputs) for key, input_sha256, outputs, _ in stale}
+        with ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=init_worker, initargs=(*self.converter_args, self.assets)
+        ) as executor:
+            work = ((key, load_args()) for key, _, _, load_args in stale)
+            for key, future in iter_results(executor, fn, work, self.max_workers * 2):
+                input_sha256, outputs = details[key]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"❌ Error reprocessing {key}: {e}")
+                    self.stats["failed"] += 1
+                    continue
+                if result["status"] == "ok":
+                    write(outputs, result)
+                    self.stats["converted"] += 1
+                else:
+                    self.stats["skipped"] += 1
+                self.state[key] = {
+                    "input_sha256": input_sha256, "converter_version": self.version, "status": result["status"],
+                }
+        save_state(self.state_file, self.state)
+        return self.stats
+
+    def write_post(self, outputs: List[str], result: Dict[str, Any]) -> None:
+        md_filepath, html_filepath = outputs
+        with open(md_filepath, "w", encoding="utf-8") as file:
+            file.write(result["md"])
+        self.converter.save_to_html_file(html_filepath, result["html"])
+
+    def write_html(self, outputs: List[str], result: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(outputs[0]), exist_ok=True)
+        self.converter.save_to_html_file(outputs[0], result["html"])
+
+    def from_cache(self, page_cache: PageCache) -> Dict[str, int]:
+        """
+        Rebuilds markdown and HTML from the latest cached page of every post
+        """
+        self.assets = page_cache.assets
+        jobs = []
+        for url in self.converter.filter_urls(page_cache.urls(), self.converter.keywords):
+            md_filepath = os.path.join(self.converter.md_save_dir, self.converter.get_filename_from_url(url, ".md"))
+            html_filepath = os.path.join(self.converter.html_save_dir, self.converter.get_filename_from_url(url, ".html"))
+            jobs.append((
+                url,
+                page_cache.index[url][-1]["sha256"],  # Known without reading the page
+                [md_filepath, html_filepath],
+                lambda url=url: (url, page_cache.get(url)),
+            ))
+        return self.run(convert_page, jobs, self.write_post)
+
+    def from_markdown(self, markdown_dir: str) -> Dict[str, int]:
+        """
+        Rebuilds the HTML of every .md file under markdown_dir, keeping its relative path
+        """
+        jobs = []
+        for root, _, files in os.walk(markdown_dir):
+            for file in sorted(files):
+                if not file.endswith(".md"):
+                    continue
+                md_filepath = os.path.join(root, file)
+                with open(md_filepath, "rb") as f:
+                    input_sha256 = hashlib.sha256(f.read()).hexdigest()
+                relative = os.path.relpath(md_filepath, markdown_dir)
+                html_filepath = os.path.join(self.html_root, os.path.splitext(relative)[0] + ".html")
+                jobs.append((
+                    relative,
+                    input_sha256,
+                    [html_filepath],
+                    lambda path=md_filepath: (read_text(path),),
+                ))
+        return self.run(convert_markdown, jobs, self.write_html)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rebuild scraped posts offline from cached pages or markdown.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--cache", type=str, help="Directory or s3://bucket/prefix URL of a raw page cache.")
+    source.add_argument("--markdown", type=str, help="Directory of existing .md files to rebuild HTML from.")
+    parser.add_argument(
+        "-u", "--url", type=str, help="Base URL of the Substack site, used to name the output directories. "
+        "Defaults to the site of the first cached page, or the hardcoded site in scrape.py."
+    )
+    parser.add_argument("-d", "--directory", type=str, default=BASE_MD_DIR, help="The directory to save markdown in.")
+    parser.add_argument("--html-directory", type=str, default=BASE_HTML_DIR, help="The directory to save HTML in.")
+    parser.add_argument("-w", "--workers", type=int, help="Worker processes (default: CPU count).")
+    parser.add_argument("--parser", default=HTML_PARSER, help="BeautifulSoup builder, as for scrape.py.")
+    parser.add_argument("--html-render", choices=["markdown", "direct"], default=HTML_RENDER_MODE)
+    parser.add_argument("--selectors", type=str, default=SELECTOR_PROFILE_PATH, help="JSON selector profile.")
+    parser.add_argument("--state", type=str, default=STATE_FILE, help="State file recording what was written.")
+    parser.add_argument("--force", action="store_true", help="Rewrite every output, ignoring the state file.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    page_cache = open_page_cache(args.cache) if args.cache else None
+    base_url = args.url
+    if base_url is None and page_cache is not None and page_cache.urls():
+        first = page_cache.urls()[0]
+        base_url = first.split("/p/")[0]
+    if base_url is None:
+        base_url = BASE_SUBSTACK_URL
+
+    reprocessor = Reprocessor(
+        base_url, args.directory, args.html_directory, args.workers, args.parser, args.html_render,
+        SelectorProfile.load(args.selectors), args.state, args.force,
+    )
+    if page_cache is not None:
+        stats = reprocessor.from_cache(page_cache)
+    else:
+        stats = reprocessor.from_markdown(args.markdown)
+    print(
+        f"✅ Rewrote {stats['converted']} posts, {stats['unchanged']} already current, "
+        f"{stats['skipped']} premium/test, {stats['failed']} failed"
+    )
+
+
+if __name__ == "__main__":
+    main()
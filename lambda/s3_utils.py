@@ -0,0 +1,263 @@
+import hashlib
+import io
+import json
+import os
+
+from publish import decode_body
+
+# boto3, botocore and s3transfer are imported inside the functions that use them, so importing a
+# handler stays cheap and they are loaded once, when the first client is created
+
+MB = 1024 * 1024
+# Concurrent requests for uploads; the S3 client's max_pool_connections should be at least this
+UPLOAD_MAX_CONCURRENCY = int(os.environ.get('UPLOAD_MAX_CONCURRENCY', '16'))
+# delete_objects accepts at most this many keys per request
+DELETE_BATCH_SIZE = 1000
+
+# Clients created by get_s3_client, kept at module level so warm invocations reuse them
+_s3_clients = {}
+
+
+def create_s3_client(max_pool_connections=10):
+    """Create an S3 client whose connection pool allows max_pool_connections concurrent requests"""
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client('s3', config=Config(max_pool_connections=max_pool_connections))
+
+
+def get_s3_client(max_pool_connections=10):
+    """Return the S3 client for this pool size, creating it on first use; warm Lambda invocations reuse it"""
+    client = _s3_clients.get(max_pool_connections)
+    if client is None:
+        client = _s3_clients[max_pool_connections] = create_s3_client(max_pool_connections)
+    return client
+
+
+def read_json_object(s3_client, bucket_name, key, default=None):
+    """Download and decode a JSON object, returning default if it is missing or unreadable"""
+    try:
+        response = s3_client.get_object(Bucket=bucket_name, Key=key)
+        body = decode_body(response['Body'].read(), response.get('ContentEncoding'))
+        return json.loads(body.decode('utf-8'))
+    except s3_client.exceptions.NoSuchKey:
+        print(f"ℹ️ {key} not found in {bucket_name}")
+    except Exception as e:
+        print(f"❌ Error reading {key}: {str(e)}")
+    return default
+
+
+def write_json_object(s3_client, bucket_name, key, data, indent=2):
+    """Encode data as JSON and upload it"""
+    s3_client.put_object(
+        Bucket=bucket_name,
+        Key=key,
+        Body=json.dumps(data, indent=indent),
+        ContentType='application/json'
+    )
+
+
+def create_transfer_config(max_concurrency=UPLOAD_MAX_CONCURRENCY):
+    """Transfer settings for many small files: high request concurrency, multipart only for large files"""
+    from s3transfer.manager import TransferConfig
+
+    return TransferConfig(
+        multipart_threshold=16 * MB,
+        multipart_chunksize=8 * MB,
+        max_request_concurrency=max_concurrency,
+        max_submission_concurrency=max(1, max_concurrency // 2),
+    )
+
+
+def upload_files(s3_client, bucket_name, uploads, max_concurrency=UPLOAD_MAX_CONCURRENCY):
+    """
+    Upload many files through one shared TransferManager.
+    uploads is a list of (source, s3_key, extra_args) tuples, where source is a local path, bytes or a file
+    object; all of them are submitted up front and run concurrently. Returns (uploaded_keys, failed) where failed maps s3_key to the error.
+    """
+    from s3transfer.manager import TransferManager
+
+    uploaded_keys = []
+    failed = {}
+    if not uploads:
+        return uploaded_keys, failed
+    
+    with TransferManager(s3_client, create_transfer_config(max_concurrency)) as manager:
+        futures = [
+            (s3_key, manager.upload(
+                io.BytesIO(source) if isinstance(source, bytes) else source, bucket_name, s3_key, extra_args=extra_args
+            ))
+            for source, s3_key, extra_args in uploads
+        ]
+        for s3_key, future in futures:
+            try:
+                future.result()
+                uploaded_keys.append(s3_key)
+                print(f"✅ Uploaded {s3_key}")
+            except Exception as e:
+                failed[s3_key] = str(e)
+    
+    print(f"📤 Upload summary: {len(uploaded_keys)} uploaded, {len(failed)} failed")
+    for s3_key, error in failed.items():
+        print(f"❌ Error uploading {s3_key}: {error}")
+    return uploaded_keys, failed
+
+
+class BucketIndex:
+    """
+    In-memory index of a bucket built from one paginated list_objects_v2 pass.
+    Maps each key to its Size, ETag and LastModified. Later stages look keys up here instead of listing
+    the bucket again, and record their own uploads and deletions so the index stays current for the run.
+    """
+    
+    def __init__(self, objects=None, common_prefixes=None, page_count=0):
+        self.objects = objects or {}
+        self.common_prefixes = common_prefixes or []
+        self.page_count = page_count
+    
+    @classmethod
+    def build(cls, s3_client, bucket_name, prefix='', delimiter=None):
+        """List the bucket once. With a delimiter, keys below it are summarised in common_prefixes."""
+        params = {'Bucket': bucket_name, 'Prefix': prefix}
+        if delimiter:
+            params['Delimiter'] = delimiter
+        index = cls()
+        paginator = s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(**params):
+            index.page_count += 1
+            for obj in page.get('Contents', []):
+                index.objects[obj['Key']] = {
+                    'Size': obj.get('Size'),
+                    'ETag': obj.get('ETag'),
+                    'LastModified': obj.get('LastModified'),
+                }
+            index.common_prefixes.extend(p['Prefix'] for p in page.get('CommonPrefixes', []))
+        return index
+    
+    def __contains__(self, key):
+        return key in self.objects
+    
+    def __len__(self):
+        return len(self.objects)
+    
+    def get(self, key):
+        return self.objects.get(key)
+    
+    def keys(self, suffix=''):
+        """Sorted keys, optionally only those ending in suffix"""
+        return sorted(key for key in self.objects if key.endswith(suffix))
+    
+    def add(self, key, size=None, etag=None):
+        """Record an object this run uploaded"""
+        self.objects[key] = {'Size': size, 'ETag': etag, 'LastModified': None}
+    
+    def remove(self, key):
+        """Record an object this run deleted"""
+        self.objects.pop(key, None)
+    
+    def counts(self):
+        """Object counts for logging"""
+        return {
+            'objects': len(self.objects),
+            'md_files': len(self.keys('.md')),
+            'pages': self.page_count,
+        }
+
+
+def file_digests(local_path):
+    """MD5 (comparable with a single-part upload's ETag) and SHA-256 of a file or bytes, in one read"""
+    md5 = hashlib.md5()
+    sha256 = hashlib.sha256()
+    if isinstance(local_path, bytes):
+        md5.update(local_path)
+        sha256.update(local_path)
+        return md5.hexdigest(), sha256.hexdigest()
+    with open(local_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            md5.update(chunk)
+            sha256.update(chunk)
+    return md5.hexdigest(), sha256.hexdigest()
+
+
+def plan_sync(uploads, remote_objects, previous_manifest):
+    """
+    Decide which files need uploading. Sources are local paths or the bytes to upload.
+    A file is unchanged when its key exists in the bucket and either the sync manifest recorded the same
+    SHA-256 and upload arguments, or (for keys the manifest does not know) the remote ETag is the file's MD5.
+    Returns (changed_uploads, unchanged_keys, manifest_entries) with manifest entries for every local file.
+    """
+    changed = []
+    unchanged = []
+    entries = {}
+    for local_path, s3_key, extra_args in uploads:
+        md5, sha256 = file_digests(local_path)
+        entries[s3_key] = {'sha256': sha256, 'extra_args': extra_args or {}}
+        remote = remote_objects.get(s3_key)
+        previous = previous_manifest.get(s3_key)
+        if remote is not None:
+            if previous is not None:
+                if previous == entries[s3_key]:
+                    unchanged.append(s3_key)
+                    continue
+            elif remote.get('ETag', '').strip('"') == md5:
+                unchanged.append(s3_key)
+                continue
+        changed.append((local_path, s3_key, extra_args))
+    return changed, unchanged, entries
+
+
+def delete_keys(s3_client, bucket_name, keys):
+    """Delete keys in batches, returning the keys that were deleted"""
+    deleted = []
+    for start in range(0, len(keys), DELETE_BATCH_SIZE):
+        batch = keys[start:start + DELETE_BATCH_SIZE]
+        response = s3_client.delete_objects(
+            Bucket=bucket_name,
+            Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': False}
+        )
+        deleted.extend(obj['Key'] for obj in response.get('Deleted', []))
+        for error in response.get('Errors', []):
+            print(f"❌ Error deleting {error.get('Key')}: {error.get('Message')}")
+    return deleted
+
+
+def sync_files(s3_client, bucket_name, uploads, manifest_key, bucket_index=None, delete_stale=False):
+    """
+    Upload only new or changed files, tracked by a manifest object of key -> SHA-256 and upload arguments.
+    With delete_stale, keys recorded in the previous manifest that no longer exist locally are deleted;
+    objects the manifest never tracked (such as articles) are never touched.
+    bucket_index is updated with the uploads and deletions; without one, the bucket is listed here.
+    Returns a summary dict with uploaded, unchanged, deleted and failed keys.
+    """
+    if bucket_index is None:
+        bucket_index = BucketIndex.build(s3_client, bucket_name)
+    remote_objects = bucket_index.objects
+    previous_manifest = read_json_object(s3_client, bucket_name, manifest_key, default={})
+    if not isinstance(previous_manifest, dict):
+        previous_manifest = {}
+    
+    changed, unchanged, entries = plan_sync(uploads, remote_objects, previous_manifest)
+    print(f"🔍 {len(changed)} changed or new files, {len(unchanged)} unchanged")
+    uploaded, failed = upload_files(s3_client, bucket_name, changed)
+    for key in uploaded:
+        bucket_index.add(key)
+    
+    deleted = []
+    stale = sorted(key for key in previous_manifest if key not in entries and key in remote_objects)
+    if stale and delete_stale:
+        deleted = delete_keys(s3_client, bucket_name, stale)
+        for key in deleted:
+            bucket_index.remove(key)
+        print(f"🗑️ Deleted {len(deleted)} stale files")
+    elif stale:
+        print(f"ℹ️ {len(stale)} stale files left in place: {', '.join(stale)}")
+    
+    # Failed uploads are left out so the next run tries them again
+    new_manifest = {key: entry for key, entry in entries.items() if key not in failed}
+    for key in stale:
+        if key not in deleted:
+            new_manifest[key] = previous_manifest[key]
+    if new_manifest != previous_manifest:
+        write_json_object(s3_client, bucket_name, manifest_key, new_manifest)
+    
+    return {'uploaded': uploaded, 'unchanged': unchanged, 'deleted': deleted, 'failed': failed}
@@ -1,22 +1,79 @@
 import argparse
+import copy
+import hashlib
 import json
 import os
+import re
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import List, Optional, Tuple
+from collections import deque
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from email.utils import parsedate_to_datetime
+from html import escape
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+from bs4.builder import builder_registry
 import html2text
 import markdown
 import requests
+import soupsieve
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
+from urllib3.util.retry import Retry
 from xml.etree import ElementTree as ET
 
 from urllib.parse import urlparse
 
+from assets import ASSET_PREFIX, AssetMirror, extract_asset_urls, rewrite_asset_links
+from page_cache import PageCache, open_page_cache
+from sinks import LocalSink, OutputSink
+
 BASE_SUBSTACK_URL: str = os.getenv("SUBSTACK_URL", "https://heathermedwards.substack.com/")  # Substack you want to convert to markdown
 BASE_MD_DIR: str = "substack_md_files"  # Name of the directory we'll save the .md essay files
 BASE_HTML_DIR: str = "substack_html_pages"  # Name of the directory we'll save the .html essay files
 NUM_POSTS_TO_SCRAPE: int = 3  # Set to 0 if you want all posts
+MAX_WORKERS: int = int(os.getenv("SCRAPE_MAX_WORKERS", "8"))  # Number of posts fetched concurrently
+CONVERT_WORKERS: int = int(os.getenv("SCRAPE_CONVERT_WORKERS", "2"))  # Posts rendered concurrently; CPU bound, so few
+REQUESTS_PER_SECOND: float = float(os.getenv("SCRAPE_REQUESTS_PER_SECOND", "4"))  # Per-host request limit, 0 disables it
+REQUEST_TIMEOUT: Tuple[float, float] = (
+    float(os.getenv("SCRAPE_CONNECT_TIMEOUT", "5")),
+    float(os.getenv("SCRAPE_READ_TIMEOUT", "30")),
+)  # (connect, read) timeout in seconds for every request
+MAX_RETRIES: int = int(os.getenv("SCRAPE_MAX_RETRIES", "4"))  # Retries for connection errors, 429 and 5xx responses
+RETRY_STATUS_CODES: Tuple[int, ...] = (429, 500, 502, 503, 504)
+USER_AGENT: str = "with-liberty-backup (+https://github.com/antonioortegajr/with-liberty-backup)"
+
+MANIFEST_KEY: str = "scrape-manifest.json"  # Name of the scrape manifest object/file
+DISCOVERY_MODE: str = os.getenv("SCRAPE_DISCOVERY", "feed")  # "feed" (22 most recent posts) or "archive" (full history)
+ARCHIVE_PAGE_SIZE: int = 50  # Posts requested per archive API page
+ARCHIVE_PREFETCH_PAGES: int = 3  # Archive pages fetched concurrently ahead of the one being read
+ARCHIVE_MAX_PAGES: int = 200  # Upper bound on archive pages per run
+HTML_PARSER: str = os.getenv("SCRAPE_HTML_PARSER", "auto")  # BeautifulSoup builder for post pages, "auto" picks the fastest installed
+PARSER_PREFERENCE: Tuple[str, ...] = ("lxml", "html.parser")  # Fastest first; html5lib is slower than html.parser, so never auto-selected
+KNOWN_PARSERS: Tuple[str, ...] = ("lxml", "html5lib", "html.parser")
+SELECTOR_PROFILE_PATH: Optional[str] = os.getenv("SCRAPE_SELECTOR_PROFILE")  # JSON file overriding DEFAULT_SELECTORS
+PAGE_CACHE_LOCATION: Optional[str] = os.getenv("SCRAPE_PAGE_CACHE")  # Directory or s3://bucket/prefix for raw pages
+HTML_RENDER_MODE: str = os.getenv("SCRAPE_HTML_RENDER", "markdown")  # "markdown" (HTML -> markdown -> HTML) or "direct" (sanitized post HTML)
+PUBLICATION_TIMEZONE: str = os.getenv("SUBSTACK_TIMEZONE", "America/New_York")  # Day boundary for dates rebuilt from timestamps
+MIRROR_ASSETS: bool = os.getenv("SCRAPE_MIRROR_ASSETS", "false").lower() == "true"  # Download post images and media
+SITEMAP_NAMESPACE: str = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+FEED_CHUNK_SIZE: int = 16 * 1024  # Bytes of feed.xml/sitemap.xml handed to the XML parser at a time
+POST_DATE_CLASS: str = (
+    "pencraft pc-reset color-pub-secondary-text-hGQ02T line-height-20-t4M0El font-meta-MWBumP size-11-NuY2Zx "
+    "weight-medium-fw81nC transform-uppercase-yKDgcq reset-IxiVJZ meta-EgzBVA"
+)  # Class of the div holding a post's publication date
+
+MARKDOWN_EXTENSIONS: List[str] = ['extra']
+CONVERTER_VERSION: int = 2  # Bump when the markdown or HTML output changes, so reprocess.py rewrites existing files
+
+_shared_sessions: Dict[int, requests.Session] = {}
+_shared_sessions_lock = threading.Lock()
+_converters = threading.local()  # Per-thread Markdown instances, reused across posts
 
 
 def extract_main_part(url: str) -> str:
@@ -25,8 +82,486 @@ def extract_main_part(url: str) -> str:
     # present
 
 
+def resolve_parser(name: str = HTML_PARSER) -> str:
+    """
+    Maps a parser option to an installed BeautifulSoup builder. "auto" picks the first installed
+    builder in PARSER_PREFERENCE. A known builder that is not installed (e.g. lxml missing from the
+    Lambda layer) falls back to "auto" with a warning instead of failing the run.
+    """
+    if name != "auto" and name not in KNOWN_PARSERS:
+        raise ValueError(f"Unknown HTML parser {name!r}, expected one of: auto, {', '.join(KNOWN_PARSERS)}")
+    if name != "auto":
+        if builder_registry.lookup(name) is not None:
+            return name
+        print(f"⚠️ HTML parser {name!r} is not installed, falling back to the fastest available")
+    for candidate in PARSER_PREFERENCE:
+        if builder_registry.lookup(candidate) is not None:
+            return candidate
+    return "html.parser"
+
+
+def get_markdown_converter() -> markdown.Markdown:
+    """
+    Returns this thread's Markdown instance, reset between documents. Building one loads and
+    registers every extension in MARKDOWN_EXTENSIONS, which costs more than converting a short post.
+    """
+    converter = getattr(_converters, "markdown", None)
+    if converter is None:
+        converter = _converters.markdown = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    return converter.reset()
+
+
+def is_post_part(name: str, attrs: Dict[str, Any]) -> bool:
+    """
+    Decides while parsing whether a tag starts a subtree extract_post_data reads: the structured data
+    in the head, the title, subtitle, date, like button, post body and paywall marker. Everything else on the page (navigation, footer,
+    comments, inline scripts) is skipped without building tree nodes for it.
+    """
+    classes = attrs.get("class") or ""
+    if not isinstance(classes, str):
+        classes = " ".join(classes)
+    class_list = classes.split()
+    if name == "h1":
+        return "post-title" in class_list
+    if name == "h2":
+        return True  # Video posts demote the title to an h2; paywalled posts have h2.paywall-title
+    if name == "h3":
+        return "subtitle" in class_list
+    if name == "a":
+        return "post-ufi-button" in class_list
+    if name == "div":
+        return "available-content" in class_list or " ".join(class_list) == POST_DATE_CLASS
+    if name == "meta":
+        return attrs.get("property") in META_PROPERTIES
+    if name == "script":
+        return attrs.get("type") == "application/ld+json"
+    return False
+
+
+POST_PARTS = SoupStrainer(is_post_part)
+META_PROPERTIES = frozenset({"og:title", "article:published_time"})
+DEFAULT_SELECTORS: Dict[str, str] = {
+    "title": "h1.post-title, h2",  # When a video is present, the title is demoted to h2
+    "subtitle": "h3.subtitle",
+    "date": f'div[class="{POST_DATE_CLASS}"]',
+    "like_count": "a.post-ufi-button .label",
+    "content": "div.available-content",
+    "paywall": "h2.paywall-title",
+    "ld_json": 'script[type="application/ld+json"]',
+    "title_meta": 'meta[property="og:title"]',
+    "published_meta": 'meta[property="article:published_time"]',
+}
+
+
+class SelectorProfile:
+    """
+    The CSS selectors used to extract a post, compiled once with soupsieve so the per-post path does no
+    selector parsing or cache lookups. A profile can be loaded from a JSON file, so a Substack markup
+    change only needs a new file:
+
+        {"version": 1, "selectors": {"date": "div.post-date"}, "partial_parse": false}
+
+    Selectors missing from the file keep their DEFAULT_SELECTORS value. partial_parse enables the
+    SoupStrainer in parse_post_page, which only keeps the tags the default selectors need, so it is off
+    for loaded profiles unless the file turns it on.
+    """
+    VERSION: int = 1
+
+    def __init__(self, selectors: Optional[Dict[str, str]] = None, partial_parse: bool = False):
+        unknown = set(selectors or {}) - set(DEFAULT_SELECTORS)
+        if unknown:
+            raise ValueError(f"Unknown selectors in profile: {', '.join(sorted(unknown))}")
+        self.selectors: Dict[str, str] = {**DEFAULT_SELECTORS, **(selectors or {})}
+        self.partial_parse: bool = partial_parse
+        self.compiled: Dict[str, soupsieve.SoupSieve] = {}
+        for name, pattern in self.selectors.items():
+            try:
+                self.compiled[name] = soupsieve.compile(pattern)
+            except soupsieve.SelectorSyntaxError as e:
+                raise ValueError(f"Invalid {name} selector {pattern!r}: {e}") from e
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SelectorProfile":
+        if not isinstance(data, dict) or data.get("version") != cls.VERSION or not isinstance(data.get("selectors"), dict):
+            raise ValueError(f"Selector profile must be a version {cls.VERSION} object with a selectors map")
+        return cls(data["selectors"], bool(data.get("partial_parse", False)))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"version": self.VERSION, "selectors": dict(self.selectors), "partial_parse": self.partial_parse}
+
+    @classmethod
+    def load(cls, filepath: Optional[str]) -> "SelectorProfile":
+        """
+        Loads a profile from a JSON file, or returns the default profile if no path is given
+        """
+        if not filepath:
+            return DEFAULT_SELECTOR_PROFILE
+        with open(filepath, "r", encoding="utf-8") as file:
+            return cls.from_dict(json.load(file))
+
+    def select_one(self, name: str, tag: Tag) -> Optional[Tag]:
+        return self.compiled[name].select_one(tag)
+
+    def select(self, name: str, tag: Tag) -> List[Tag]:
+        return self.compiled[name].select(tag)
+
+
+DEFAULT_SELECTOR_PROFILE = SelectorProfile(partial_parse=True)
+
+
+def extract_structured_metadata(soup: BeautifulSoup, selectors: SelectorProfile = DEFAULT_SELECTOR_PROFILE) -> Dict[str, str]:
+    """
+    Reads post metadata from the page's structured data rather than its markup: ld+json (headline,
+    datePublished), then the og:title / article:published_time meta tags. Returns only the keys found,
+    out of title and published. Only the page's head is searched when it has one, so a full parse does
+    not scan the whole body.
+    """
+    found: Dict[str, str] = {}
+    scope = soup.head or soup  # Partially parsed pages keep no head, just the few tags read here
+
+    def keep(key: str, value: Any) -> None:
+        if key not in found and value is not None and str(value).strip():
+            found[key] = str(value).strip()
+
+    for script in selectors.select("ld_json", scope):
+        try:
+            data = json.loads(script.string or "")
+        except ValueError:
+            continue
+        for item in data if isinstance(data, list) else [data]:
+            if isinstance(item, dict):
+                keep("title", item.get("headline"))
+                keep("published", item.get("datePublished"))
+
+    for name, key in (("title_meta", "title"), ("published_meta", "published")):
+        meta = selectors.select_one(name, scope)
+        if meta is not None:
+            keep(key, meta.get("content"))
+    return found
+
+
+def publication_timezone(name: str = PUBLICATION_TIMEZONE) -> Any:
+    """
+    The timezone dates are shown in, or UTC if name is unknown or there is no timezone database
+    """
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def display_date(published: Optional[str], tz: Any = None) -> Optional[str]:
+    """
+    Formats an ISO 8601 publication date the way Substack shows it (e.g. May 3, 2025, day not
+    zero-padded), on the publication's calendar day. Returns None if it cannot be parsed.
+    """
+    if not published:
+        return None
+    try:
+        parsed = datetime.fromisoformat(published.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    local = parsed.astimezone(tz or publication_timezone())
+    return f"{local:%b} {local.day}, {local:%Y}"
+
+
+def parse_post_page(
+    content: bytes, parser: str = "html.parser", selectors: SelectorProfile = DEFAULT_SELECTOR_PROFILE
+) -> BeautifulSoup:
+    """
+    Parses only the parts of a post page listed in is_post_part. Falls back to a full parse if the
+    page does not have the expected markup, so a Substack layout change degrades to the old behaviour.
+    """
+    if selectors.partial_parse:
+        soup = BeautifulSoup(content, parser, parse_only=POST_PARTS)
+        if selectors.select_one("title", soup) is not None and (
+            selectors.select_one("content", soup) is not None or selectors.select_one("paywall", soup) is not None
+        ):
+            return soup
+    return BeautifulSoup(content, parser)
+
+
+# Tags kept by the direct HTML render mode. Tags in DROPPED_TAGS are removed with their contents, any
+# other tag is replaced by its children (Substack's layout divs and spans).
+ALLOWED_TAGS = frozenset({
+    "a", "audio", "b", "blockquote", "br", "code", "em", "figcaption", "figure", "h1", "h2", "h3", "h4", "h5",
+    "h6", "hr", "i", "img", "li", "ol", "p", "pre", "s", "source", "strong", "sub", "sup", "table", "tbody",
+    "td", "th", "thead", "tr", "u", "ul", "video",
+})
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "title"},
+    "audio": {"src", "controls"},
+    "img": {"src", "alt", "title", "width", "height"},
+    "source": {"src", "type"},
+    "td": {"colspan", "rowspan"},
+    "th": {"colspan", "rowspan"},
+    "video": {"src", "controls", "width", "height"},
+}
+DROPPED_TAGS = frozenset({"script", "style", "noscript", "iframe", "svg", "button", "form", "input"})
+MEDIA_TAGS: Tuple[str, ...] = ("video", "audio")  # html2text drops these, so the markdown links to them instead
+
+
+def sanitize_content(element: Optional[Tag]) -> str:
+    """
+    Reduces a post body subtree to plain semantic HTML: scripts, embeds and form controls are removed,
+    layout wrappers are unwrapped, and only ALLOWED_ATTRIBUTES survive. Modifies element in place.
+    """
+    if element is None:
+        return ""
+    for tag in element.find_all(DROPPED_TAGS):
+        tag.decompose()
+    for tag in element.find_all(True):
+        if tag.name not in ALLOWED_TAGS:
+            tag.unwrap()
+            continue
+        allowed = ALLOWED_ATTRIBUTES.get(tag.name, set())
+        tag.attrs = {name: value for name, value in tag.attrs.items() if name in allowed}
+        if tag.get("href", "").strip().lower().startswith("javascript:"):
+            del tag["href"]
+    return element.decode_contents().strip()
+
+
+def link_media(element: Optional[Tag]) -> Optional[Tag]:
+    """
+    Replaces each video and audio element with a paragraph linking to its file, so the markdown keeps
+    them (html2text drops both tags). Works on a copy when there is any media, since the direct HTML
+    render reads the same element afterwards.
+    """
+    if element is None or element.find(MEDIA_TAGS) is None:
+        return element
+    element = copy.copy(element)
+    for media in element.find_all(MEDIA_TAGS):
+        source = media if media.get("src") else media.find("source", src=True)
+        if source is None:
+            media.decompose()
+            continue
+        link = BeautifulSoup(
+            f'<p><a href="{escape(source["src"])}">{media.name.capitalize()}</a></p>', "html.parser"
+        ).p
+        media.replace_with(link)
+    return element
+
+
+def normalize_pub_date(value: Optional[str]) -> Optional[str]:
+    """
+    Converts an RFC 822 (feed) or ISO 8601 (archive API, sitemap) date to ISO 8601 UTC, so the
+    manifest compares dates the same way whichever discovery mode found the post
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return value
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def create_session(pool_size: int = MAX_WORKERS, max_retries: int = MAX_RETRIES) -> requests.Session:
+    """
+    Creates a keep-alive session whose connection pool fits pool_size concurrent requests, and
+    which retries connection errors, 429 and 5xx with jittered exponential backoff. Retry-After
+    headers on 429/503 responses take precedence over the computed backoff.
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=0.5,
+        backoff_jitter=0.5,
+        backoff_max=30,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # Hand the last response back so callers can report the status
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, pool_size), max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def get_shared_session(pool_size: int = MAX_WORKERS) -> requests.Session:
+    """
+    Returns a module-level session for the given pool size, so that warm Lambda invocations
+    reuse already open connections instead of repeating DNS, TCP and TLS setup
+    """
+    with _shared_sessions_lock:
+        session = _shared_sessions.get(pool_size)
+        if session is None:
+            session = _shared_sessions[pool_size] = create_session(pool_size)
+        return session
+
+
+class HostRateLimiter:
+    """
+    Thread-safe limiter that spaces out requests made to the same host
+    """
+    def __init__(self, requests_per_second: float = 0):
+        self.min_interval: float = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot: Dict[str, float] = {}
+
+    def wait(self, url: str) -> None:
+        """
+        Blocks until a request to the host of url is allowed
+        """
+        if not self.min_interval:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class PostNotModified(Exception):
+    """
+    Raised by get_url_soup when the server or the content hash says a post has not changed
+    """
+
+
+class ScrapeManifest:
+    """
+    Durable record of every post the scraper has handled, keyed by post URL. Each entry keeps the
+    feed pubDate, the HTTP validators (ETag/Last-Modified) and a hash of the raw page, so later runs
+    can skip unchanged posts without a request, or revalidate them with a conditional GET.
+    """
+    VERSION: int = 1
+
+    def __init__(self, entries: Optional[Dict[str, Dict[str, Any]]] = None, archive_complete: bool = False):
+        self.entries: Dict[str, Dict[str, Any]] = entries or {}
+        # Set once every post in the archive has been handled; from then on archive discovery can
+        # stop at the first post it already knows
+        self.archive_complete: bool = archive_complete
+        self.changed: bool = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "ScrapeManifest":
+        """
+        Builds a manifest from its JSON form. Missing or unrecognised data gives an empty manifest,
+        which only costs a full re-scrape.
+        """
+        if not isinstance(data, dict) or data.get("version") != cls.VERSION or not isinstance(data.get("posts"), dict):
+            return cls()
+        return cls(data["posts"], bool(data.get("archive_complete")))
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"version": self.VERSION, "archive_complete": self.archive_complete, "posts": dict(self.entries)}
+
+    def mark_archive_complete(self) -> None:
+        if not self.archive_complete:
+            self.archive_complete = True
+            self.changed = True
+
+    @classmethod
+    def load(cls, filepath: str) -> "ScrapeManifest":
+        """
+        Loads a manifest from a local JSON file, if it exists
+        """
+        if not os.path.exists(filepath):
+            return cls()
+        try:
+            with open(filepath, encoding='utf-8') as file:
+                return cls.from_dict(json.load(file))
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable manifest {filepath}: {e}")
+            return cls()
+
+    def save(self, filepath: str) -> None:
+        with open(filepath, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.entries.get(url)
+
+    def record(self, url: str, **fields: Any) -> None:
+        """
+        Merges fields into the entry for url. None values leave the stored value untouched. The entry,
+        its checked_at time and changed are only updated when a stored value actually differs, so a run
+        that finds nothing new leaves the manifest as it was.
+        """
+        with self._lock:
+            current = self.entries.get(url, {})
+            entry = dict(current)
+            entry.update({key: value for key, value in fields.items() if value is not None})
+            if url in self.entries and entry == current:
+                return
+            entry["checked_at"] = datetime.now(timezone.utc).isoformat()
+            self.entries[url] = entry
+            self.changed = True
+
+    def forget_files(self, md_filenames: Iterable[str]) -> None:
+        """
+        Drops entries whose markdown file never made it to storage, so the next run retries them
+        """
+        md_filenames = set(md_filenames)
+        with self._lock:
+            for url in [url for url, entry in self.entries.items() if entry.get("md_filename") in md_filenames]:
+                del self.entries[url]
+                self.changed = True
+
+    def saved_files(self) -> List[str]:
+        """
+        Markdown filenames of posts that were backed up, i.e. not skipped as premium or test posts
+        """
+        with self._lock:
+            return [
+                entry["md_filename"] for entry in self.entries.values()
+                if entry.get("md_filename") and entry.get("status") not in ("premium", "test")
+            ]
+
+    def is_unchanged(self, url: str, pub_date: Optional[str]) -> bool:
+        """
+        True if the post was handled before and the feed reports the same pubDate
+        """
+        entry = self.get(url)
+        return bool(entry and pub_date and entry.get("pub_date") == pub_date)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """
+        If-None-Match/If-Modified-Since headers for revalidating a post
+        """
+        entry = self.get(url) or {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+
 class BaseSubstackScraper(ABC):
-    def __init__(self, base_substack_url: str, md_save_dir: str, html_save_dir: str):
+    def __init__(
+        self,
+        base_substack_url: str,
+        md_save_dir: str,
+        html_save_dir: str,
+        max_workers: int = MAX_WORKERS,
+        requests_per_second: float = REQUESTS_PER_SECOND,
+        session: Optional[requests.Session] = None,
+        manifest: Optional[ScrapeManifest] = None,
+        discovery: str = DISCOVERY_MODE,
+        parser: str = HTML_PARSER,
+        html_render: str = HTML_RENDER_MODE,
+        selectors: Optional[SelectorProfile] = None,
+        page_cache: Optional[PageCache] = None,
+        replay: bool = False,
+        mirror_assets: bool = MIRROR_ASSETS,
+        sink: Optional[OutputSink] = None,
+    ):
         if not base_substack_url.endswith("/"):
             base_substack_url += "/"
         self.base_substack_url: str = base_substack_url
@@ -37,45 +572,279 @@ class BaseSubstackScraper(ABC):
         self.md_save_dir: str = md_save_dir
         self.html_save_dir: str = f"{html_save_dir}/{self.writer_name}"
 
-        if not os.path.exists(md_save_dir):
-            os.makedirs(md_save_dir)
-            print(f"Created md directory {md_save_dir}")
-        if not os.path.exists(self.html_save_dir):
-            os.makedirs(self.html_save_dir)
-            print(f"Created html directory {self.html_save_dir}")
+        # Outputs go to the local filesystem unless another sink (S3, memory) is given
+        self.sink: OutputSink = sink if sink is not None else LocalSink()
+        self.sink.makedirs(md_save_dir)
+        self.sink.makedirs(self.html_save_dir)
+
+        self.max_workers: int = max(1, max_workers)
+        self.rate_limiter: HostRateLimiter = HostRateLimiter(requests_per_second)
+        self.session: requests.Session = session if session is not None else get_shared_session(self.max_workers)
+        self.failed_urls: List[str] = []
+        self.manifest: ScrapeManifest = manifest if manifest is not None else ScrapeManifest()
+        self.discovery: str = discovery
+        self.parser: str = resolve_parser(parser)
+        if html_render not in ("markdown", "direct"):
+            raise ValueError(f"Unknown HTML render mode {html_render!r}, expected markdown or direct")
+        self.html_render: str = html_render
+        self.selectors: SelectorProfile = selectors if selectors is not None else SelectorProfile.load(SELECTOR_PROFILE_PATH)
+        if replay and page_cache is None:
+            raise ValueError("Replay needs a page cache to read posts from")
+        self.page_cache: Optional[PageCache] = page_cache  # Raw pages are stored here as they are fetched
+        self.replay: bool = replay  # Process the cached pages only, without any network requests
+        # Images and media are mirrored next to both the markdown and the HTML files, so the same relative
+        # link resolves from either (in the bucket they share one key); replay makes no requests, so it
+        # links to the copies an earlier run recorded in the page cache
+        self.asset_mirror: Optional[AssetMirror] = (
+            AssetMirror(
+                self.fetch,
+                [os.path.join(self.md_save_dir, ASSET_PREFIX), os.path.join(self.html_save_dir, ASSET_PREFIX)],
+                sink=self.sink,
+            )
+            if mirror_assets and not replay else None
+        )
+        self.pub_dates: Dict[str, str] = {}  # Publication date per post URL, ISO 8601 UTC
+        self.page_validators: Dict[str, Dict[str, Optional[str]]] = {}  # ETag/Last-Modified/hash per fetched URL
+        self.stage_seconds: Dict[str, float] = {}  # Busy time per pipeline stage, summed over its workers
+        self._stage_lock = threading.Lock()
 
         self.keywords: List[str] = ["about", "archive", "podcast"]
-        self.post_urls: List[str] = self.get_all_post_urls()
+        self.reached_known_post: bool = False  # Set when discovery stops early at an already backed up post
+        self.archive_exhausted: bool = False  # Set when archive discovery read through to the archive's last page
+        self.discovery_finished: bool = False
+        self._discovered: List[str] = []
+        self._discovery_stream: Iterator[str] = self.iter_discovered_urls()  # Started on first use
+
+    def fetch(self, url: str, **kwargs) -> requests.Response:
+        """
+        GETs a URL through the scraper's pooled session, honoring the per-host rate limit
+        """
+        kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+        self.rate_limiter.wait(url)
+        return self.session.get(url, **kwargs)
+
+    def link_assets(self, content: Optional[Tag]) -> None:
+        """
+        Points a post's images and media at local copies: mirrored now, and recorded in the page cache
+        if there is one, or on a replay, mirrored by an earlier run. Other assets keep their remote URL.
+        """
+        urls = extract_asset_urls(content)
+        if not urls:
+            return
+        if self.asset_mirror is not None:
+            links = self.asset_mirror.mirror(urls)
+            if self.page_cache is not None:
+                self.page_cache.record_assets(links)
+        else:
+            links = self.known_asset_links(urls)
+        rewrite_asset_links(content, links)
+
+    def known_asset_links(self, urls: List[str]) -> Dict[str, str]:
+        """
+        Local links of assets mirrored by earlier runs; only replays use them, since they cannot download
+        """
+        if not self.replay or self.page_cache is None:
+            return {}
+        return self.page_cache.asset_links(urls)
 
     def get_all_post_urls(self) -> List[str]:
         """
-        Fetches URLs from feed.xml.
+        Runs discovery to the end and returns every post URL it finds
         """
-        urls = self.fetch_urls_from_feed()
-        return self.filter_urls(urls, self.keywords)
+        return list(self.iter_discovered_urls())
 
-    
+    def iter_discovered_urls(self) -> Iterator[str]:
+        """
+        Streams URLs from feed.xml, or from the archive API (falling back to sitemap.xml and then
+        feed.xml) when discovery is "archive". In replay mode, every URL in the page cache is used.
+        """
+        if self.replay:
+            yield from self.filter_urls(self.page_cache.urls(), self.keywords)
+            return
+        found = False
+        sources = [self.iter_archive_urls, self.iter_sitemap_urls] if self.discovery == "archive" else []
+        for source in sources + [self.iter_feed_urls]:
+            # Only a full read of the archive itself counts, not a sitemap or feed fallback
+            self.archive_exhausted = False
+            for url in source():
+                found = True
+                if all(keyword not in url for keyword in self.keywords):
+                    yield url
+            # Stopping at a known post means discovery worked, there is just nothing new to fall back for
+            if found or self.reached_known_post:
+                return
 
-    def fetch_urls_from_feed(self) -> List[str]:
+    def iter_post_urls(self) -> Iterator[str]:
         """
-        Fetches URLs from feed.xml.
+        Yields the URLs discovered so far, then keeps discovering, so posts can be fetched while
+        the feed or archive is still being read
         """
-        print('Falling back to feed.xml. This will only contain up to the 22 most recent posts.')
-        feed_url = f"{self.base_substack_url}feed.xml"
-        response = requests.get(feed_url)
+        index = 0
+        while True:
+            if index < len(self._discovered):
+                yield self._discovered[index]
+                index += 1
+                continue
+            url = next(self._discovery_stream, None)
+            if url is None:
+                self.discovery_finished = True
+                return
+            self._discovered.append(url)
 
-        if not response.ok:
-            print(f'Error fetching feed at {feed_url}: {response.status_code}')
-            return []
+    @property
+    def post_urls(self) -> List[str]:
+        """
+        Every discovered post URL. Reading this finishes discovery.
+        """
+        for _ in self.iter_post_urls():
+            pass
+        return self._discovered
 
-        root = ET.fromstring(response.content)
-        urls = []
-        for item in root.findall('.//item'):
-            link = item.find('link')
-            if link is not None and link.text:
-                urls.append(link.text)
+    def fetch_archive_page(self, offset: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Fetches one page of the archive API, newest posts first. Returns None on errors.
+        """
+        archive_url = f"{self.base_substack_url}api/v1/archive"
+        params = {"sort": "new", "search": "", "offset": offset, "limit": ARCHIVE_PAGE_SIZE}
+        try:
+            response = self.fetch(archive_url, params=params)
+            response.raise_for_status()
+            posts = response.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f'Error fetching archive page at offset {offset}: {e}')
+            return None
+        return posts if isinstance(posts, list) else None
 
-        return urls
+    def iter_archive_urls(self) -> Iterator[str]:
+        """
+        Streams post URLs from the archive API page by page, keeping the next few pages in flight.
+        Once the manifest says the whole archive was backed up, stops at the first known post.
+        Sets archive_exhausted only on reaching the last page; a failed page or ARCHIVE_MAX_PAGES
+        ends discovery without it, so the archive is not marked complete with posts still missing.
+        """
+        stop_at_known = self.manifest.archive_complete
+        skipped_paid = 0
+        with ThreadPoolExecutor(max_workers=ARCHIVE_PREFETCH_PAGES, thread_name_prefix="archive") as executor:
+            pending = deque(
+                executor.submit(self.fetch_archive_page, page * ARCHIVE_PAGE_SIZE)
+                for page in range(min(ARCHIVE_PREFETCH_PAGES, ARCHIVE_MAX_PAGES))
+            )
+            next_page = len(pending)
+            try:
+                while pending:
+                    posts = pending.popleft().result()
+                    if posts is None:
+                        break
+                    for post in posts:
+                        url = post.get("canonical_url")
+                        if not url:
+                            continue
+                        if stop_at_known and self.manifest.get(url) is not None:
+                            print(f"Reached already backed up post {url}, stopping archive discovery")
+                            self.reached_known_post = True
+                            return
+                        if post.get("audience") == "only_paid":
+                            skipped_paid += 1
+                            continue
+                        pub_date = normalize_pub_date(post.get("post_date"))
+                        if pub_date:
+                            self.pub_dates[url] = pub_date
+                        yield url
+                    if len(posts) < ARCHIVE_PAGE_SIZE:
+                        self.archive_exhausted = True
+                        break
+                    if next_page < ARCHIVE_MAX_PAGES:
+                        pending.append(executor.submit(self.fetch_archive_page, next_page * ARCHIVE_PAGE_SIZE))
+                        next_page += 1
+            finally:
+                for future in pending:
+                    future.cancel()
+                if skipped_paid:
+                    print(f"Skipped {skipped_paid} paid-only posts from the archive")
+
+    def iter_xml_response(self, url: str, tags: Iterable[str]) -> Iterator[ET.Element]:
+        """
+        Fetches an XML document as a stream and yields each element with one of the given tags as
+        soon as it closes. Yielded elements are removed from the tree, so memory stays flat however
+        long the document is. Request and parse errors end the stream after printing them.
+        """
+        tags = set(tags)
+        try:
+            response = self.fetch(url, stream=True)
+        except requests.RequestException as e:
+            print(f'Error fetching {url}: {e}')
+            return
+        try:
+            if not response.ok:
+                print(f'Error fetching {url}: {response.status_code}')
+                return
+            parser = ET.XMLPullParser(events=("start", "end"))
+            open_elements = []
+            for chunk in response.iter_content(chunk_size=FEED_CHUNK_SIZE):
+                parser.feed(chunk)
+                for event, element in parser.read_events():
+                    if event == "start":
+                        open_elements.append(element)
+                        continue
+                    open_elements.pop()
+                    if element.tag in tags:
+                        yield element
+                        if open_elements:
+                            open_elements[-1].remove(element)
+            parser.close()
+        except (requests.RequestException, ET.ParseError) as e:
+            print(f'Error reading {url}: {e}')
+        finally:
+            response.close()
+
+    def iter_sitemap_urls(self) -> Iterator[str]:
+        """
+        Streams post URLs from sitemap.xml, following nested sitemaps in a sitemap index.
+        Sitemaps are not in publication order, so there is no stopping early at a known post.
+        """
+        print('Falling back to sitemap.xml.')
+        sitemap_urls = deque([f"{self.base_substack_url}sitemap.xml"])
+        tags = (f"{SITEMAP_NAMESPACE}sitemap", f"{SITEMAP_NAMESPACE}url")
+        while sitemap_urls:
+            sitemap_url = sitemap_urls.popleft()
+            for element in self.iter_xml_response(sitemap_url, tags):
+                loc = (element.findtext(f"{SITEMAP_NAMESPACE}loc") or "").strip()
+                if element.tag == f"{SITEMAP_NAMESPACE}sitemap":
+                    if loc:
+                        sitemap_urls.append(loc)
+                    continue
+                if "/p/" not in loc:
+                    continue
+                lastmod = normalize_pub_date(element.findtext(f"{SITEMAP_NAMESPACE}lastmod"))
+                if lastmod:
+                    self.pub_dates[loc] = lastmod
+                yield loc
+
+    def iter_feed_urls(self) -> Iterator[str]:
+        """
+        Streams URLs from feed.xml as its items arrive. Once the manifest says the whole archive
+        was backed up, stops at the first known post, like archive discovery.
+        """
+        print('Falling back to feed.xml. This will only contain up to the 22 most recent posts.')
+        stop_at_known = self.manifest.archive_complete
+        for item in self.iter_xml_response(f"{self.base_substack_url}feed.xml", ("item",)):
+            link = (item.findtext('link') or "").strip()
+            if not link:
+                continue
+            if stop_at_known and self.manifest.get(link) is not None:
+                print(f"Reached already backed up post {link}, stopping feed discovery")
+                self.reached_known_post = True
+                return
+            pub_date = normalize_pub_date(item.findtext('pubDate'))
+            if pub_date:
+                self.pub_dates[link] = pub_date
+            yield link
+
+    def fetch_urls_from_feed(self) -> List[str]:
+        """
+        Fetches URLs from feed.xml.
+        """
+        return list(self.iter_feed_urls())
 
     @staticmethod
     def filter_urls(urls: List[str], keywords: List[str]) -> List[str]:
@@ -96,10 +865,10 @@ class BaseSubstackScraper(ABC):
         h.body_width = 0
         return h.handle(html_content)
 
-    @staticmethod
-    def save_to_file(filepath: str, content: str) -> None:
+    def save_to_file(self, filepath: str, content: str) -> None:
         """
-        This method saves content to a file. Can be used to save HTML or Markdown
+        This method saves content to a file through the output sink. Can be used to save HTML or Markdown.
+        An existing file is kept, except in replay mode, which rebuilds it
         """
         if not isinstance(filepath, str):
             raise ValueError("filepath must be a string")
@@ -107,19 +876,19 @@ class BaseSubstackScraper(ABC):
         if not isinstance(content, str):
             raise ValueError("content must be a string")
 
-        if os.path.exists(filepath):
+        # A replay rebuilds outputs from the cache, so it replaces them
+        if self.sink.exists(filepath) and not self.replay:
             print(f"File already exists: {filepath}")
             return
 
-        with open(filepath, 'w', encoding='utf-8') as file:
-            file.write(content)
+        self.sink.write(filepath, content.encode('utf-8'))
 
     @staticmethod
     def md_to_html(md_content: str) -> str:
         """
         This method converts Markdown to HTML
         """
-        return markdown.markdown(md_content, extensions=['extra'])
+        return get_markdown_converter().convert(md_content)
 
 
     def save_to_html_file(self, filepath: str, content: str) -> None:
@@ -154,8 +923,7 @@ class BaseSubstackScraper(ABC):
             </html>
         """
 
-        with open(filepath, 'w', encoding='utf-8') as file:
-            file.write(html_content)
+        self.sink.write(filepath, html_content.encode('utf-8'))
 
     @staticmethod
     def get_filename_from_url(url: str, filetype: str = ".md") -> str:
@@ -192,31 +960,68 @@ class BaseSubstackScraper(ABC):
 
         return metadata + content
 
-    def extract_post_data(self, soup: BeautifulSoup) -> Tuple[str, str, str, str, str]:
+    def render_html(self, title: str, subtitle: str, date: str, like_count: str, content: Optional[Tag]) -> str:
         """
-        Converts substack post soup to markdown, returns metadata and content
+        Renders a post straight from its HTML, with the same header md_to_html produces for the markdown
+        version, so the direct render mode does not need a markdown round trip
+        """
+        header = f"<h1>{escape(title)}</h1>\n"
+        if subtitle:
+            header += f"<h2>{escape(subtitle)}</h2>\n"
+        header += f"<p><strong>{escape(date)}</strong></p>\n"
+        header += f"<p><strong>Likes:</strong> {escape(like_count)}</p>\n"
+        return header + sanitize_content(content)
+
+    def extract_post_fields(self, soup: BeautifulSoup) -> Tuple[str, str, str, str, Optional[str], Optional[Tag]]:
         """
-        title = soup.select_one("h1.post-title, h2").text.strip()  # When a video is present, the title is demoted to h2
+        Returns the title, subtitle, like count, display date, ISO 8601 publication date and body element
+        of a substack post soup. The title and dates come from structured data when the page has it; the
+        CSS selectors are only a fallback.
+        """
+        structured = extract_structured_metadata(soup, self.selectors)
+
+        title = structured.get("title")
+        if not title:
+            title = self.selectors.select_one("title", soup).text.strip()
 
-        subtitle_element = soup.select_one("h3.subtitle")
+        subtitle_element = self.selectors.select_one("subtitle", soup)
         subtitle = subtitle_element.text.strip() if subtitle_element else ""
 
-        
-        date_element = soup.find(
-            "div",
-            class_="pencraft pc-reset color-pub-secondary-text-hGQ02T line-height-20-t4M0El font-meta-MWBumP size-11-NuY2Zx weight-medium-fw81nC transform-uppercase-yKDgcq reset-IxiVJZ meta-EgzBVA"
-        )
-        date = date_element.text.strip() if date_element else "Date not found"
+        # The visible date is formatted from the timestamp like Substack renders it (day not padded, on
+        # the publication's calendar day); the hashed date class is only searched for when there is none
+        published = normalize_pub_date(structured.get("published"))
+        date = display_date(published)
+        if date is None:
+            date_element = self.selectors.select_one("date", soup)
+            date = date_element.text.strip() if date_element else "Date not found"
 
-        like_count_element = soup.select_one("a.post-ufi-button .label")
+        like_count_element = self.selectors.select_one("like_count", soup)
         like_count = (
             like_count_element.text.strip()
             if like_count_element and like_count_element.text.strip().isdigit()
             else "0"
         )
 
-        content = str(soup.select_one("div.available-content"))
-        md = self.html_to_md(content)
+        return title, subtitle, like_count, date, published, self.selectors.select_one("content", soup)
+
+    def render_post(self, title: str, subtitle: str, like_count: str, date: str, content: Optional[Tag]) -> Tuple[str, str]:
+        """
+        Renders the markdown and HTML versions of a post from its extracted fields
+        """
+        body_md = self.html_to_md(str(link_media(content)))
+        md = self.combine_metadata_and_content(title, subtitle, date, like_count, body_md)
+        if self.html_render == "direct":
+            html = self.render_html(title, subtitle, date, like_count, content)
+        else:
+            html = self.md_to_html(md)
+        return md, html
+
+    def extract_post_data(self, soup: BeautifulSoup) -> Tuple[str, str, str, str, str]:
+        """
+        Converts substack post soup to markdown, returns metadata and content
+        """
+        title, subtitle, like_count, date, _, content = self.extract_post_fields(soup)
+        md = self.html_to_md(str(content))
         md_content = self.combine_metadata_and_content(title, subtitle, date, like_count, md)
         return title, subtitle, like_count, date, md_content
 
@@ -224,89 +1029,314 @@ class BaseSubstackScraper(ABC):
     def get_url_soup(self, url: str) -> str:
         raise NotImplementedError
 
+    def process_post(self, url: str) -> Dict[str, Any]:
+        """
+        Fetches, parses and converts a single post, i.e. runs both pipeline stages of
+        iter_post_futures back to back
+        """
+        result = self.fetch_post(url)
+        if result["status"] != "fetched":
+            return result
+        return self.convert_post(result)
+
+    def fetch_post(self, url: str) -> Dict[str, Any]:
+        """
+        Fetch stage: everything that waits on the network. Fetches and parses the page, extracts
+        its fields and mirrors its assets. Returns status "fetched" with the fields for convert_post,
+        or the final result for posts that are skipped.
+        """
+        md_filename = self.get_filename_from_url(url, filetype=".md")
+        html_filename = self.get_filename_from_url(url, filetype=".html")
+        md_filepath = os.path.join(self.md_save_dir, md_filename)
+        html_filepath = os.path.join(self.html_save_dir, html_filename)
+
+        if not self.replay and self.sink.exists(md_filepath):
+            return {"status": "exists", "md_filepath": md_filepath}
+
+        if not self.replay and self.manifest.is_unchanged(url, self.pub_dates.get(url)):
+            return {"status": "unchanged"}
+
+        try:
+            soup = self.get_url_soup(url)
+        except PostNotModified:
+            return {"status": "not_modified"}
+        if soup is None:
+            return {"status": "premium"}
+        title, subtitle, like_count, date, published, content = self.extract_post_fields(soup)
+
+        # Filter out test articles
+        if 'test' in title.lower() or 'test' in md_filename.lower():
+            return {"status": "test", "title": title, "md_filename": md_filename}
+
+        self.link_assets(content)
+
+        return {
+            "status": "fetched",
+            "title": title,
+            "subtitle": subtitle,
+            "like_count": like_count,
+            "date": date,
+            "published": published,
+            "content": content,
+            "md_filename": md_filename,
+            "html_filename": html_filename,
+            "md_filepath": md_filepath,
+            "html_filepath": html_filepath,
+        }
+
+    def convert_post(self, fetched: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Convert stage: renders the markdown and HTML of a fetched post, the CPU bound part
+        """
+        result = dict(fetched)
+        content = result.pop("content")
+        result["md"], result["html"] = self.render_post(
+            result["title"], result["subtitle"], result["like_count"], result["date"], content
+        )
+        result["status"] = "ok"
+        return result
+
+    def record_in_manifest(self, url: str, status: Optional[str], md_filename: Optional[str] = None) -> None:
+        """
+        Stores the outcome of a post along with its feed pubDate and any validators from fetching it
+        """
+        validators = self.page_validators.pop(url, {})
+        self.manifest.record(
+            url,
+            status=status,
+            pub_date=self.pub_dates.get(url),
+            md_filename=md_filename,
+            **validators
+        )
+
+    def timed(self, stage: str, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Runs func(*args), adding its duration to the busy time of stage
+        """
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._stage_lock:
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + elapsed
+
+    def iter_post_futures(self, urls: Iterable[str]) -> Iterator[Tuple[str, "Future[Dict[str, Any]]"]]:
+        """
+        Runs posts through a two stage pipeline and yields their futures in the original URL order.
+        Fetching runs on max_workers threads and rendering on CONVERT_WORKERS threads. A post is
+        handed to the convert pool as soon as its fetch is done, so later pages download while
+        earlier ones render. At most 2 * max_workers posts are in flight across both stages, which
+        bounds memory and the work wasted by stopping early.
+        """
+        url_iter = iter(urls)
+        with ThreadPoolExecutor(max_workers=max(1, CONVERT_WORKERS), thread_name_prefix="convert") as convert_pool, \
+                ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fetch") as fetch_pool:
+
+            def submit(url: str) -> Tuple[str, "Future[Dict[str, Any]]", Future]:
+                result: "Future[Dict[str, Any]]" = Future()
+
+                def converted(convert_future: Future) -> None:
+                    if convert_future.exception() is not None:
+                        result.set_exception(convert_future.exception())
+                    else:
+                        result.set_result(convert_future.result())
+
+                def fetched(fetch_future: Future) -> None:
+                    try:
+                        post = fetch_future.result()
+                        if post["status"] != "fetched":
+                            result.set_result(post)
+                            return
+                        convert_future = convert_pool.submit(self.timed, "convert", self.convert_post, post)
+                    except BaseException as e:  # Includes the CancelledError of posts dropped by stopping early
+                        result.set_exception(e)
+                        return
+                    convert_future.add_done_callback(converted)
+
+                fetch_future = fetch_pool.submit(self.timed, "fetch", self.fetch_post, url)
+                fetch_future.add_done_callback(fetched)
+                return url, result, fetch_future
+
+            pending = deque(submit(url) for url in islice(url_iter, self.max_workers * 2))
+            try:
+                while pending:
+                    url, future, _ = pending.popleft()
+                    for next_url in islice(url_iter, 1):
+                        pending.append(submit(next_url))
+                    yield url, future
+            finally:
+                for _, _, fetch_future in pending:
+                    fetch_future.cancel()
+
     def scrape_posts(self, num_posts_to_scrape: int = 0) -> None:
         """
-        Iterates over all posts and saves them as markdown and html files
+        Iterates over all posts and saves them as markdown and html files. The run is a pipeline:
+        discovery streams URLs into the fetch and convert stages of iter_post_futures, posts are
+        saved and indexed here in feed order, and the sink uploads each file while later posts are
+        still being fetched. Every stage is bounded, so a slow one holds back the others instead
+        of letting work pile up in memory.
         """
+        started = time.perf_counter()
+        self.stage_seconds = {}
         self.essays_data = []
+        self.failed_urls = []
         count = 0
-        total = num_posts_to_scrape if num_posts_to_scrape != 0 else len(self.post_urls)
-        for url in tqdm(self.post_urls, total=total):
+        if num_posts_to_scrape != 0:
+            total = num_posts_to_scrape
+        else:
+            total = len(self._discovered) if self.discovery_finished else None  # Unknown while still discovering
+        unchanged = 0
+        futures = self.iter_post_futures(self.iter_post_urls())
+        for url, future in tqdm(futures, total=total):
             try:
-                md_filename = self.get_filename_from_url(url, filetype=".md")
-                html_filename = self.get_filename_from_url(url, filetype=".html")
-                md_filepath = os.path.join(self.md_save_dir, md_filename)
-                html_filepath = os.path.join(self.html_save_dir, html_filename)
-
-                if not os.path.exists(md_filepath):
-                    soup = self.get_url_soup(url)
-                    if soup is None:
-                        total += 1
-                        continue
-                    title, subtitle, like_count, date, md = self.extract_post_data(soup)
-                    
-                    # Filter out test articles
-                    title_lower = title.lower()
-                    filename_lower = md_filename.lower()
-                    if 'test' in title_lower or 'test' in filename_lower:
-                        print(f"⏭️ Skipping test article: {title} (from {md_filename})")
-                        count += 1
-                        if num_posts_to_scrape != 0 and count == num_posts_to_scrape:
-                            break
-                        continue
-                    
-                    self.save_to_file(md_filepath, md)
-
-                    # Convert markdown to HTML and save
-                    html_content = self.md_to_html(md)
-                    self.save_to_html_file(html_filepath, html_content)
+                result = future.result()
+                status = result["status"]
+                if status in ("premium", "test"):
+                    self.record_in_manifest(url, status, result.get("md_filename"))
+                elif status in ("unchanged", "not_modified"):
+                    # Keeps the stored status; only new validators from a revalidation are recorded
+                    self.record_in_manifest(url, None)
+                if status in ("unchanged", "not_modified"):
+                    # Posts already backed up do not count towards the limit, which bounds new work
+                    unchanged += 1
+                    continue
+                if status == "premium":
+                    continue
+                if status == "exists":
+                    print(f"File already exists: {result['md_filepath']}")
+                elif status == "test":
+                    print(f"⏭️ Skipping test article: {result['title']} (from {result['md_filename']})")
+                else:
+                    self.timed("save", self.save_to_file, result["md_filepath"], result["md"])
+                    self.timed("save", self.save_to_html_file, result["html_filepath"], result["html"])
 
                     # Create S3-compatible paths
-                    s3_md_path = f"posts/{os.path.basename(self.md_save_dir)}/{md_filename}"
-                    s3_html_path = f"posts/{os.path.basename(self.html_save_dir)}/{html_filename}"
+                    s3_md_path = f"posts/{os.path.basename(self.md_save_dir)}/{result['md_filename']}"
+                    s3_html_path = f"posts/{os.path.basename(self.html_save_dir)}/{result['html_filename']}"
 
                     self.essays_data.append({
-                        "title": title,
-                        "subtitle": subtitle,
-                        "like_count": like_count,
-                        "date": date,
+                        "title": result["title"],
+                        "subtitle": result["subtitle"],
+                        "like_count": result["like_count"],
+                        "date": result["date"],
+                        "published": result["published"],
                         "file_link": s3_md_path,
                         "html_link": s3_html_path
                     })
-                else:
-                    print(f"File already exists: {md_filepath}")
+                    self.record_in_manifest(url, "saved", result["md_filename"])
             except Exception as e:
-                print(f"Error scraping post: {e}")
+                print(f"Error scraping post {url}: {e}")
+                self.failed_urls.append(url)
+                self.page_validators.pop(url, None)
             count += 1
             if num_posts_to_scrape != 0 and count == num_posts_to_scrape:
                 break
+        else:
+            if self.discovery == "archive" and self.archive_exhausted and not self.failed_urls:
+                self.manifest.mark_archive_complete()
+        futures.close()
+        self._discovery_stream.close()  # Releases a feed or sitemap response left open by stopping early
+        if self.asset_mirror is not None:
+            self.asset_mirror.close()
+
+        if unchanged:
+            print(f"⏭️ Skipped {unchanged} posts unchanged since the last run")
+        if self.stage_seconds:
+            busy = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in self.stage_seconds.items())
+            print(f"⏱️ Scraped in {time.perf_counter() - started:.1f}s (busy time per stage: {busy})")
+        if self.failed_urls:
+            print(f"❌ Failed to scrape {len(self.failed_urls)} posts: {', '.join(self.failed_urls)}")
 
 
 class SubstackScraper(BaseSubstackScraper):
-    def __init__(self, base_substack_url: str, md_save_dir: str, html_save_dir: str):
-        super().__init__(base_substack_url, md_save_dir, html_save_dir)
+    def __init__(self, base_substack_url: str, md_save_dir: str, html_save_dir: str, **kwargs: Any):
+        super().__init__(base_substack_url, md_save_dir, html_save_dir, **kwargs)
 
     def get_url_soup(self, url: str) -> Optional[BeautifulSoup]:
         """
-        Gets soup from URL using requests
+        Gets soup from URL using the scraper's pooled session. Posts already in the manifest are
+        revalidated with a conditional GET and raise PostNotModified if they have not changed.
+        In replay mode the page comes from the page cache instead.
         """
         try:
-            page = requests.get(url, headers=None)
-            soup = BeautifulSoup(page.content, "html.parser")
-            if soup.find("h2", class_="paywall-title"):
-                print(f"Skipping premium article: {url}")
-                return None
-            return soup
+            if self.replay:
+                content = self.page_cache.get(url)
+                if content is None:
+                    raise ValueError(f"{url} is not in the page cache")
+                return self.parse_post(url, content)
+
+            page = self.fetch(url, headers=self.manifest.conditional_headers(url))
+            if page.status_code == 304:
+                raise PostNotModified(url)
+            page.raise_for_status()
+            if self.page_cache is not None:
+                self.page_cache.put(url, page.content)
+
+            content_hash = hashlib.sha256(page.content).hexdigest()
+            self.page_validators[url] = {
+                "etag": page.headers.get("ETag"),
+                "last_modified": page.headers.get("Last-Modified"),
+                "content_hash": content_hash,
+            }
+            entry = self.manifest.get(url)
+            if entry and entry.get("content_hash") == content_hash:
+                raise PostNotModified(url)
+
+            return self.parse_post(url, page.content)
+        except PostNotModified:
+            raise
         except Exception as e:
             raise ValueError(f"Error fetching page: {e}") from e
 
-def start_scraping(base_substack_url, md_save_dir, html_save_dir, num_posts_to_scrape):
+    def parse_post(self, url: str, content: bytes) -> Optional[BeautifulSoup]:
+        """
+        Parses a post page, returning None for premium posts
+        """
+        soup = parse_post_page(content, self.parser, self.selectors)
+        if self.selectors.select_one("paywall", soup):
+            print(f"Skipping premium article: {url}")
+            return None
+        return soup
+
+def start_scraping(
+    base_substack_url,
+    md_save_dir,
+    html_save_dir,
+    num_posts_to_scrape,
+    max_workers=MAX_WORKERS,
+    requests_per_second=REQUESTS_PER_SECOND,
+    manifest=None,
+    discovery=DISCOVERY_MODE,
+    parser=HTML_PARSER,
+    html_render=HTML_RENDER_MODE,
+    selectors=None,
+    page_cache=None,
+    replay=False,
+    mirror_assets=MIRROR_ASSETS,
+    sink=None,
+):
     scraper = SubstackScraper(
         base_substack_url=base_substack_url,
         md_save_dir=md_save_dir,
-        html_save_dir=html_save_dir
+        html_save_dir=html_save_dir,
+        max_workers=max_workers,
+        requests_per_second=requests_per_second,
+        manifest=manifest,
+        discovery=discovery,
+        parser=parser,
+        html_render=html_render,
+        selectors=selectors,
+        page_cache=page_cache,
+        replay=replay,
+        mirror_assets=mirror_assets,
+        sink=sink
     )
-    scraper.scrape_posts(num_posts_to_scrape=num_posts_to_scrape)
+    try:
+        scraper.scrape_posts(num_posts_to_scrape=num_posts_to_scrape)
+    finally:
+        if page_cache is not None:
+            page_cache.flush()
     return scraper.essays_data
 
 def parse_args() -> argparse.Namespace:
@@ -329,6 +1359,69 @@ def parse_args() -> argparse.Namespace:
         type=str,
         help="The directory to save scraped posts as HTML files.",
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=MAX_WORKERS,
+        help="The number of posts to fetch concurrently.",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=REQUESTS_PER_SECOND,
+        help="Maximum requests per second to a single host. 0 disables the limit.",
+    )
+    parser.add_argument(
+        "--discovery",
+        choices=["feed", "archive"],
+        default=DISCOVERY_MODE,
+        help="Where to find post URLs: feed.xml (22 most recent posts) or the paginated archive API "
+        "with a sitemap.xml fallback (full history).",
+    )
+    parser.add_argument(
+        "--parser",
+        choices=["auto", *KNOWN_PARSERS],
+        default=HTML_PARSER,
+        help="BeautifulSoup builder for post pages. auto picks the fastest installed one (lxml, then html.parser).",
+    )
+    parser.add_argument(
+        "--html-render",
+        choices=["markdown", "direct"],
+        default=HTML_RENDER_MODE,
+        help="How the .html files are produced: by converting the markdown back to HTML, or directly "
+        "from the post's sanitized HTML.",
+    )
+    parser.add_argument(
+        "--selectors",
+        type=str,
+        default=SELECTOR_PROFILE_PATH,
+        help="Path of a JSON selector profile overriding the CSS selectors used to extract posts.",
+    )
+    parser.add_argument(
+        "--cache",
+        type=str,
+        default=PAGE_CACHE_LOCATION,
+        help="Directory or s3://bucket/prefix URL of a raw page cache. Fetched pages are stored in it.",
+    )
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Reprocess every post in the page cache (--cache) without any network requests.",
+    )
+    parser.add_argument(
+        "--mirror-assets",
+        action="store_true",
+        default=MIRROR_ASSETS,
+        help="Download the images and media posts embed into assets/media/ next to the markdown and HTML files, and "
+        "rewrite the markdown and HTML to link to those copies.",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        help="Path of a scrape manifest JSON file. Posts recorded in it are skipped or revalidated "
+        "with conditional requests, and it is updated after the run.",
+    )
 
     return parser.parse_args()
 
@@ -342,11 +1435,44 @@ def main():
     if args.html_directory is None:
         args.html_directory = BASE_HTML_DIR
 
+    manifest = ScrapeManifest.load(args.manifest) if args.manifest else None
+    selectors = SelectorProfile.load(args.selectors)
+    if args.replay and not args.cache:
+        raise SystemExit("--replay needs a page cache, set with --cache or SCRAPE_PAGE_CACHE")
+    page_cache = open_page_cache(args.cache) if args.cache else None
+
+    options = dict(
+        max_workers=args.workers,
+        requests_per_second=args.rate_limit,
+        manifest=manifest,
+        discovery=args.discovery,
+        parser=args.parser,
+        html_render=args.html_render,
+        selectors=selectors,
+        page_cache=page_cache,
+        replay=args.replay,
+        mirror_assets=args.mirror_assets,
+    )
     if args.url:
-        start_scraping(args.url, args.directory, args.html_directory, args.number)
+        start_scraping(
+            base_substack_url=args.url,
+            md_save_dir=args.directory,
+            html_save_dir=args.html_directory,
+            num_posts_to_scrape=args.number,
+            **options,
+        )
 
     else:  # Use the hardcoded values at the top of the file
-        start_scraping(BASE_SUBSTACK_URL, args.directory, args.html_directory, NUM_POSTS_TO_SCRAPE)
+        start_scraping(
+            base_substack_url=BASE_SUBSTACK_URL,
+            md_save_dir=args.directory,
+            html_save_dir=args.html_directory,
+            num_posts_to_scrape=args.number if args.replay else NUM_POSTS_TO_SCRAPE,
+            **options,
+        )
+
+    if manifest is not None and manifest.changed:
+        manifest.save(args.manifest)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+"""Scraping step shared by both Lambda handlers"""
+import os
+
+from s3_utils import read_json_object, write_json_object
+
+
+def scrape_new_articles(s3, bucket_name, bucket_index, substack_url, num_posts, accept=None, publisher=None):
+    """
+    Scrape new posts, upload them and save the scrape manifest. Returns (scraped_essays, uploaded_files).
+    The scraper and its dependencies are only imported here, so index-only runs never load them.
+    accept decides which output keys are uploaded; publisher, if given, sets the cache headers and
+    encoding of every uploaded file.
+    """
+    from page_cache import S3PageCache
+    from scrape import MANIFEST_KEY, ScrapeManifest, start_scraping
+    from sinks import S3Sink
+    
+    # Load the scrape manifest so posts backed up by earlier runs are not fetched again
+    manifest = ScrapeManifest.from_dict(read_json_object(s3, bucket_name, MANIFEST_KEY))
+    print(f"📒 Scrape manifest has {len(manifest.entries)} posts")
+    
+    # Optionally keep the raw post pages under a bucket prefix, so conversion can be re-run
+    # later without downloading every post again
+    page_cache_prefix = os.environ.get('PAGE_CACHE_PREFIX')
+    page_cache = S3PageCache(s3, bucket_name, page_cache_prefix) if page_cache_prefix else None
+    
+    # Posts whose markdown is no longer in the bucket are scraped again
+    missing_files = [f for f in manifest.saved_files() if f not in bucket_index]
+    if missing_files:
+        print(f"🔁 {len(missing_files)} backed up posts are missing from the bucket and will be scraped again")
+        manifest.forget_files(missing_files)
+    
+    # Each post (and any mirrored asset) is uploaded from memory as soon as the scraper saves it,
+    # so uploads overlap scraping and nothing is written to /tmp
+    sink = S3Sink(
+        s3, bucket_name, existing=bucket_index, accept=accept,
+        prepare=publisher.prepare if publisher is not None else None
+    )
+    
+    print("🕷️ Starting Substack scraping...")
+    
+    # Scrape new articles from Substack
+    try:
+        scraped_essays = start_scraping(
+            base_substack_url=substack_url,
+            md_save_dir='md_files',
+            html_save_dir='html_files',
+            num_posts_to_scrape=num_posts,
+            manifest=manifest,
+            page_cache=page_cache,
+            sink=sink
+        )
+        print(f"✅ Scraped {len(scraped_essays)} new articles")
+    except Exception as e:
+        print(f"❌ Error during scraping: {str(e)}")
+        scraped_essays = []
+    
+    print("📤 Finishing uploads of new articles to S3...")
+    uploaded_files, failed_uploads = sink.close()
+    for key in uploaded_files:
+        bucket_index.add(key)
+    failed_files = [key.replace('.html', '.md') for key in failed_uploads]
+    print(f"📤 Uploaded {len(uploaded_files)} new files to S3")
+    
+    # Persist the manifest, forgetting posts whose upload failed so the next run retries them
+    manifest.forget_files(failed_files)
+    if manifest.changed:
+        try:
+            write_json_object(s3, bucket_name, MANIFEST_KEY, manifest.to_dict())
+            print(f"📒 Saved scrape manifest with {len(manifest.entries)} posts")
+        except Exception as e:
+            print(f"❌ Error saving scrape manifest: {str(e)}")
+    
+    return scraped_essays, uploaded_files
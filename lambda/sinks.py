@@ -0,0 +1,195 @@
+import io
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Callable, Container, Deque, Dict, List, Optional, Tuple
+
+UPLOAD_MAX_PENDING: int = int(os.getenv("UPLOAD_MAX_PENDING", "64"))  # Uploads held in memory before writes wait for one to finish
+
+
+def output_key(filepath: str) -> str:
+    """
+    Bucket key of an output file: posts are stored at the top level under their file name, and files
+    under an assets/ directory keep their path from assets/ on, like the static site's own assets
+    """
+    parts = filepath.replace(os.sep, "/").split("/")
+    if "assets" in parts[:-1]:
+        start = len(parts) - 1 - parts[::-1].index("assets")
+        return "/".join(parts[start:])
+    return parts[-1]
+
+
+class OutputSink(ABC):
+    """
+    Where the scraper writes its markdown, HTML and asset files. Outputs are addressed by the path they
+    would have on disk, so the scraper is the same whichever sink it writes to.
+    """
+    def makedirs(self, directory: str) -> None:
+        """
+        Prepares an output directory; only sinks that write to disk need one
+        """
+        pass
+
+    @abstractmethod
+    def exists(self, filepath: str) -> bool:
+        """
+        Whether an output was already written at filepath
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def write(
+        self, filepath: str, content: bytes, extra_args: Optional[Dict[str, str]] = None, immutable: bool = False
+    ) -> None:
+        """
+        Writes content at filepath. extra_args are S3 upload settings such as ContentType. Immutable
+        outputs are content-addressed, so one that already exists is not written again.
+        """
+        raise NotImplementedError
+
+    def close(self) -> Tuple[List[str], Dict[str, str]]:
+        """
+        Finishes any pending writes and returns (written, failed) like s3_utils.upload_files
+        """
+        return [], {}
+
+
+class LocalSink(OutputSink):
+    """
+    Writes outputs to the local filesystem
+    """
+    def makedirs(self, directory: str) -> None:
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+            print(f"Created directory {directory}")
+
+    def exists(self, filepath: str) -> bool:
+        return os.path.exists(filepath)
+
+    def write(
+        self, filepath: str, content: bytes, extra_args: Optional[Dict[str, str]] = None, immutable: bool = False
+    ) -> None:
+        if immutable and os.path.exists(filepath):
+            return
+        os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+        with open(filepath, "wb") as file:
+            file.write(content)
+
+
+class MemorySink(OutputSink):
+    """
+    Keeps outputs in memory, keyed by path, e.g. for tests or for callers that post-process them
+    """
+    def __init__(self):
+        self.files: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def exists(self, filepath: str) -> bool:
+        return filepath in self.files
+
+    def write(
+        self, filepath: str, content: bytes, extra_args: Optional[Dict[str, str]] = None, immutable: bool = False
+    ) -> None:
+        with self._lock:
+            if immutable and filepath in self.files:
+                return
+            self.files[filepath] = content
+
+
+class S3Sink(OutputSink):
+    """
+    Uploads each output from memory as soon as it is written, through one shared TransferManager, so
+    uploads overlap scraping and nothing is written to /tmp. Keys come from key_for (output_key by
+    default); keys rejected by accept are not uploaded. Immutable outputs already in existing (e.g. a
+    BucketIndex) are skipped. prepare, if given, maps (key, content, extra_args) to the body and upload
+    settings actually sent, e.g. publish.Publisher.prepare adding cache headers. At most max_pending uploads are in flight: past that, write waits for
+    the oldest one, so a slow bucket slows the scraper down rather than filling memory.
+    """
+    def __init__(
+        self,
+        s3_client: Any,
+        bucket_name: str,
+        existing: Optional[Container[str]] = None,
+        accept: Optional[Callable[[str], bool]] = None,
+        key_for: Callable[[str], str] = output_key,
+        max_concurrency: Optional[int] = None,
+        max_pending: int = UPLOAD_MAX_PENDING,
+        prepare: Optional[Callable[[str, bytes, Optional[Dict[str, str]]], Tuple[bytes, Dict[str, str]]]] = None,
+    ):
+        self.s3_client = s3_client
+        self.bucket_name: str = bucket_name
+        self.existing: Container[str] = existing if existing is not None else set()
+        self.accept: Optional[Callable[[str], bool]] = accept
+        self.key_for: Callable[[str], str] = key_for
+        self.max_concurrency: Optional[int] = max_concurrency
+        self.max_pending: int = max(1, max_pending)
+        self.prepare = prepare
+        self.written: Dict[str, Any] = {}  # Key -> upload future
+        self._in_flight: Deque[Any] = deque()  # Upload futures not yet seen done, oldest first
+        self._lock = threading.Lock()
+        self._manager = None
+
+    def exists(self, filepath: str) -> bool:
+        return self.key_for(filepath) in self.written
+
+    def write(
+        self, filepath: str, content: bytes, extra_args: Optional[Dict[str, str]] = None, immutable: bool = False
+    ) -> None:
+        key = self.key_for(filepath)
+        if self.accept is not None and not self.accept(key):
+            return
+        with self._lock:
+            if immutable and (key in self.existing or key in self.written):
+                return
+            if self.prepare is not None:
+                content, extra_args = self.prepare(key, content, extra_args)
+            if self._manager is None:
+                from s3transfer.manager import TransferManager
+                from s3_utils import UPLOAD_MAX_CONCURRENCY, create_transfer_config
+
+                config = create_transfer_config(self.max_concurrency or UPLOAD_MAX_CONCURRENCY)
+                self._manager = TransferManager(self.s3_client, config)
+            self.written[key] = self._manager.upload(
+                io.BytesIO(content), self.bucket_name, key, extra_args=extra_args
+            )
+            self._in_flight.append(self.written[key])
+        self.wait_for_room()
+
+    def wait_for_room(self) -> None:
+        """
+        Blocks until at most max_pending uploads are in flight
+        """
+        while True:
+            with self._lock:
+                while self._in_flight and self._in_flight[0].done():
+                    self._in_flight.popleft()
+                if len(self._in_flight) <= self.max_pending:
+                    return
+                oldest = self._in_flight.popleft()
+            try:
+                oldest.result()
+            except Exception:
+                pass  # Reported by close()
+
+    def close(self) -> Tuple[List[str], Dict[str, str]]:
+        with self._lock:
+            manager, self._manager = self._manager, None
+            written, self.written = self.written, {}
+            self._in_flight.clear()
+        uploaded_keys = []
+        failed = {}
+        for key, future in written.items():
+            try:
+                future.result()
+                uploaded_keys.append(key)
+                print(f"✅ Uploaded {key}")
+            except Exception as e:
+                failed[key] = str(e)
+        if manager is not None:
+            manager.shutdown()
+
+        print(f"📤 Upload summary: {len(uploaded_keys)} uploaded, {len(failed)} failed")
+        for key, error in failed.items():
+            print(f"❌ Error uploading {key}: {error}")
+        return uploaded_keys, failed
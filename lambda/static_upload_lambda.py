@@ -1,99 +1,42 @@
 import os
-import boto3
 import json
-import re
-import tempfile
-from datetime import datetime
 from pathlib import Path
-from scrape import start_scraping
+from s3_utils import (
+    UPLOAD_MAX_CONCURRENCY,
+    BucketIndex,
+    get_s3_client,
+    sync_files,
+    upload_files,
+)
+from publish import Publisher
+from scrape_job import scrape_new_articles
+from essay_index import (
+    ESSAYS_DATA_KEY,
+    FILE_LIST_KEY,
+    REBUILD_MAX_WORKERS,
+    index_entry_from_scrape,
+    index_only_requested,
+    load_index,
+    merge_index,
+    rebuild_index,
+    rebuild_requested,
+)
 
-def extract_metadata_from_content(content, filename):
-    """Extract metadata from markdown content using improved logic"""
-    lines = content.split('\n')
-    title = ''
-    subtitle = ''
-    date = ''
-    like_count = '0'
-    
-    # Extract title from first line (usually starts with #)
-    for i in range(min(10, len(lines))):
-        line = lines[i].strip()
-        if line.startswith('# '):
-            title = line[2:].strip()
-            break
-        elif line.startswith('## '):
-            title = line[3:].strip()
-            break
-    
-    # If no title found, use filename
-    if not title:
-        title = filename.replace('.md', '').replace('-', ' ').replace('_', ' ')
-        title = ' '.join(word.capitalize() for word in title.split())
-    
-    # Try to extract subtitle from second heading
-    for i in range(min(20, len(lines))):
-        line = lines[i].strip()
-        if line.startswith('### ') and not subtitle:
-            subtitle = line[4:].strip()
-            break
-    
-    # Try to extract date from file content (look for date patterns)
-    # First look for the **Date** format used in these files
-    for i in range(min(30, len(lines))):
-        line = lines[i].strip()
-        if line.startswith('**') and '**' in line and re.search(r'\d{4}', line):
-            # Extract date from **May 10, 2025** format
-            date_match = re.search(r'\*\*(.*?)\*\*', line)
-            if date_match:
-                date = date_match.group(1).strip()
-                break
-    
-    # If no date found in ** format, try other patterns
-    if not date:
-        date_patterns = [
-            r'(\w{3}\s+\d{1,2},\s+\d{4})',
-            r'(\d{1,2}/\d{1,2}/\d{4})',
-            r'(\d{4}-\d{2}-\d{2})'
-        ]
-        
-        for i in range(min(30, len(lines))):
-            line = lines[i]
-            for pattern in date_patterns:
-                match = re.search(pattern, line)
-                if match:
-                    date = match.group(1)
-                    break
-            if date:
-                break
-    
-    # Look for like count
-    for i in range(min(30, len(lines))):
-        line = lines[i]
-        like_match = re.search(r'\*\*Likes:\*\*\s*(\d+)', line)
-        if like_match:
-            like_count = like_match.group(1)
-            break
-    
-    # If no date found, use default
-    if not date:
-        date = 'Date not found'
-    
-    return {
-        'title': title,
-        'subtitle': subtitle,
-        'like_count': like_count,
-        'date': date
-    }
+# Whether index entries link to an .html version of each article
+INCLUDE_HTML_LINK = False
+# Records what was last deployed from static_stie/, so unchanged files are not uploaded again
+STATIC_MANIFEST_KEY = 'static-manifest.json'
 
-def upload_file_to_s3(s3_client, bucket_name, local_file_path, s3_key):
-    """Upload a local file to S3"""
-    try:
-        s3_client.upload_file(local_file_path, bucket_name, s3_key)
-        print(f"✅ Uploaded {s3_key}")
-        return True
-    except Exception as e:
-        print(f"❌ Error uploading {s3_key}: {str(e)}")
+def accept_upload(key):
+    """Decide whether the scraper's output key is uploaded"""
+    # HTML files are no longer uploaded - only markdown files are needed
+    if key.endswith('.html'):
+        return False
+    # Filter out test articles (safety check - shouldn't happen due to scraping filter)
+    if 'test' in key.lower():
+        print(f"⏭️ Skipping test article upload: {key}")
         return False
+    return True
 
 def lambda_handler(event, context):
     """
@@ -114,166 +57,71 @@ def lambda_handler(event, context):
         print(f"📰 Substack URL: {substack_url}")
         print(f"📊 Number of posts to scrape: {num_posts}")
 
-        s3 = boto3.client('s3')
-        
-        # Create temporary directories for scraping
-        with tempfile.TemporaryDirectory() as temp_dir:
-            md_dir = os.path.join(temp_dir, 'md_files')
-            html_dir = os.path.join(temp_dir, 'html_files')
-            os.makedirs(md_dir, exist_ok=True)
-            os.makedirs(html_dir, exist_ok=True)
-            
-            print("🕷️ Starting Substack scraping...")
-            
-            # Scrape new articles from Substack
-            try:
-                essays_data = start_scraping(
-                    base_substack_url=substack_url,
-                    md_save_dir=md_dir,
-                    html_save_dir=html_dir,
-                    num_posts_to_scrape=num_posts
-                )
-                print(f"✅ Scraped {len(essays_data)} new articles")
-            except Exception as e:
-                print(f"❌ Error during scraping: {str(e)}")
-                essays_data = []
-            
-            # Upload new markdown and HTML files to S3
-            print("📤 Uploading new articles to S3...")
-            uploaded_files = []
-            
-            # Upload markdown files
-            for root, dirs, files in os.walk(md_dir):
-                for file in files:
-                    if file.endswith('.md'):
-                        # Filter out test articles (safety check - shouldn't happen due to scraping filter)
-                        if 'test' in file.lower():
-                            print(f"⏭️ Skipping test article upload: {file}")
-                            continue
-                        
-                        local_path = os.path.join(root, file)
-                        # Save directly at top level - use just the filename
-                        s3_key = file
-                        
-                        if upload_file_to_s3(s3, bucket_name, local_path, s3_key):
-                            uploaded_files.append(s3_key)
-            
-            # HTML files are no longer uploaded - only markdown files are needed
-            
-            print(f"📤 Uploaded {len(uploaded_files)} new files to S3")
-        
-        # Now process ALL articles (existing + new) to create updated JSON
-        print("🔍 Finding all .md files in S3 bucket...")
-        
-        all_md_files = []
-        page_count = 0
-        
-        # Use paginator to get ALL objects
-        paginator = s3.get_paginator('list_objects_v2')
-        pages = paginator.paginate(Bucket=bucket_name)
-        
-        for page in pages:
-            page_count += 1
-            page_md_count = 0
-            
-            if 'Contents' in page:
-                for obj in page['Contents']:
-                    if obj['Key'].endswith('.md'):
-                        all_md_files.append(obj['Key'])
-                        page_md_count += 1
-                
-                print(f"📄 Page {page_count}: Found {page_md_count} .md files")
-        
+        s3 = get_s3_client(max_pool_connections=max(REBUILD_MAX_WORKERS, UPLOAD_MAX_CONCURRENCY))
+        # Cache headers and precompression for everything published this run (PUBLISH_ENCODING)
+        publisher = Publisher()
+        
+        # List the bucket once; every later step looks keys up in this index instead of listing again
+        bucket_index = BucketIndex.build(s3, bucket_name)
+        index_counts = bucket_index.counts()
+        print(f"🗂️ Indexed {index_counts['objects']} objects ({index_counts['md_files']} .md files) in {index_counts['pages']} list pages")
+        
+        if index_only_requested(event):
+            print("🗂️ Index-only run, skipping scraping")
+            scraped_essays, uploaded_files = [], []
+        else:
+            scraped_essays, uploaded_files = scrape_new_articles(
+                s3, bucket_name, bucket_index, substack_url, num_posts, accept=accept_upload, publisher=publisher
+            )
+        
+        # Update the JSON index files. Normally the newly scraped articles are merged into the
+        # existing essays-data.json; the index is only rebuilt from every .md file in the bucket
+        # when asked to, or when the current index is missing or corrupt.
+        existing_essays = None
+        if rebuild_requested(event):
+            print("🔁 Full index rebuild requested")
+        else:
+            existing_essays = load_index(s3, bucket_name)
+        
+        # Every .md file in the bucket, from the listing taken at the start plus this run's uploads
+        all_md_files = bucket_index.keys('.md')
         total_articles = len(all_md_files)
         print(f"📊 Total .md files found: {total_articles}")
         
-        # Process each .md file to extract metadata
-        print("📝 Extracting metadata from .md files...")
-        essays_data = []
-        processed_files = set()  # Track processed files to avoid duplicates
-        processed_titles = set()  # Track processed titles to avoid content duplicates
-        
-        for md_file in all_md_files:
-            # Skip if we've already processed this file
-            if md_file in processed_files:
-                print(f"⏭️ Skipping duplicate file: {md_file}")
-                continue
-            
-            processed_files.add(md_file)
-            try:
-                # Download the .md file content
-                response = s3.get_object(Bucket=bucket_name, Key=md_file)
-                content = response['Body'].read().decode('utf-8')
-                
-                # Extract metadata using improved logic
-                filename = os.path.basename(md_file)
-                metadata = extract_metadata_from_content(content, filename)
-                
-                # Check for duplicate title (case-insensitive)
-                title_lower = metadata['title'].lower().strip()
-                if title_lower in processed_titles:
-                    print(f"⏭️ Skipping duplicate title: {metadata['title']} (from {filename})")
-                    continue
-                
-                processed_titles.add(title_lower)
-                
-                # Add file links
-                metadata['file_link'] = md_file
-                
-                essays_data.append(metadata)
-                print(f"✅ Processed: {filename} - {metadata['title']} ({metadata['date']})")
-                
-            except Exception as e:
-                print(f"❌ Error processing {md_file}: {str(e)}")
-                # Add a basic entry even if processing fails
-                filename = os.path.basename(md_file)
-                essays_data.append({
-                    'title': filename.replace('.md', '').replace('-', ' ').title(),
-                    'subtitle': '',
-                    'like_count': '0',
-                    'date': 'Date not found',
-                    'file_link': md_file
-                })
-        
-        # Sort essays by date (newest first)
-        def sort_key(essay):
-            try:
-                if essay['date'] == 'Date not found':
-                    return datetime.min
-                return datetime.strptime(essay['date'], '%b %d, %Y')
-            except:
-                return datetime.min
-        
-        essays_data.sort(key=sort_key, reverse=True)
+        if existing_essays is not None:
+            print(f"🧩 Merging new articles into index with {len(existing_essays)} essays...")
+            uploaded_keys = set(uploaded_files)
+            new_essays = [
+                index_entry_from_scrape(essay, include_html_link=INCLUDE_HTML_LINK)
+                for essay in scraped_essays
+                if os.path.basename(essay['file_link']) in uploaded_keys
+            ]
+            essays_data = merge_index(existing_essays, new_essays)
+        else:
+            # Now process ALL articles (existing + new) to create updated JSON
+            print("📝 Extracting metadata from .md files...")
+            essays_data = rebuild_index(
+                s3, bucket_name, all_md_files,
+                include_html_link=INCLUDE_HTML_LINK, skip_test_articles=False
+            )
         
         # Create file-list.json (just the filenames)
-        file_list = [os.path.basename(f) for f in all_md_files]
-        file_list.sort()
+        file_list = sorted(os.path.basename(f) for f in all_md_files)
         
         # Upload essays-data.json
-        print("📤 Uploading essays-data.json...")
+        print(f"📤 Uploading {ESSAYS_DATA_KEY}...")
         essays_json = json.dumps(essays_data, indent=2)
-        s3.put_object(
-            Bucket=bucket_name,
-            Key='essays-data.json',
-            Body=essays_json,
-            ContentType='application/json'
-        )
+        publisher.put_object(s3, bucket_name, ESSAYS_DATA_KEY, essays_json, 'application/json')
         
         # Upload file-list.json
-        print("📤 Uploading file-list.json...")
+        print(f"📤 Uploading {FILE_LIST_KEY}...")
         file_list_json = json.dumps(file_list, indent=2)
-        s3.put_object(
-            Bucket=bucket_name,
-            Key='file-list.json',
-            Body=file_list_json,
-            ContentType='application/json'
-        )
+        publisher.put_object(s3, bucket_name, FILE_LIST_KEY, file_list_json, 'application/json')
         
         # Upload static site files
         print("📤 Uploading static site files...")
         static_site_dir = Path('static_stie')
-        static_files_uploaded = []
+        static_uploads = []
         
         if static_site_dir.exists():
             for root, dirs, files in os.walk(static_site_dir):
@@ -290,16 +138,22 @@ def lambda_handler(event, context):
                     elif file.endswith('.json'):
                         content_type = 'application/json'
                     
-                    # Upload file to S3
                     s3_key = rel_path if os.path.dirname(rel_path) != '.' else file
-                    s3.upload_file(
-                        local_file_path,
-                        bucket_name,
-                        s3_key,
-                        ExtraArgs={'ContentType': content_type}
-                    )
-                    static_files_uploaded.append(s3_key)
-                    print(f"✅ Uploaded static file: {s3_key}")
+                    # Uploaded as published: precompressed where it helps, with cache headers
+                    with open(local_file_path, 'rb') as f:
+                        body, extra_args = publisher.prepare(s3_key, f.read(), {'ContentType': content_type})
+                    static_uploads.append((body, s3_key, extra_args))
+        
+        # Upload only new or changed static files (STATIC_SYNC=false uploads everything)
+        if os.environ.get('STATIC_SYNC', 'true').lower() == 'true':
+            static_sync = sync_files(
+                s3, bucket_name, static_uploads, STATIC_MANIFEST_KEY, bucket_index,
+                delete_stale=os.environ.get('STATIC_SYNC_DELETE', 'false').lower() == 'true'
+            )
+            static_files_uploaded, failed_static_files = static_sync['uploaded'], static_sync['failed']
+            print(f"⏭️ Skipped {len(static_sync['unchanged'])} unchanged static site files")
+        else:
+            static_files_uploaded, failed_static_files = upload_files(s3, bucket_name, static_uploads)
         
         unique_articles = len(essays_data)
         duplicates_skipped = total_articles - unique_articles
@@ -307,9 +161,12 @@ def lambda_handler(event, context):
         print(f"✅ Successfully processed {unique_articles} unique articles")
         if duplicates_skipped > 0:
             print(f"⏭️ Skipped {duplicates_skipped} duplicate articles")
-        print(f"✅ Uploaded essays-data.json with {len(essays_data)} essays")
-        print(f"✅ Uploaded file-list.json with {len(file_list)} files")
+        print(f"✅ Uploaded {ESSAYS_DATA_KEY} with {len(essays_data)} essays")
+        print(f"✅ Uploaded {FILE_LIST_KEY} with {len(file_list)} files")
         print(f"✅ Uploaded {len(static_files_uploaded)} static site files")
+        if failed_static_files:
+            print(f"❌ Failed to upload {len(failed_static_files)} static site files")
+        publisher.report()
         
         # Show sample of processed articles
         print("📝 Sample processed articles:")
@@ -0,0 +1,66 @@
+"""
+Measures the per-post cost of building a new Markdown converter versus reusing this thread's
+instance, over a corpus of saved Substack post pages.
+
+Usage: python tests/bench_converters.py [path/to/post.html ...] [-n ROUNDS]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+# Add the lambda directory to the python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lambda')))
+
+import html2text
+import markdown
+from scrape import MARKDOWN_EXTENSIONS, BaseSubstackScraper, parse_post_page
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'substack_post.html')
+
+
+def fresh_html_to_md(html_content):
+    h = html2text.HTML2Text()
+    h.ignore_links = False
+    h.body_width = 0
+    return h.handle(html_content)
+
+
+def fresh_md_to_html(md_content):
+    return markdown.markdown(md_content, extensions=MARKDOWN_EXTENSIONS)
+
+
+def load_corpus(paths):
+    corpus = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            content = str(parse_post_page(f.read()).select_one('div.available-content'))
+        corpus.append((content, fresh_html_to_md(content)))
+    return corpus
+
+
+def per_post_ms(convert, documents, rounds):
+    seconds = timeit.timeit(lambda: [convert(doc) for doc in documents], number=rounds)
+    return seconds / (rounds * len(documents)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark converter reuse on Substack post pages.")
+    parser.add_argument("pages", nargs="*", default=[FIXTURE], help="Saved post pages.")
+    parser.add_argument("-n", "--rounds", type=int, default=200, help="Passes over the corpus.")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.pages)
+    md_docs = [md for _, md in corpus]
+    for md_content in md_docs:
+        assert BaseSubstackScraper.md_to_html(md_content) == fresh_md_to_html(md_content)
+
+    print(f"{len(corpus)} posts, {args.rounds} rounds, ms per post")
+    fresh_ms = per_post_ms(fresh_md_to_html, md_docs, args.rounds)
+    reused_ms = per_post_ms(BaseSubstackScraper.md_to_html, md_docs, args.rounds)
+    print(f"  md -> html  new instance {fresh_ms:.3f}  reused {reused_ms:.3f}  "
+          f"saved {fresh_ms - reused_ms:.3f} ({(1 - reused_ms / fresh_ms) * 100:.0f}%)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Compares BeautifulSoup builders on a saved Substack post: parse time for full and partial
+(SoupStrainer) parses, and whether extract_post_data gives the same result as html.parser.
+
+Usage: python tests/bench_parsers.py [path/to/post.html ...] [-n ROUNDS]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+# Add the lambda directory to the python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lambda')))
+
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+from scrape import KNOWN_PARSERS, BaseSubstackScraper, parse_post_page, resolve_parser
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'substack_post.html')
+
+
+class OfflineScraper(BaseSubstackScraper):
+    """Scraper that discovers no posts, used only for extract_post_data"""
+
+    def iter_discovered_urls(self):
+        return iter([])
+
+    def get_url_soup(self, url):
+        raise NotImplementedError
+
+
+def bench(path, rounds, scraper):
+    with open(path, 'rb') as f:
+        content = f.read()
+    baseline = scraper.extract_post_data(BeautifulSoup(content, 'html.parser'))
+    print(f"{os.path.basename(path)} ({len(content) / 1024:.0f} KB), {rounds} rounds")
+    for parser in KNOWN_PARSERS:
+        if builder_registry.lookup(parser) is None:
+            print(f"  {parser:12} not installed")
+            continue
+        full = timeit.timeit(lambda: BeautifulSoup(content, parser), number=rounds) / rounds
+        partial = timeit.timeit(lambda: parse_post_page(content, parser), number=rounds) / rounds
+        same = scraper.extract_post_data(parse_post_page(content, parser)) == baseline
+        print(f"  {parser:12} full {full * 1000:7.2f} ms  partial {partial * 1000:7.2f} ms  "
+              f"output {'matches' if same else 'DIFFERS from'} html.parser")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BeautifulSoup builders on Substack post pages.")
+    parser.add_argument("pages", nargs="*", default=[FIXTURE], help="Saved post pages to parse.")
+    parser.add_argument("-n", "--rounds", type=int, default=50, help="Parses per builder and page.")
+    args = parser.parse_args()
+
+    print(f"auto selects: {resolve_parser('auto')}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        scraper = OfflineScraper('https://example.substack.com', temp_dir, temp_dir, requests_per_second=0)
+        for path in args.pages:
+            bench(path, args.rounds, scraper)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+import hashlib
+import io
+from datetime import datetime, timezone
+
+
+class NoSuchKey(Exception):
+    pass
+
+
+class FakeExceptions:
+    NoSuchKey = NoSuchKey
+
+
+class FakeBody(io.BytesIO):
+    """Minimal botocore StreamingBody: read(amt) plus close()"""
+
+
+class FakePaginator:
+
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, **kwargs):
+        token = None
+        while True:
+            params = dict(kwargs)
+            if token:
+                params['ContinuationToken'] = token
+            page = self.client.list_objects_v2(**params)
+            yield page
+            token = page.get('NextContinuationToken')
+            if not token:
+                break
+
+
+class FakeS3:
+    """In-memory stand-in for the subset of the boto3 S3 client used by the handlers"""
+
+    exceptions = FakeExceptions
+
+    def __init__(self, objects=None, page_size=1000):
+        self.objects = {}
+        self.page_size = page_size
+        self.calls = []
+        for key, body in (objects or {}).items():
+            self.put_object(Bucket='bucket', Key=key, Body=body)
+        self.calls = []
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.calls.append(('put_object', Key))
+        if isinstance(Body, str):
+            Body = Body.encode('utf-8')
+        elif hasattr(Body, 'read'):
+            Body = Body.read()
+        self.objects[Key] = dict(
+            kwargs,
+            Body=Body,
+            ETag=f'"{hashlib.md5(Body).hexdigest()}"',
+            LastModified=datetime.now(timezone.utc),
+        )
+        return {'ETag': self.objects[Key]['ETag']}
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None):
+        with open(Filename, 'rb') as f:
+            self.put_object(Bucket=Bucket, Key=Key, Body=f.read(), **(ExtraArgs or {}))
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        self.calls.append(('get_object', Key))
+        if Key not in self.objects:
+            raise NoSuchKey(Key)
+        obj = self.objects[Key]
+        body = obj['Body']
+        response = {k: v for k, v in obj.items() if k != 'Body'}
+        if Range:
+            start, end = Range[len('bytes='):].split('-')
+            start, end = int(start), min(int(end), len(body) - 1)
+            response['ContentRange'] = f'bytes {start}-{end}/{len(body)}'
+            body = body[start:end + 1]
+        response['Body'] = FakeBody(body)
+        response['ContentLength'] = len(body)
+        return response
+
+    def delete_objects(self, Bucket, Delete):
+        self.calls.append(('delete_objects', len(Delete['Objects'])))
+        for obj in Delete['Objects']:
+            self.objects.pop(obj['Key'], None)
+        return {'Deleted': Delete['Objects']}
+
+    def list_objects_v2(self, Bucket, Prefix='', Delimiter=None, ContinuationToken=None, **kwargs):
+        self.calls.append(('list_objects_v2', Prefix))
+        keys = sorted(key for key in self.objects if key.startswith(Prefix))
+        contents, prefixes = [], []
+        for key in keys:
+            rest = key[len(Prefix):]
+            if Delimiter and Delimiter in rest:
+                prefix = Prefix + rest.split(Delimiter)[0] + Delimiter
+                if prefix not in prefixes:
+                    prefixes.append(prefix)
+                continue
+            obj = self.objects[key]
+            contents.append({
+                'Key': key,
+                'Size': len(obj['Body']),
+                'ETag': obj['ETag'],
+                'LastModified': obj['LastModified'],
+            })
+        start = int(ContinuationToken or 0)
+        page = contents[start:start + self.page_size]
+        response = {'KeyCount': len(page)}
+        if page:
+            response['Contents'] = page
+        if prefixes and not start:
+            response['CommonPrefixes'] = [{'Prefix': prefix} for prefix in prefixes]
+        if start + self.page_size < len(contents):
+            response['NextContinuationToken'] = str(start + self.page_size)
+        return response
+
+    def get_paginator(self, operation_name):
+        assert operation_name == 'list_objects_v2'
+        return FakePaginator(self)
+
+    def count(self, operation_name):
+        return sum(1 for call in self.calls if call[0] == operation_name)
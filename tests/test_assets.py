@@ -0,0 +1,184 @@
+import unittest
+import os
+import re
+import sys
+import tempfile
+
+# Add the lambda directory to the python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lambda')))
+
+sys.path.append(os.path.dirname(__file__))
+
+from bs4 import BeautifulSoup
+from assets import (
+    ASSET_PREFIX,
+    AssetMirror,
+    asset_upload_args,
+    extract_asset_urls,
+    rewrite_asset_links,
+)
+from sinks import MemorySink, output_key
+from test_scrape import POST_HTML, FakeResponse, FakeSession, FixtureScraper
+from unittest import mock
+
+OAK_URL = 'https://substack-post-media.s3.amazonaws.com/public/images/oak.jpeg'
+JPEG = {'Content-Type': 'image/jpeg'}
+
+
+class TestAssetLinks(unittest.TestCase):
+
+    def test_extract_and_rewrite(self):
+        soup = BeautifulSoup(
+            '<div><a class="image-link" href="https://cdn.example.com/full.jpeg">'
+            '<img src="https://cdn.example.com/a.jpeg" srcset="https://cdn.example.com/a-2x.jpeg 2x"></a>'
+            '<img src="https://cdn.example.com/a.jpeg"><img src="data:image/png;base64,AAAA">'
+            '<video src="https://cdn.example.com/clip.mp4"></video></div>',
+            'html.parser',
+        )
+        content = soup.div
+
+        self.assertEqual(extract_asset_urls(content), ['https://cdn.example.com/a.jpeg', 'https://cdn.example.com/clip.mp4'])
+        rewritten = rewrite_asset_links(content, {'https://cdn.example.com/a.jpeg': 'assets/media/abc.jpg'})
+
+        self.assertEqual(rewritten, 2)
+        self.assertEqual(content.a['href'], 'assets/media/abc.jpg')
+        self.assertNotIn('srcset', content.img.attrs)
+        self.assertEqual(content.video['src'], 'https://cdn.example.com/clip.mp4')
+
+    def test_asset_keys_and_upload_args(self):
+        sink = MemorySink()
+        session = FakeSession({'https://cdn.example.com/c.png': FakeResponse(content=b'elm', headers={'Content-Type': 'image/png'})})
+        save_dirs = [os.path.join('md', 'example', ASSET_PREFIX), os.path.join('html', 'example', ASSET_PREFIX)]
+        mirror = AssetMirror(session.get, save_dirs, sink=sink)
+        link = mirror.mirror(['https://cdn.example.com/c.png'])['https://cdn.example.com/c.png']
+        mirror.close()
+
+        self.assertEqual(len(sink.files), 2)
+        self.assertEqual({output_key(filepath) for filepath in sink.files}, {link})
+        self.assertTrue(link.startswith(ASSET_PREFIX) and link.endswith('.png'))
+        self.assertEqual(asset_upload_args('abc.png')['ContentType'], 'image/png')
+        self.assertIn('immutable', asset_upload_args('abc.png')['CacheControl'])
+
+
+class TestAssetMirror(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def make_mirror(self, responses, **kwargs):
+        session = FakeSession(responses)
+        mirror = AssetMirror(session.get, [self.temp_dir.name], max_workers=4, **kwargs)
+        self.addCleanup(mirror.close)
+        return mirror, session
+
+    def test_identical_content_is_stored_once(self):
+        mirror, session = self.make_mirror({
+            'https://cdn.example.com/a.jpeg': FakeResponse(content=b'oak', headers=JPEG),
+            'https://cdn.example.com/b.jpeg': FakeResponse(content=b'oak', headers=JPEG),
+            'https://cdn.example.com/c.png': FakeResponse(content=b'elm', headers={'Content-Type': 'image/png'}),
+        })
+        links = mirror.mirror(['https://cdn.example.com/a.jpeg', 'https://cdn.example.com/b.jpeg'])
+        links.update(mirror.mirror(['https://cdn.example.com/a.jpeg', 'https://cdn.example.com/c.png']))
+
+        self.assertEqual(links['https://cdn.example.com/a.jpeg'], links['https://cdn.example.com/b.jpeg'])
+        self.assertTrue(links['https://cdn.example.com/a.jpeg'].startswith(ASSET_PREFIX))
+        self.assertTrue(links['https://cdn.example.com/c.png'].endswith('.png'))
+        self.assertEqual(len(os.listdir(self.temp_dir.name)), 2)
+        # A URL already mirrored this run is not downloaded again
+        self.assertEqual(len(session.calls), 3)
+        self.assertEqual(mirror.stats['downloaded'], 2)
+        self.assertEqual(mirror.stats['deduplicated'], 1)
+
+    def test_limits_leave_assets_remote(self):
+        mirror, _ = self.make_mirror({
+            'https://cdn.example.com/big.jpeg': FakeResponse(content=b'x' * 200, headers=JPEG),
+            'https://cdn.example.com/page.html': FakeResponse(content=b'<html>', headers={'Content-Type': 'text/html'}),
+            'https://cdn.example.com/gone.jpeg': FakeResponse(status_code=404),
+            'https://cdn.example.com/ok.jpeg': FakeResponse(content=b'x' * 50, headers=JPEG),
+        }, max_asset_bytes=100)
+        links = mirror.mirror([
+            'https://cdn.example.com/big.jpeg', 'https://cdn.example.com/page.html',
+            'https://cdn.example.com/gone.jpeg', 'https://cdn.example.com/ok.jpeg',
+        ])
+
+        self.assertEqual(list(links), ['https://cdn.example.com/ok.jpeg'])
+        self.assertEqual(mirror.stats['skipped'], 2)
+        self.assertEqual(mirror.stats['failed'], 1)
+
+    def test_budgets_stop_new_downloads(self):
+        mirror, _ = self.make_mirror({
+            'https://cdn.example.com/a.jpeg': FakeResponse(content=b'a' * 60, headers=JPEG),
+            'https://cdn.example.com/b.jpeg': FakeResponse(content=b'b' * 60, headers=JPEG),
+        }, budget_bytes=100)
+        links = mirror.mirror(['https://cdn.example.com/a.jpeg'])
+        links.update(mirror.mirror(['https://cdn.example.com/b.jpeg']))
+        self.assertEqual(list(links), ['https://cdn.example.com/a.jpeg'])
+
+        expired, session = self.make_mirror({}, budget_seconds=-1)
+        self.assertEqual(expired.mirror(['https://cdn.example.com/a.jpeg']), {})
+        self.assertEqual(session.calls, [])
+
+
+class TestScraperAssets(unittest.TestCase):
+
+    def test_posts_link_to_mirrored_assets(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            scraper = FixtureScraper(
+                ['https://example.substack.com/p/oak'], 'https://example.substack.com',
+                os.path.join(temp_dir, 'md'), os.path.join(temp_dir, 'html'),
+                requests_per_second=0, mirror_assets=True,
+                session=FakeSession({OAK_URL: FakeResponse(content=b'oak', headers=JPEG)}),
+            )
+            scraper.scrape_posts()
+
+            with open(os.path.join(temp_dir, 'md', 'example', 'oak.md'), encoding='utf-8') as f:
+                md = f.read()
+            with open(os.path.join(temp_dir, 'html', 'example', 'oak.html'), encoding='utf-8') as f:
+                html = f.read()
+            # The same relative link resolves from the markdown and from the HTML file
+            links = set(re.findall(r'\((assets/media/[^)]+)\)', md))
+            self.assertEqual(len(links), 1)
+            link = links.pop()
+            for post_dir in (os.path.join(temp_dir, 'md', 'example'), os.path.join(temp_dir, 'html', 'example')):
+                self.assertTrue(os.path.isfile(os.path.join(post_dir, link)), post_dir)
+
+        self.assertIn(f'src="{link}"', html)
+        self.assertNotIn(OAK_URL, md + html)
+        self.assertNotIn('oak-full.jpeg', md + html)
+
+    def test_media_is_linked_from_both_outputs(self):
+        video_url = 'https://substack-post-media.s3.amazonaws.com/public/videos/walk.mp4'
+        audio_url = 'https://substack-post-media.s3.amazonaws.com/public/audio/reading.mp3'
+        html = POST_HTML.replace('<h2 class="header-anchor-post">', (
+            f'<video controls><source src="{video_url}" type="video/mp4"></video>'
+            f'<audio controls src="{audio_url}"></audio><h2 class="header-anchor-post">'
+        ), 1)
+        session = FakeSession({
+            OAK_URL: FakeResponse(content=b'oak', headers=JPEG),
+            video_url: FakeResponse(content=b'walk', headers={'Content-Type': 'video/mp4'}),
+            audio_url: FakeResponse(content=b'reading', headers={'Content-Type': 'audio/mpeg'}),
+        })
+        for html_render in ('markdown', 'direct'):
+            with self.subTest(html_render=html_render), mock.patch('test_scrape.POST_HTML', html):
+                sink = MemorySink()
+                scraper = FixtureScraper(
+                    ['https://example.substack.com/p/walk'], 'https://example.substack.com', 'md', 'html',
+                    requests_per_second=0, mirror_assets=True, session=session, sink=sink, html_render=html_render,
+                )
+                scraper.scrape_posts()
+
+                md = sink.files[os.path.join('md', 'example', 'walk.md')].decode('utf-8')
+                html_output = sink.files[os.path.join('html', 'example', 'walk.html')].decode('utf-8')
+                for name, extension in (('Video', '.mp4'), ('Audio', '.mp3')):
+                    link = re.search(rf'\[{name}\]\((assets/media/[0-9a-f]+\{extension})\)', md).group(1)
+                    self.assertIn(os.path.join('md', 'example', link), sink.files)
+                    self.assertIn(f'"{link}"', html_output)
+                self.assertNotIn(video_url, md + html_output)
+                self.assertNotIn(audio_url, md + html_output)
+                if html_render == 'direct':
+                    self.assertIn('<video controls="">', html_output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT_DIR)
+
+from build_bundle import build_bundle
+
+# Runs in a fresh interpreter with only the bundle ahead of the standard library, so nothing
+# resolves to an installed boto3 or the untrimmed lambda/ tree
+CHECK_BUNDLE = '''
+import sys
+bundle = sys.argv[1]
+sys.path.insert(0, bundle)
+
+import boto3
+import botocore
+import botocore.session
+from botocore.exceptions import UnknownServiceError
+from botocore.stub import Stubber
+
+assert botocore.__file__.startswith(bundle), botocore.__file__
+loader = botocore.session.get_session().get_component('data_loader')
+assert all(path.startswith(bundle) for path in loader.search_paths if 'botocore' in path), loader.search_paths
+print('services', ','.join(sorted(botocore.session.get_session().get_available_services())))
+
+from s3_utils import BucketIndex, create_s3_client, create_transfer_config
+
+s3 = create_s3_client(max_pool_connections=4)
+assert s3.meta.region_name == 'us-east-1'
+with Stubber(s3) as stubber:
+    stubber.add_response(
+        'list_objects_v2',
+        {'Contents': [{'Key': 'a.md', 'Size': 1, 'ETag': '"x"'}], 'IsTruncated': True, 'NextContinuationToken': 't'},
+        {'Bucket': 'bucket', 'Prefix': ''},
+    )
+    stubber.add_response(
+        'list_objects_v2',
+        {'Contents': [{'Key': 'b.md', 'Size': 2, 'ETag': '"y"'}], 'IsTruncated': False},
+        {'Bucket': 'bucket', 'Prefix': '', 'ContinuationToken': 't'},
+    )
+    index = BucketIndex.build(s3, 'bucket')
+assert index.keys('.md') == ['a.md', 'b.md'], index.keys('.md')
+
+from s3transfer.manager import TransferManager
+TransferManager(s3, create_transfer_config(4)).shutdown()
+boto3.resource('s3').Bucket('bucket')
+
+try:
+    boto3.client('cloudfront')
+    print('cloudfront', 'yes')
+except UnknownServiceError:
+    print('cloudfront', 'no')
+
+import lambda_function, static_upload_lambda
+print('ok')
+'''
+
+
+class TestBundle(unittest.TestCase):
+
+    def check_bundle(self, bundle):
+        env = dict(os.environ, AWS_DEFAULT_REGION='us-east-1', AWS_ACCESS_KEY_ID='test', AWS_SECRET_ACCESS_KEY='test')
+        env.pop('PYTHONPATH', None)
+        result = subprocess.run(
+            [sys.executable, '-I', '-c', CHECK_BUNDLE, bundle],
+            cwd=bundle, env=env, capture_output=True, text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return dict(line.split(' ', 1) for line in result.stdout.splitlines() if ' ' in line), result.stdout
+
+    def test_handlers_work_from_trimmed_bundle(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            bundle = build_bundle(dest=os.path.join(temp_dir, 'lambda'))
+
+            self.assertEqual(sorted(os.listdir(os.path.join(bundle, 'botocore', 'data', 's3'))), ['2006-03-01'])
+            self.assertFalse(os.path.exists(os.path.join(bundle, 'botocore', 'data', 's3', '2006-03-01', 'examples-1.json')))
+            with open(os.path.join(bundle, 'requirements.txt'), encoding='utf-8') as f:
+                self.assertNotIn('boto3', f.read())
+
+            results, stdout = self.check_bundle(bundle)
+
+        self.assertEqual(results['services'], 's3')
+        self.assertEqual(results['cloudfront'], 'no')
+        self.assertTrue(stdout.endswith('ok\n'))
+
+    def test_cloudfront_can_be_kept(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            bundle = build_bundle(dest=os.path.join(temp_dir, 'lambda'), services=('s3', 'cloudfront'))
+            results, _ = self.check_bundle(bundle)
+
+        self.assertEqual(results['services'], 'cloudfront,s3')
+        self.assertEqual(results['cloudfront'], 'yes')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import os
+import subprocess
+import sys
+
+LAMBDA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+HANDLERS = ('lambda_function', 'static_upload_lambda')
+# Cumulative import time allowed per handler module; everything heavy is imported inside the handler
+IMPORT_BUDGET_MS = float(os.environ.get('HANDLER_IMPORT_BUDGET_MS', '150'))
+# Packages a handler must not load at import time
+HEAVY_PACKAGES = ('boto3', 'botocore', 's3transfer', 'bs4', 'soupsieve', 'html2text', 'markdown', 'requests', 'tqdm')
+
+
+def profile_import(module):
+    """Import module in a fresh interpreter with -X importtime and return {module name: cumulative microseconds}"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=LAMBDA_DIR, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestHandlerImportTime(unittest.TestCase):
+
+    def test_handlers_import_within_budget(self):
+        for handler in HANDLERS:
+            with self.subTest(handler=handler):
+                # The first import may compile bytecode, so only the second, warm-disk one is measured
+                profile_import(handler)
+                times = profile_import(handler)
+
+                heavy = sorted({name.split('.')[0] for name in times} & set(HEAVY_PACKAGES))
+                self.assertEqual(heavy, [], f'{handler} imports heavy modules at import time')
+                self.assertLess(
+                    times[handler] / 1000, IMPORT_BUDGET_MS,
+                    f'{handler} took {times[handler] / 1000:.1f} ms to import',
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import unittest
+import json
+import os
+import sys
+import threading
+import time
+
+# Add the lambda directory to the python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lambda')))
+sys.path.append(os.path.dirname(__file__))
+
+from fake_s3 import FakeS3
+from essay_index import (
+    extract_metadata_from_content,
+    index_entry_from_scrape,
+    load_index,
+    merge_index,
+    read_all_metadata,
+    read_markdown_head,
+    rebuild_index,
+)
+
+
+def make_markdown(title, date, likes=3, subtitle=''):
+    md = f"# {title}\n\n"
+    if subtitle:
+        md += f"## {subtitle}\n\n"
+    md += f"**{date}**\n\n**Likes:** {likes}\n\nBody of {title}.\n"
+    return md
+
+
+class TestExtractMetadata(unittest.TestCase):
+
+    def test_extracts_header_fields(self):
+        metadata = extract_metadata_from_content(make_markdown('Trees', 'May 10, 2025', likes=42), 'trees.md')
+        self.assertEqual(metadata, {'title': 'Trees', 'subtitle': '', 'like_count': '42', 'date': 'May 10, 2025'})
+
+    def test_falls_back_to_filename(self):
+        metadata = extract_metadata_from_content('no headings here', 'friends-and-trees.md')
+        self.assertEqual(metadata['title'], 'Friends And Trees')
+        self.assertEqual(metadata['date'], 'Date not found')
+
+
+class TestReadMarkdownHead(unittest.TestCase):
+
+    def test_head_gives_same_metadata_as_full_file(self):
+        body = '\n\n'.join(f'Paragraph {i} ' + 'words ' * 300 for i in range(200))
+        documents = {
+            'plain.md': make_markdown('Plain', 'May 10, 2025', likes=7) + body,
+            'subtitle.md': make_markdown('Sub', 'Apr 02, 2024', subtitle='A subtitle') + '### Section\n' + body,
+            'short.md': '# Only a title\n',
+            'no-header.md': body,
+            'empty.md': '',
+        }
+        s3 = FakeS3(documents)
+        for key, content in documents.items():
+            with self.subTest(key=key):
+                head = read_markdown_head(s3, 'bucket', key, head_bytes=512)
+                self.assertEqual(
+                    extract_metadata_from_content(head, key), extract_metadata_from_content(content, key)
+                )
+                self.assertTrue(content.startswith(head))
+        self.assertLess(len(read_markdown_head(s3, 'bucket', 'plain.md')), len(documents['plain.md']) // 10)
+
+    def test_range_widens_only_when_header_is_long(self):
+        long_title = 'T' * 3000
+        body = 'A short paragraph.\n\n' * 5000
+        s3 = FakeS3({
+            'small.md': make_markdown('Small', 'May 10, 2025') + body,
+            'long.md': make_markdown(long_title, 'May 10, 2025') + body,
+        })
+        read_markdown_head(s3, 'bucket', 'small.md', head_bytes=1024)
+        self.assertEqual(s3.count('get_object'), 1)
+
+        s3.calls = []
+        head = read_markdown_head(s3, 'bucket', 'long.md', head_bytes=1024)
+        self.assertEqual(extract_metadata_from_content(head, 'long.md')['title'], long_title)
+        # Ranges of 1K, 2K and 4K cover the 3K title line and the rest of the header
+        self.assertEqual(s3.count('get_object'), 3)
+
+
+class TestIncrementalIndex(unittest.TestCase):
+
+    def test_merge_adds_replaces_and_sorts(self):
+        existing = [
+            {'title': 'Older', 'subtitle': '', 'like_count': '1', 'date': 'Jan 01, 2025', 'file_link': 'older.md'},
+            {'title': 'Edited', 'subtitle': '', 'like_count': '1', 'date': 'Feb 01, 2025', 'file_link': 'edited.md'},
+        ]
+        new = [
+            {'title': 'Edited', 'subtitle': 'now', 'like_count': '5', 'date': 'Feb 01, 2025', 'file_link': 'edited.md'},
+            {'title': 'Newest', 'subtitle': '', 'like_count': '0', 'date': 'Mar 01, 2025', 'file_link': 'newest.md'},
+            {'title': 'older', 'subtitle': '', 'like_count': '0', 'date': 'Mar 02, 2025', 'file_link': 'older-copy.md'},
+        ]
+        merged = merge_index(existing, new)
+
+        self.assertEqual([essay['file_link'] for essay in merged], ['newest.md', 'edited.md', 'older.md'])
+        self.assertEqual(merged[1]['like_count'], '5')
+
+    def test_index_entry_from_scrape_uses_top_level_keys(self):
+        essay = {
+            'title': 'Trees', 'subtitle': '', 'like_count': '4', 'date': 'May 10, 2025',
+            'file_link': 'posts/heathermedwards/trees.md', 'html_link': 'posts/heathermedwards/trees.html',
+        }
+        self.assertEqual(index_entry_from_scrape(essay)['file_link'], 'trees.md')
+        self.assertEqual(index_entry_from_scrape(essay)['html_link'], 'trees.html')
+        self.assertNotIn('html_link', index_entry_from_scrape(essay, include_html_link=False))
+
+    def test_load_index_rejects_missing_or_corrupt_files(self):
+        s3 = FakeS3()
+        self.assertIsNone(load_index(s3, 'bucket'))
+
+        s3.put_object(Bucket='bucket', Key='essays-data.json', Body='{not json')
+        self.assertIsNone(load_index(s3, 'bucket'))
+
+        s3.put_object(Bucket='bucket', Key='essays-data.json', Body=json.dumps([{'title': 'A'}]))
+        self.assertIsNone(load_index(s3, 'bucket'))
+
+        s3.put_object(Bucket='bucket', Key='essays-data.json', Body=json.dumps([{'title': 'A', 'file_link': 'a.md'}]))
+        self.assertEqual(load_index(s3, 'bucket'), [{'title': 'A', 'file_link': 'a.md'}])
+
+
+class TestRebuildIndex(unittest.TestCase):
+
+    def test_rebuild_reads_every_file_and_dedupes(self):
+        s3 = FakeS3({
+            'a.md': make_markdown('Alpha', 'Jan 01, 2025'),
+            'b.md': make_markdown('Beta', 'Feb 01, 2025'),
+            'b-copy.md': make_markdown('beta', 'Feb 01, 2025'),
+            'test-post.md': make_markdown('Draft', 'Mar 01, 2025'),
+        })
+        essays = rebuild_index(s3, 'bucket', ['a.md', 'b.md', 'b-copy.md', 'test-post.md', 'missing.md'])
+
+        self.assertEqual([essay['file_link'] for essay in essays], ['b.md', 'a.md', 'missing.md'])
+        self.assertEqual(essays[0]['html_link'], 'b.html')
+        self.assertEqual(essays[2]['date'], 'Date not found')
+
+
+    def test_parallel_reads_keep_listing_order(self):
+        keys = [f'post-{i}.md' for i in range(8)]
+        s3 = SlowFakeS3({key: make_markdown(f'Post {i}', 'Jan 01, 2025') for i, key in enumerate(keys)})
+        s3.delays = {key: 0.02 * (len(keys) - i) for i, key in enumerate(keys)}
+        s3.failing = {'post-3.md'}
+
+        results = read_all_metadata(s3, 'bucket', keys, max_workers=8)
+
+        self.assertEqual([key for key, _, _ in results], keys)
+        self.assertIsInstance(results[3][2], RuntimeError)
+        self.assertEqual(results[4][1]['title'], 'Post 4')
+        self.assertGreater(s3.max_in_flight, 1)
+
+
+class SlowFakeS3(FakeS3):
+    """FakeS3 with per-key GET latency and failures, tracking concurrent GETs"""
+
+    delays = {}
+    failing = set()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get_object(self, Bucket, Key, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delays.get(Key, 0))
+            if Key in self.failing:
+                raise RuntimeError('GET failed')
+            return super().get_object(Bucket, Key, **kwargs)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+import unittest
+import json
+import os
+import sys
+from concurrent.futures import Future
+from unittest import mock
+
+# Add the lambda directory to the python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lambda')))
+
+sys.path.append(os.path.dirname(__file__))
+
+import lambda_function
+import static_upload_lambda
+from essay_index import ESSAYS_DATA_KEY, FILE_LIST_KEY
+from fake_s3 import FakeS3
+from s3_utils import BucketIndex, read_json_object
+from scrape import MANIFEST_KEY
+from scrape_job import scrape_new_articles
+from test_scrape import POST_HTML, FakeResponse, FakeSession
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SUBSTACK_URL = 'https://example.substack.com/'
+FEED = (
+    b'<rss><channel>'
+    b'<item><link>https://example.substack.com/p/first</link><pubDate>Sat, 10 May 2025 12:00:00 GMT</pubDate></item>'
+    b'<item><link>https://example.substack.com/p/second</link><pubDate>Sun, 11 May 2025 12:00:00 GMT</pubDate></item>'
+    b'<item><link>https://example.substack.com/p/test-drive</link><pubDate>Mon, 12 May 2025 12:00:00 GMT</pubDate></item>'
+    b'</channel></rss>'
+)
+OLD_MD = '# Old Essay\n\n**May 1, 2025**\n\n**Likes:** 3\n\nWords.\n'
+
+
+class FakeTransferManager:
+    """Runs each upload straight away on the fake client, in place of s3transfer's TransferManager"""
+
+    def __init__(self, client, config=None):
+        self.client = client
+
+    def upload(self, fileobj, bucket, key, extra_args=None):
+        if isinstance(fileobj, str):
+            with open(fileobj, 'rb') as f:
+                body = f.read()
+        else:
+            body = fileobj.read()
+        self.client.put_object(Bucket=bucket, Key=key, Body=body, **(extra_args or {}))
+        future = Future()
+        future.set_result(None)
+        return future
+
+    def shutdown(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+def make_session():
+    def post(title):
+        return FakeResponse(content=POST_HTML.replace('Friends and Trees and Fascism', title).encode('utf-8'))
+    return FakeSession({
+        f'{SUBSTACK_URL}feed.xml': FakeResponse(content=FEED),
+        f'{SUBSTACK_URL}p/first': post('First Post'),
+        f'{SUBSTACK_URL}p/second': post('Second Post'),
+        f'{SUBSTACK_URL}p/test-drive': post('Test Drive'),
+    })
+
+
+def titles(essays):
+    return sorted(essay['title'] for essay in essays)
+
+
+class HandlerTestCase(unittest.TestCase):
+    """Runs the handlers against a FakeS3 bucket and a fake Substack, with nothing mocked in between"""
+
+    def setUp(self):
+        self.s3 = FakeS3({'old.md': OLD_MD})
+        self.session = make_session()
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(REPO_DIR)  # static_upload_lambda reads static_stie/ from the working directory
+        patches = [
+            mock.patch.dict(os.environ, {'BUCKET_NAME': 'bucket', 'SUBSTACK_URL': SUBSTACK_URL, 'NUM_POSTS_TO_SCRAPE': '10'}),
+            mock.patch('s3transfer.manager.TransferManager', FakeTransferManager),
+            mock.patch('scrape.get_shared_session', return_value=self.session),
+            mock.patch.object(lambda_function, 'get_s3_client', return_value=self.s3),
+            mock.patch.object(static_upload_lambda, 'get_s3_client', return_value=self.s3),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        os.environ.pop('PAGE_CACHE_PREFIX', None)
+
+    def read(self, key):
+        return read_json_object(self.s3, 'bucket', key)
+
+    def post_requests(self):
+        return [url for url, _ in self.session.calls if '/p/' in url]
+
+
+class TestLambdaHandler(HandlerTestCase):
+
+    def test_first_run_rebuilds_the_index(self):
+        response = lambda_function.lambda_handler({}, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        essays = self.read(ESSAYS_DATA_KEY)
+        self.assertEqual(titles(essays), ['First Post', 'Old Essay', 'Second Post'])
+        self.assertEqual(essays[-1]['title'], 'Old Essay')
+        self.assertEqual(self.read(FILE_LIST_KEY), ['first.md', 'old.md', 'second.md'])
+        self.assertEqual({essay['html_link'] for essay in essays}, {'first.html', 'old.html', 'second.html'})
+        self.assertIn('second.html', self.s3.objects)
+        self.assertNotIn('test-drive.md', self.s3.objects)
+
+    def test_new_posts_are_merged_into_the_existing_index(self):
+        existing = [{'title': 'Old Essay (indexed)', 'subtitle': '', 'like_count': '3', 'date': 'May 1, 2025',
+                     'file_link': 'old.md', 'html_link': 'old.html'}]
+        self.s3.put_object(Bucket='bucket', Key=ESSAYS_DATA_KEY, Body=json.dumps(existing))
+
+        lambda_function.lambda_handler({}, None)
+
+        # Merging keeps the indexed entry as it was, without reading old.md again
+        self.assertEqual(titles(self.read(ESSAYS_DATA_KEY)), ['First Post', 'Old Essay (indexed)', 'Second Post'])
+        self.assertNotIn(('get_object', 'old.md'), self.s3.calls)
+        self.assertEqual(self.read(FILE_LIST_KEY), ['first.md', 'old.md', 'second.md'])
+
+    def test_rebuild_reads_every_markdown_file(self):
+        existing = [{'title': 'Stale', 'subtitle': '', 'like_count': '0', 'date': 'May 1, 2025', 'file_link': 'old.md'}]
+        self.s3.put_object(Bucket='bucket', Key=ESSAYS_DATA_KEY, Body=json.dumps(existing))
+
+        lambda_function.lambda_handler({'rebuild_index': True}, None)
+
+        self.assertEqual(titles(self.read(ESSAYS_DATA_KEY)), ['First Post', 'Old Essay', 'Second Post'])
+
+    def test_manifest_is_saved_and_reloaded(self):
+        lambda_function.lambda_handler({}, None)
+        manifest = self.read(MANIFEST_KEY)
+        self.assertEqual(
+            {url: entry['status'] for url, entry in manifest['posts'].items()},
+            {f'{SUBSTACK_URL}p/first': 'saved', f'{SUBSTACK_URL}p/second': 'saved', f'{SUBSTACK_URL}p/test-drive': 'test'},
+        )
+        self.assertEqual(len(self.post_requests()), 3)
+
+        self.session.calls.clear()
+        self.s3.calls.clear()
+        response = lambda_function.lambda_handler({}, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(self.post_requests(), [])
+        # Nothing new was found, so the manifest is not written again
+        self.assertNotIn(('put_object', MANIFEST_KEY), self.s3.calls)
+        self.assertEqual(len(self.read(ESSAYS_DATA_KEY)), 3)
+
+    def test_index_only_run_skips_scraping(self):
+        lambda_function.lambda_handler({'index_only': True}, None)
+
+        self.assertEqual(self.session.calls, [])
+        self.assertEqual(self.read(FILE_LIST_KEY), ['old.md'])
+        self.assertNotIn(MANIFEST_KEY, self.s3.objects)
+
+    def test_accept_upload(self):
+        self.assertTrue(lambda_function.accept_upload('first.html'))
+        self.assertFalse(lambda_function.accept_upload('test-drive.md'))
+        self.assertFalse(static_upload_lambda.accept_upload('first.html'))
+        self.assertFalse(static_upload_lambda.accept_upload('test-drive.md'))
+        self.assertTrue(static_upload_lambda.accept_upload('first.md'))
+
+
+class TestStaticUploadHandler(HandlerTestCase):
+
+    def test_uploads_markdown_index_and_site(self):
+        response = static_upload_lambda.lambda_handler({}, None)
+
+        self.assertEqual(response['statusCode'], 200)
+        # The site only links to markdown, so the scraper's HTML files are filtered out by accept_upload
+        self.assertIn('first.md', self.s3.objects)
+        self.assertNotIn('first.html', self.s3.objects)
+        self.assertEqual(self.read(FILE_LIST_KEY), ['first.md', 'old.md', 'second.md'])
+        essays = self.read(ESSAYS_DATA_KEY)
+        self.assertEqual(titles(essays), ['First Post', 'Old Essay', 'Second Post'])
+        self.assertNotIn('html_link', essays[0])
+        self.assertIn('index.html', self.s3.objects)
+        self.assertIn('style.css', self.s3.objects)
+
+
+class TestScrapeNewArticles(HandlerTestCase):
+
+    def test_posts_missing_from_the_bucket_are_scraped_again(self):
+        bucket_index = BucketIndex.build(self.s3, 'bucket')
+        scrape_new_articles(self.s3, 'bucket', bucket_index, SUBSTACK_URL, 10)
+        del self.s3.objects['first.md']
+        self.session.calls.clear()
+
+        essays, uploaded = scrape_new_articles(
+            self.s3, 'bucket', BucketIndex.build(self.s3, 'bucket'), SUBSTACK_URL, 10,
+            accept=lambda key: key.endswith('.md'),
+        )
+
+        self.assertEqual(self.post_requests(), [f'{SUBSTACK_URL}p/first'])
+        self.assertEqual([essay['title'] for essay in essays], ['First Post'])
+        self.assertEqual(uploaded, ['first.md'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+
+# Add the lambda directory to the python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lambda')))
+
+sys.path.append(os.path.dirname(__file__))
+
+from fake_s3 import FakeS3
+from page_cache import LocalPageCache, S3PageCache
+from scrape import SubstackScraper
+from test_assets import OAK_URL
+from test_scrape import POST_HTML, FakeResponse, FakeSession
+
+FEED = (
+    b'<rss><channel>'
+    b'<item><link>https://example.substack.com/p/first</link></item>'
+    b'<item><link>https://example.substack.com/p/second</link></item>'
+    b'</channel></rss>'
+)
+
+
+class OfflineSession:
+    """Fails the test on any request"""
+
+    def get(self, url, **kwargs):
+        raise AssertionError(f'Unexpected request to {url}')
+
+
+class TestPageCache(unittest.TestCase):
+
+    def test_pages_are_stored_once_and_survive_a_reload(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = LocalPageCache(temp_dir, codec='gzip')
+            sha = cache.put('https://example.substack.com/p/a', b'<html>v1</html>', fetched_at='2025-05-10T00:00:00+00:00')
+            cache.put('https://example.substack.com/p/a', b'<html>v1</html>')
+            cache.put('https://example.substack.com/p/b', b'<html>v1</html>', fetched_at='2025-05-11T00:00:00+00:00')
+            cache.put('https://example.substack.com/p/a', b'<html>v2</html>', fetched_at='2025-05-12T00:00:00+00:00')
+            cache.flush()
+
+            self.assertEqual(len(os.listdir(os.path.join(temp_dir, 'pages'))), 2)
+            self.assertTrue(os.path.exists(os.path.join(temp_dir, 'pages', f'{sha}.html.gz')))
+
+            reloaded = LocalPageCache(temp_dir)
+            self.assertEqual(len(reloaded.index['https://example.substack.com/p/a']), 2)
+            self.assertEqual(reloaded.get('https://example.substack.com/p/a'), b'<html>v2</html>')
+            self.assertEqual(reloaded.get('https://example.substack.com/p/b'), b'<html>v1</html>')
+            self.assertIsNone(reloaded.get('https://example.substack.com/p/c'))
+            self.assertEqual(reloaded.urls(), ['https://example.substack.com/p/a', 'https://example.substack.com/p/b'])
+
+    def test_asset_links_survive_a_reload(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = LocalPageCache(temp_dir)
+            cache.record_assets({'https://cdn.example.com/oak.jpeg': 'assets/media/abc.jpg'})
+            cache.flush()
+            cache.record_assets({'https://cdn.example.com/oak.jpeg': 'assets/media/abc.jpg'})
+            self.assertFalse(cache.changed)
+
+            reloaded = LocalPageCache(temp_dir)
+            self.assertEqual(
+                reloaded.asset_links(['https://cdn.example.com/oak.jpeg', 'https://cdn.example.com/elm.jpeg']),
+                {'https://cdn.example.com/oak.jpeg': 'assets/media/abc.jpg'},
+            )
+
+    def test_s3_cache_uses_the_prefix(self):
+        s3 = FakeS3()
+        cache = S3PageCache(s3, 'bucket', 'page-cache')
+        cache.put('https://example.substack.com/p/a', b'<html></html>')
+        cache.flush()
+
+        self.assertTrue(all(key.startswith('page-cache/') for key in s3.objects))
+        index = json.loads(s3.objects['page-cache/index.json']['Body'])
+        self.assertEqual(list(index['pages']), ['https://example.substack.com/p/a'])
+        self.assertEqual(S3PageCache(s3, 'bucket', 'page-cache/').get('https://example.substack.com/p/a'), b'<html></html>')
+
+
+class TestReplay(unittest.TestCase):
+
+    def test_replay_reprocesses_cached_pages_without_network(self):
+        session = FakeSession({
+            'https://example.substack.com/feed.xml': FakeResponse(content=FEED),
+            'https://example.substack.com/p/first': FakeResponse(content=POST_HTML.encode('utf-8')),
+            'https://example.substack.com/p/second': FakeResponse(
+                content=POST_HTML.replace('Friends and Trees and Fascism', 'Second Post').encode('utf-8')
+            ),
+        })
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = LocalPageCache(os.path.join(temp_dir, 'cache'))
+            scraper = SubstackScraper(
+                'https://example.substack.com', os.path.join(temp_dir, 'live'), os.path.join(temp_dir, 'live'),
+                requests_per_second=0, session=session, page_cache=cache,
+            )
+            scraper.scrape_posts()
+            cache.flush()
+
+            replayed = SubstackScraper(
+                'https://example.substack.com', os.path.join(temp_dir, 'replay'), os.path.join(temp_dir, 'replay'),
+                requests_per_second=0, session=OfflineSession(), page_cache=LocalPageCache(os.path.join(temp_dir, 'cache')),
+                replay=True,
+            )
+            replayed.scrape_posts()
+
+        self.assertEqual(replayed.failed_urls, [])
+        self.assertEqual(
+            sorted(essay['title'] for essay in replayed.essays_data),
+            sorted(essay['title'] for essay in scraper.essays_data),
+        )
+
+    def test_replay_overwrites_existing_outputs(self):
+        session = FakeSession({
+            'https://example.substack.com/feed.xml': FakeResponse(content=FEED),
+            'https://example.substack.com/p/first': FakeResponse(content=POST_HTML.encode('utf-8')),
+            'https://example.substack.com/p/second': FakeResponse(content=POST_HTML.encode('utf-8')),
+        })
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = LocalPageCache(os.path.join(temp_dir, 'cache'))
+            output_dir = os.path.join(temp_dir, 'out')
+            SubstackScraper(
+                'https://example.substack.com', output_dir, output_dir,
+                requests_per_second=0, session=session, page_cache=cache,
+            ).scrape_posts()
+            cache.flush()
+            md_filepath = os.path.join(output_dir, 'example', 'first.md')
+            html_filepath = os.path.join(output_dir, 'example', 'first.html')
+            for filepath in (md_filepath, html_filepath):
+                with open(filepath, 'w', encoding='utf-8') as file:
+                    file.write('stale')
+
+            replayed = SubstackScraper(
+                'https://example.substack.com', output_dir, output_dir,
+                requests_per_second=0, session=OfflineSession(), page_cache=LocalPageCache(os.path.join(temp_dir, 'cache')),
+                replay=True,
+            )
+            replayed.scrape_posts()
+
+            self.assertEqual(replayed.failed_urls, [])
+            self.assertEqual(len(replayed.essays_data), 2)
+            for filepath in (md_filepath, html_filepath):
+                with open(filepath, encoding='utf-8') as file:
+                    self.assertIn('Friends and Trees and Fascism', file.read())
+
+    def test_replay_keeps_mirrored_asset_links(self):
+        session = FakeSession({
+            'https://example.substack.com/feed.xml': FakeResponse(content=FEED),
+            'https://example.substack.com/p/first': FakeResponse(content=POST_HTML.encode('utf-8')),
+            'https://example.substack.com/p/second': FakeResponse(content=POST_HTML.encode('utf-8')),
+            OAK_URL: FakeResponse(content=b'oak', headers={'Content-Type': 'image/jpeg'}),
+        })
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = LocalPageCache(os.path.join(temp_dir, 'cache'))
+            output_dir = os.path.join(temp_dir, 'out')
+            SubstackScraper(
+                'https://example.substack.com', output_dir, output_dir,
+                requests_per_second=0, session=session, page_cache=cache, mirror_assets=True,
+            ).scrape_posts()
+            cache.flush()
+            md_filepath = os.path.join(output_dir, 'example', 'first.md')
+            with open(md_filepath, encoding='utf-8') as file:
+                mirrored = file.read()
+
+            SubstackScraper(
+                'https://example.substack.com', output_dir, output_dir,
+                requests_per_second=0, session=OfflineSession(), page_cache=LocalPageCache(os.path.join(temp_dir, 'cache')),
+                replay=True, mirror_assets=True,
+            ).scrape_posts()
+            with open(md_filepath, encoding='utf-8') as file:
+                replayed = file.read()
+
+        self.assertIn('](assets/media/', mirrored)
+        self.assertEqual(replayed, mirrored)
+
+    def test_replay_needs_a_cache(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with self.assertRaises(ValueError):
+                SubstackScraper(
+                    'https://example.substack.com', temp_dir, temp_dir, session=OfflineSession(), replay=True
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import gzip
+import json
+import os
+import sys
+
+# Add the lambda directory to the python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lambda')))
+
+sys.path.append(os.path.dirname(__file__))
+
+from fake_s3 import FakeS3
+from publish import (
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+    Publisher,
+    cache_control,
+    resolve_encoding,
+)
+from s3_utils import plan_sync, read_json_object
+from sinks import S3Sink
+from unittest import mock
+
+ESSAYS = [{'title': f'Essay {i}', 'date': 'May 10, 2025', 'file_link': f'essay-{i}.md'} for i in range(40)]
+
+
+class TestPublisher(unittest.TestCase):
+
+    def test_cache_control_by_key(self):
+        self.assertEqual(cache_control('assets/media/3f9a2c1b.png'), IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(cache_control('assets/app.3f9a2c1b9d.js'), IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(cache_control('fonts/serif-8f3e2a91c4.woff2'), IMMUTABLE_CACHE_CONTROL)
+        # Post slugs ending in a date look like hashes, but articles are rewritten when re-scraped
+        keys = (
+            'index.html', 'essays-data.json', 'style.css', 'assets/populate-essays.js', 'post.md',
+            'weekly-notes-20240115.md', 'weekly-notes-20240115.html', 'report-deadbeef.html',
+        )
+        for key in keys:
+            with self.subTest(key=key):
+                self.assertEqual(cache_control(key), REVALIDATE_CACHE_CONTROL)
+
+    def test_text_is_precompressed_deterministically(self):
+        publisher = Publisher('gzip')
+        body = json.dumps(ESSAYS, indent=2).encode('utf-8')
+        published, extra_args = publisher.prepare('essays-data.json', body, {'ContentType': 'application/json'})
+
+        self.assertEqual(extra_args, {
+            'ContentType': 'application/json',
+            'CacheControl': REVALIDATE_CACHE_CONTROL,
+            'ContentEncoding': 'gzip',
+        })
+        self.assertEqual(gzip.decompress(published), body)
+        self.assertEqual(publisher.prepare('essays-data.json', body)[0], published)
+        self.assertEqual(publisher.report(), 2 * (len(body) - len(published)))
+
+    def test_what_is_left_uncompressed(self):
+        publisher = Publisher('gzip')
+        article = ('# Essay\n\n' + 'Some words. ' * 200).encode('utf-8')
+        cases = [
+            ('post.md', article, None),  # Read back with ranged GETs
+            ('assets/media/abc.png', b'\x89PNG' * 500, {'ContentType': 'image/png'}),
+            ('tiny.css', b'body {}', None),
+        ]
+        for key, body, extra_args in cases:
+            with self.subTest(key=key):
+                published, args = publisher.prepare(key, body, extra_args)
+                self.assertIs(published, body)
+                self.assertNotIn('ContentEncoding', args)
+        self.assertEqual(publisher.prepare('post.md', article)[1]['ContentType'], 'text/markdown')
+        # Headers already chosen by the caller, e.g. assets.asset_upload_args, are kept
+        self.assertEqual(
+            publisher.prepare('assets/media/abc.png', b'x', {'CacheControl': 'no-store'})[1]['CacheControl'], 'no-store'
+        )
+
+    def test_encodings(self):
+        self.assertIsNone(Publisher('none').encoding)
+        with mock.patch.dict(sys.modules, {'brotli': None}):
+            self.assertEqual(resolve_encoding('br'), 'gzip')
+        with self.assertRaises(ValueError):
+            resolve_encoding('zstd')
+
+    def test_precompressed_json_reads_back(self):
+        s3 = FakeS3()
+        Publisher('gzip').put_object(s3, 'bucket', 'essays-data.json', json.dumps(ESSAYS), 'application/json')
+
+        self.assertEqual(s3.objects['essays-data.json']['ContentEncoding'], 'gzip')
+        self.assertEqual(read_json_object(s3, 'bucket', 'essays-data.json'), ESSAYS)
+
+    def test_sync_compares_published_bytes(self):
+        publisher = Publisher('gzip')
+        body, extra_args = publisher.prepare('index.html', ('<p>Home</p>' * 100).encode('utf-8'), {'ContentType': 'text/html'})
+        s3 = FakeS3()
+        s3.put_object(Bucket='bucket', Key='index.html', Body=body, **extra_args)
+
+        changed, unchanged, _ = plan_sync([(body, 'index.html', extra_args)], {'index.html': s3.objects['index.html']}, {})
+        self.assertEqual((changed, unchanged), ([], ['index.html']))
+
+    def test_sink_publishes_through_prepare(self):
+        prepare = mock.Mock(side_effect=Publisher('gzip').prepare)
+        sink = S3Sink(FakeS3(), 'bucket', prepare=prepare)
+        with mock.patch.object(sink, '_manager', mock.Mock()) as manager:
+            sink.write('html/example/post.html', ('<p>Words</p>' * 100).encode('utf-8'))
+
+        self.assertEqual(prepare.call_args[0][0], 'post.html')
+        self.assertEqual(manager.upload.call_args[0][2], 'post.html')
+        self.assertEqual(manager.upload.call_args[1]['extra_args']['ContentEncoding'], 'gzip')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+from unittest import mock
+
+# Add the lambda directory to the python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lambda')))
+
+sys.path.append(os.path.dirname(__file__))
+
+import reprocess
+from page_cache import LocalPageCache
+from reprocess import Reprocessor
+from test_assets import OAK_URL
+from test_scrape import POST_HTML
+
+
+class TestReprocess(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.root = self.temp_dir.name
+        self.cache = LocalPageCache(os.path.join(self.root, 'cache'))
+        self.cache.put('https://example.substack.com/p/first', POST_HTML.encode('utf-8'))
+        self.cache.put(
+            'https://example.substack.com/p/second',
+            POST_HTML.replace('Friends and Trees and Fascism', 'Second Post').encode('utf-8'),
+        )
+        self.cache.put('https://example.substack.com/p/test-post', POST_HTML.encode('utf-8'))
+
+    def reprocessor(self, **kwargs):
+        return Reprocessor(
+            'https://example.substack.com', os.path.join(self.root, 'md'), os.path.join(self.root, 'html'),
+            max_workers=2, state_file=os.path.join(self.root, 'state.json'), **kwargs
+        )
+
+    def test_rewrites_only_stale_outputs(self):
+        stats = self.reprocessor().from_cache(self.cache)
+        self.assertEqual((stats['converted'], stats['skipped'], stats['failed']), (2, 1, 0))
+        with open(os.path.join(self.root, 'md', 'example', 'second.md'), encoding='utf-8') as f:
+            self.assertTrue(f.read().startswith('# Second Post'))
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'html', 'example', 'first.html')))
+
+        # Nothing changed: nothing is converted
+        self.assertEqual(self.reprocessor().from_cache(self.cache)['unchanged'], 3)
+
+        # A new fetch of one post only rewrites that post
+        self.cache.put(
+            'https://example.substack.com/p/first',
+            POST_HTML.replace('Friends and Trees and Fascism', 'Edited Title').encode('utf-8'),
+        )
+        stats = self.reprocessor().from_cache(self.cache)
+        self.assertEqual((stats['converted'], stats['unchanged']), (1, 2))
+
+        # A converter version bump rewrites everything
+        with mock.patch.object(reprocess, 'CONVERTER_VERSION', reprocess.CONVERTER_VERSION + 1):
+            self.assertEqual(self.reprocessor().from_cache(self.cache)['converted'], 2)
+
+        with open(os.path.join(self.root, 'state.json'), encoding='utf-8') as f:
+            self.assertEqual(len(json.load(f)), 3)
+
+    def test_keeps_mirrored_asset_links(self):
+        self.cache.record_assets({OAK_URL: 'assets/media/abc.jpg'})
+
+        self.reprocessor().from_cache(self.cache)
+
+        for filepath in (os.path.join('md', 'example', 'first.md'), os.path.join('html', 'example', 'first.html')):
+            with open(os.path.join(self.root, filepath), encoding='utf-8') as f:
+                content = f.read()
+            self.assertIn('assets/media/abc.jpg', content)
+            self.assertNotIn(OAK_URL, content)
+
+    def test_rebuilds_html_from_markdown(self):
+        md_dir = os.path.join(self.root, 'existing', 'example')
+        os.makedirs(md_dir)
+        with open(os.path.join(md_dir, 'post.md'), 'w', encoding='utf-8') as f:
+            f.write('# Post\n\n**May 10, 2025**\n\nBody text\n')
+
+        stats = self.reprocessor().from_markdown(os.path.join(self.root, 'existing'))
+
+        self.assertEqual(stats['converted'], 1)
+        with open(os.path.join(self.root, 'html', 'example', 'post.html'), encoding='utf-8') as f:
+            self.assertIn('<h1>Post</h1>', f.read())
+        self.assertEqual(self.reprocessor().from_markdown(os.path.join(self.root, 'existing'))['unchanged'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+
+# Add the lambda directory to the python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lambda')))
+
+sys.path.append(os.path.dirname(__file__))
+
+import boto3
+from botocore.stub import ANY, Stubber
+from fake_s3 import FakeS3
+from s3_utils import BucketIndex, plan_sync, sync_files, upload_files
+
+
+def make_client():
+    return boto3.client(
+        's3', region_name='us-east-1', aws_access_key_id='testing', aws_secret_access_key='testing'
+    )
+
+
+class TestUploadFiles(unittest.TestCase):
+
+    def test_uploads_in_bulk_and_reports_failures(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            uploads = []
+            for i in range(5):
+                path = os.path.join(temp_dir, f'post-{i}.md')
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(f'# Post {i}\n')
+                uploads.append((path, f'post-{i}.md', {'ContentType': 'text/markdown'}))
+            uploads.append((os.path.join(temp_dir, 'missing.md'), 'missing.md', None))
+
+            client = make_client()
+            with Stubber(client) as stubber:
+                for _ in range(5):
+                    stubber.add_response(
+                        'put_object', {'ETag': '"etag"'},
+                        {'Bucket': 'bucket', 'Key': ANY, 'Body': ANY, 'ContentType': 'text/markdown'},
+                    )
+                uploaded, failed = upload_files(client, 'bucket', uploads)
+
+        self.assertEqual(sorted(uploaded), [f'post-{i}.md' for i in range(5)])
+        self.assertEqual(list(failed), ['missing.md'])
+
+    def test_nothing_to_upload(self):
+        self.assertEqual(upload_files(make_client(), 'bucket', []), ([], {}))
+
+
+class TestBucketIndex(unittest.TestCase):
+
+    def test_builds_from_one_paginated_listing(self):
+        s3 = FakeS3({f'post-{i}.md': '# Post' for i in range(7)}, page_size=3)
+        s3.put_object(Bucket='bucket', Key='assets/css/style.css', Body='body {}')
+
+        index = BucketIndex.build(s3, 'bucket')
+
+        self.assertEqual(s3.count('list_objects_v2'), 3)
+        self.assertEqual(index.counts(), {'objects': 8, 'md_files': 7, 'pages': 3})
+        self.assertEqual(index.keys('.md'), [f'post-{i}.md' for i in range(7)])
+        self.assertIn('assets/css/style.css', index)
+        self.assertEqual(index.get('post-0.md')['Size'], len('# Post'))
+
+        index.add('post-7.md')
+        index.remove('post-0.md')
+        self.assertEqual(index.keys('.md'), [f'post-{i}.md' for i in range(1, 8)])
+
+    def test_delimiter_collects_common_prefixes(self):
+        s3 = FakeS3({'a.md': '# A', 'assets/js/app.js': 'x', 'assets/css/style.css': 'y'})
+        index = BucketIndex.build(s3, 'bucket', delimiter='/')
+        self.assertEqual(index.keys(), ['a.md'])
+        self.assertEqual(index.common_prefixes, ['assets/'])
+
+
+class TestStaticSync(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_plan_uses_etag_without_manifest_and_hash_with_one(self):
+        uploads = [
+            (self.write('index.html', '<h1>Home</h1>'), 'index.html', {'ContentType': 'text/html'}),
+            (self.write('style.css', 'body {}'), 'style.css', {'ContentType': 'text/css'}),
+            (self.write('new.js', 'let a;'), 'assets/new.js', {'ContentType': 'application/javascript'}),
+        ]
+        s3 = FakeS3({'index.html': '<h1>Home</h1>', 'style.css': 'body { color: red }'})
+        remote = BucketIndex.build(s3, 'bucket').objects
+
+        changed, unchanged, entries = plan_sync(uploads, remote, {})
+        self.assertEqual(unchanged, ['index.html'])
+        self.assertEqual([key for _, key, _ in changed], ['style.css', 'assets/new.js'])
+
+        # With a manifest entry, a different content type counts as a change even if the ETag matches
+        previous = {'index.html': dict(entries['index.html'], extra_args={'ContentType': 'text/plain'})}
+        changed, unchanged, _ = plan_sync(uploads[:1], remote, previous)
+        self.assertEqual((len(changed), unchanged), (1, []))
+
+    def test_quiet_sync_is_a_no_op_and_deletes_only_tracked_stale_files(self):
+        uploads = [(self.write('index.html', '<h1>Home</h1>'), 'index.html', None)]
+        s3 = FakeS3({'index.html': '<h1>Home</h1>', 'old.js': 'x', 'article.md': '# Article'})
+        previous_manifest = {
+            'index.html': {'sha256': plan_sync(uploads, {}, {})[2]['index.html']['sha256'], 'extra_args': {}},
+            'old.js': {'sha256': 'abc', 'extra_args': {}},
+        }
+        s3.put_object(Bucket='bucket', Key='static-manifest.json', Body=json.dumps(previous_manifest))
+        s3.calls = []
+
+        bucket_index = BucketIndex.build(s3, 'bucket')
+        result = sync_files(s3, 'bucket', uploads, 'static-manifest.json', bucket_index, delete_stale=True)
+
+        self.assertEqual(result['uploaded'], [])
+        self.assertEqual(result['unchanged'], ['index.html'])
+        self.assertEqual(result['deleted'], ['old.js'])
+        self.assertIn('article.md', s3.objects)
+        self.assertEqual(json.loads(s3.objects['static-manifest.json']['Body']), {
+            'index.html': previous_manifest['index.html'],
+        })
+        self.assertEqual(s3.count('list_objects_v2'), 1)
+        self.assertNotIn('old.js', bucket_index)
+
+
+if __name__ == '__main__':
+    unittest.main()
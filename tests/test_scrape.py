@@ -0,0 +1,765 @@
+import unittest
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import timezone
+
+# Add the lambda directory to the python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lambda')))
+
+import requests
+from bs4 import BeautifulSoup
+from scrape import (
+    BaseSubstackScraper,
+    HostRateLimiter,
+    ARCHIVE_PAGE_SIZE,
+    DEFAULT_SELECTOR_PROFILE,
+    ScrapeManifest,
+    SelectorProfile,
+    SubstackScraper,
+    create_session,
+    display_date,
+    extract_structured_metadata,
+    get_markdown_converter,
+    get_shared_session,
+    normalize_pub_date,
+    parse_post_page,
+    resolve_parser,
+    sanitize_content,
+)
+from sinks import MemorySink
+from unittest import mock
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+with open(os.path.join(FIXTURES_DIR, 'substack_post.html'), encoding='utf-8') as f:
+    POST_HTML = f.read()
+
+
+class FixtureScraper(BaseSubstackScraper):
+    """Scraper that serves every post from the saved fixture instead of the network"""
+
+    def __init__(self, urls, *args, delays=None, **kwargs):
+        self.fixture_urls = urls
+        self.delays = delays or {}
+        self.fetched = []
+        super().__init__(*args, **kwargs)
+
+    def iter_feed_urls(self):
+        self.discovered = []
+        for url in self.fixture_urls:
+            self.discovered.append(url)
+            yield url
+
+    def get_url_soup(self, url):
+        time.sleep(self.delays.get(url, 0))
+        self.fetched.append(url)
+        if url.endswith('premium'):
+            return None
+        html = POST_HTML.replace('Friends and Trees and Fascism', url.split('/')[-1])
+        return BeautifulSoup(html, 'html.parser')
+
+
+class TestScrapePosts(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.md_dir = os.path.join(self.temp_dir.name, 'md')
+        self.html_dir = os.path.join(self.temp_dir.name, 'html')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def make_scraper(self, urls, **kwargs):
+        return FixtureScraper(
+            urls, 'https://example.substack.com', self.md_dir, self.html_dir, requests_per_second=0, **kwargs
+        )
+
+    def test_results_keep_feed_order(self):
+        urls = [f'https://example.substack.com/p/post-{i}' for i in range(6)]
+        # Earlier posts finish last, so completion order is the reverse of feed order
+        delays = {url: 0.05 * (len(urls) - i) for i, url in enumerate(urls)}
+        scraper = self.make_scraper(urls, max_workers=6, delays=delays)
+        scraper.scrape_posts()
+
+        self.assertEqual([essay['title'] for essay in scraper.essays_data], [f'post-{i}' for i in range(6)])
+        self.assertEqual(
+            set(scraper.essays_data[0]),
+            {'title', 'subtitle', 'like_count', 'date', 'published', 'file_link', 'html_link'},
+        )
+        self.assertEqual(scraper.essays_data[0]['file_link'], 'posts/example/post-0.md')
+        self.assertTrue(os.path.exists(os.path.join(self.md_dir, 'example', 'post-5.md')))
+        self.assertTrue(os.path.exists(os.path.join(self.html_dir, 'example', 'post-5.html')))
+
+    def test_post_limit_skips_premium_and_test_posts(self):
+        urls = [
+            'https://example.substack.com/p/premium',
+            'https://example.substack.com/p/first',
+            'https://example.substack.com/p/test-post',
+            'https://example.substack.com/p/second',
+            'https://example.substack.com/p/third',
+        ]
+        scraper = self.make_scraper(urls, max_workers=2)
+        scraper.scrape_posts(num_posts_to_scrape=3)
+
+        # Premium posts do not count towards the limit, test posts do
+        self.assertEqual([essay['title'] for essay in scraper.essays_data], ['first', 'second'])
+        self.assertFalse(os.path.exists(os.path.join(self.md_dir, 'example', 'third.md')))
+
+    def test_later_posts_are_fetched_while_earlier_ones_render(self):
+        urls = [f'https://example.substack.com/p/post-{i}' for i in range(3)]
+        scraper = self.make_scraper(urls, max_workers=1)
+        events = []
+        fetched_during_first_render = []
+        render_post = scraper.render_post
+
+        def slow_render(title, *args):
+            events.append(('render', title, threading.current_thread().name.split('_')[0]))
+            time.sleep(0.1)
+            if title == 'post-0':
+                fetched_during_first_render.extend(scraper.fetched)
+            return render_post(title, *args)
+
+        with mock.patch('scrape.CONVERT_WORKERS', 1), mock.patch.object(scraper, 'render_post', slow_render):
+            scraper.scrape_posts()
+
+        self.assertEqual([essay['title'] for essay in scraper.essays_data], ['post-0', 'post-1', 'post-2'])
+        self.assertEqual({thread for _, _, thread in events}, {'convert'})
+        # One fetch worker got through every page while the single convert worker was on the first post
+        self.assertEqual(fetched_during_first_render, urls)
+        self.assertEqual(set(scraper.stage_seconds), {'fetch', 'convert', 'save'})
+        self.assertGreater(scraper.stage_seconds['convert'], 0.25)
+
+    def test_convert_errors_fail_only_their_post(self):
+        urls = [f'https://example.substack.com/p/post-{i}' for i in range(3)]
+        scraper = self.make_scraper(urls, max_workers=2)
+        render_post = scraper.render_post
+
+        def render(title, *args):
+            if title == 'post-1':
+                raise ValueError('bad markup')
+            return render_post(title, *args)
+
+        with mock.patch.object(scraper, 'render_post', render):
+            scraper.scrape_posts()
+
+        self.assertEqual([essay['title'] for essay in scraper.essays_data], ['post-0', 'post-2'])
+        self.assertEqual(scraper.failed_urls, [urls[1]])
+
+
+class FakeResponse:
+
+    def __init__(self, status_code=200, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.ok = status_code < 400
+        self.bytes_read = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            chunk = self.content[start:start + chunk_size]
+            self.bytes_read += len(chunk)
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f'HTTP {self.status_code}')
+
+
+class FakeSession:
+    """Stands in for requests.Session and records every GET"""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append((url, kwargs))
+        response = self.responses[url]
+        return response(**kwargs) if callable(response) else response
+
+
+class TestSession(unittest.TestCase):
+
+    def test_session_pool_and_retry_configuration(self):
+        session = create_session(pool_size=12, max_retries=3)
+        adapter = session.get_adapter('https://example.substack.com/p/a')
+        self.assertEqual(adapter._pool_maxsize, 12)
+        self.assertEqual(adapter.max_retries.total, 3)
+        self.assertIn(429, adapter.max_retries.status_forcelist)
+        self.assertTrue(adapter.max_retries.respect_retry_after_header)
+        self.assertGreater(adapter.max_retries.backoff_jitter, 0)
+
+    def test_shared_session_is_reused(self):
+        self.assertIs(get_shared_session(3), get_shared_session(3))
+
+    def test_scraper_requests_go_through_its_session(self):
+        feed = (
+            b'<rss><channel><item><link>https://example.substack.com/p/a</link></item></channel></rss>'
+        )
+        session = FakeSession({
+            'https://example.substack.com/feed.xml': FakeResponse(content=feed),
+            'https://example.substack.com/p/a': FakeResponse(status_code=503),
+        })
+        with tempfile.TemporaryDirectory() as temp_dir:
+            scraper = SubstackScraper(
+                'https://example.substack.com', temp_dir, temp_dir, requests_per_second=0, session=session
+            )
+            scraper.scrape_posts()
+
+        self.assertEqual(scraper.post_urls, ['https://example.substack.com/p/a'])
+        self.assertTrue(all('timeout' in kwargs for _, kwargs in session.calls))
+        # Posts that still fail after retries are reported instead of silently dropped
+        self.assertEqual(scraper.failed_urls, ['https://example.substack.com/p/a'])
+
+
+FEED = (
+    b'<rss><channel>'
+    b'<item><link>https://example.substack.com/p/new-post</link><pubDate>Tue, 13 May 2025 10:00:00 GMT</pubDate></item>'
+    b'<item><link>https://example.substack.com/p/old-post</link><pubDate>Sat, 10 May 2025 12:00:00 GMT</pubDate></item>'
+    b'<item><link>https://example.substack.com/p/edited-post</link><pubDate>Fri, 09 May 2025 12:00:00 GMT</pubDate></item>'
+    b'</channel></rss>'
+)
+
+
+class TestScrapeManifest(unittest.TestCase):
+
+    def test_unknown_manifest_data_gives_empty_manifest(self):
+        self.assertEqual(ScrapeManifest.from_dict(None).entries, {})
+        self.assertEqual(ScrapeManifest.from_dict({'version': 99, 'posts': {'a': {}}}).entries, {})
+
+    def test_conditional_headers(self):
+        manifest = ScrapeManifest()
+        manifest.record('https://example.substack.com/p/a', etag='"abc"', last_modified='Sat, 10 May 2025 12:00:00 GMT')
+        self.assertEqual(manifest.conditional_headers('https://example.substack.com/p/a'), {
+            'If-None-Match': '"abc"',
+            'If-Modified-Since': 'Sat, 10 May 2025 12:00:00 GMT',
+        })
+        self.assertEqual(manifest.conditional_headers('https://example.substack.com/p/b'), {})
+
+    def test_saved_files_excludes_skipped_posts(self):
+        manifest = ScrapeManifest()
+        manifest.record('https://example.substack.com/p/a', status='saved', md_filename='a.md')
+        manifest.record('https://example.substack.com/p/a', status='unchanged')
+        manifest.record('https://example.substack.com/p/test', status='test', md_filename='test.md')
+        manifest.record('https://example.substack.com/p/paid', status='premium')
+        self.assertEqual(manifest.saved_files(), ['a.md'])
+
+    def test_recording_the_same_values_leaves_the_manifest_unchanged(self):
+        manifest = ScrapeManifest.from_dict({'version': 1, 'posts': {
+            'https://example.substack.com/p/a': {
+                'status': 'saved', 'pub_date': '2025-05-10T12:00:00+00:00', 'checked_at': '2025-05-10T13:00:00+00:00',
+            },
+        }})
+        manifest.record('https://example.substack.com/p/a', status=None, pub_date='2025-05-10T12:00:00+00:00')
+        self.assertFalse(manifest.changed)
+        self.assertEqual(manifest.get('https://example.substack.com/p/a')['checked_at'], '2025-05-10T13:00:00+00:00')
+
+        manifest.record('https://example.substack.com/p/a', etag='"v2"')
+        self.assertTrue(manifest.changed)
+        self.assertNotEqual(manifest.get('https://example.substack.com/p/a')['checked_at'], '2025-05-10T13:00:00+00:00')
+
+    def test_unchanged_posts_are_not_fetched(self):
+        manifest = ScrapeManifest.from_dict({'version': 1, 'posts': {
+            'https://example.substack.com/p/old-post': {
+                'status': 'saved', 'pub_date': '2025-05-10T12:00:00+00:00', 'md_filename': 'old-post.md',
+            },
+            'https://example.substack.com/p/edited-post': {
+                'status': 'saved', 'pub_date': '2025-05-08T12:00:00+00:00', 'etag': '"v1"',
+                'md_filename': 'edited-post.md',
+            },
+        }})
+        session = FakeSession({
+            'https://example.substack.com/feed.xml': FakeResponse(content=FEED),
+            'https://example.substack.com/p/new-post': FakeResponse(
+                content=POST_HTML.encode('utf-8'), headers={'ETag': '"new"'}
+            ),
+            'https://example.substack.com/p/edited-post': FakeResponse(status_code=304),
+        })
+        with tempfile.TemporaryDirectory() as temp_dir:
+            scraper = SubstackScraper(
+                'https://example.substack.com', temp_dir, temp_dir,
+                requests_per_second=0, session=session, manifest=manifest,
+            )
+            scraper.scrape_posts()
+
+        fetched = [url for url, _ in session.calls]
+        self.assertNotIn('https://example.substack.com/p/old-post', fetched)
+        self.assertEqual(len(scraper.essays_data), 1)
+        edited_call = dict(session.calls)['https://example.substack.com/p/edited-post']
+        self.assertEqual(edited_call['headers'], {'If-None-Match': '"v1"'})
+
+        new_entry = manifest.get('https://example.substack.com/p/new-post')
+        self.assertEqual(new_entry['status'], 'saved')
+        self.assertEqual(new_entry['etag'], '"new"')
+        self.assertEqual(new_entry['pub_date'], '2025-05-13T10:00:00+00:00')
+        self.assertEqual(len(new_entry['content_hash']), 64)
+        self.assertEqual(
+            manifest.get('https://example.substack.com/p/edited-post')['pub_date'], '2025-05-09T12:00:00+00:00'
+        )
+
+        manifest.forget_files(['new-post.md'])
+        self.assertIsNone(manifest.get('https://example.substack.com/p/new-post'))
+
+
+class TestArchiveDiscovery(unittest.TestCase):
+
+    def make_archive(self, total, audience=None):
+        posts = [
+            {
+                'canonical_url': f'https://example.substack.com/p/post-{i}',
+                'post_date': f'2025-01-01T00:00:{i % 60:02d}.000Z',
+                'audience': (audience or {}).get(i, 'everyone'),
+            }
+            for i in range(total)
+        ]
+
+        def archive(params, **kwargs):
+            page = posts[params['offset']:params['offset'] + params['limit']]
+            return FakeResponse(content=json.dumps(page).encode('utf-8'))
+        return archive
+
+    def make_scraper(self, session, manifest=None):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        return SubstackScraper(
+            'https://example.substack.com', self.temp_dir.name, self.temp_dir.name,
+            requests_per_second=0, session=session, manifest=manifest, discovery='archive',
+        )
+
+    def test_archive_lists_full_history(self):
+        total = ARCHIVE_PAGE_SIZE * 2 + 5
+        session = FakeSession({
+            'https://example.substack.com/api/v1/archive': self.make_archive(total, audience={3: 'only_paid'}),
+        })
+        scraper = self.make_scraper(session)
+
+        self.assertEqual(len(scraper.post_urls), total - 1)
+        self.assertEqual(scraper.post_urls[0], 'https://example.substack.com/p/post-0')
+        self.assertNotIn('https://example.substack.com/p/post-3', scraper.post_urls)
+        self.assertEqual(scraper.pub_dates[scraper.post_urls[0]], '2025-01-01T00:00:00+00:00')
+
+    def test_archive_stops_at_known_post_once_complete(self):
+        manifest = ScrapeManifest({'https://example.substack.com/p/post-2': {'status': 'saved'}}, archive_complete=True)
+        session = FakeSession({
+            'https://example.substack.com/api/v1/archive': self.make_archive(ARCHIVE_PAGE_SIZE * 3),
+        })
+        scraper = self.make_scraper(session, manifest)
+
+        self.assertEqual(scraper.post_urls, [
+            'https://example.substack.com/p/post-0',
+            'https://example.substack.com/p/post-1',
+        ])
+
+    def scrape_all(self, scraper):
+        # Every post counts as unchanged, so only discovery and the manifest bookkeeping run
+        with mock.patch.object(scraper, 'fetch_post', return_value={'status': 'unchanged'}):
+            scraper.scrape_posts()
+        return scraper.manifest
+
+    def test_full_archive_read_marks_archive_complete(self):
+        session = FakeSession({
+            'https://example.substack.com/api/v1/archive': self.make_archive(ARCHIVE_PAGE_SIZE + 5),
+        })
+        self.assertTrue(self.scrape_all(self.make_scraper(session)).archive_complete)
+
+    def test_failed_archive_page_does_not_mark_archive_complete(self):
+        archive = self.make_archive(ARCHIVE_PAGE_SIZE * 3)
+
+        def flaky_archive(params, **kwargs):
+            if params['offset'] == ARCHIVE_PAGE_SIZE:
+                return FakeResponse(status_code=503)
+            return archive(params, **kwargs)
+
+        session = FakeSession({'https://example.substack.com/api/v1/archive': flaky_archive})
+        scraper = self.make_scraper(session)
+        manifest = self.scrape_all(scraper)
+
+        self.assertEqual(len(scraper.post_urls), ARCHIVE_PAGE_SIZE)
+        self.assertFalse(scraper.archive_exhausted)
+        self.assertFalse(manifest.archive_complete)
+
+    def test_page_cap_does_not_mark_archive_complete(self):
+        session = FakeSession({
+            'https://example.substack.com/api/v1/archive': self.make_archive(ARCHIVE_PAGE_SIZE * 3),
+        })
+        with mock.patch('scrape.ARCHIVE_MAX_PAGES', 2):
+            scraper = self.make_scraper(session)
+            manifest = self.scrape_all(scraper)
+
+        self.assertEqual(len(scraper.post_urls), ARCHIVE_PAGE_SIZE * 2)
+        self.assertFalse(manifest.archive_complete)
+
+    def test_sitemap_fallback(self):
+        sitemap = (
+            b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            b'<url><loc>https://example.substack.com/p/first</loc><lastmod>2025-05-10</lastmod></url>'
+            b'<url><loc>https://example.substack.com/about</loc></url>'
+            b'</urlset>'
+        )
+        session = FakeSession({
+            'https://example.substack.com/api/v1/archive': FakeResponse(status_code=404),
+            'https://example.substack.com/sitemap.xml': FakeResponse(content=sitemap),
+        })
+        scraper = self.make_scraper(session)
+
+        self.assertEqual(scraper.post_urls, ['https://example.substack.com/p/first'])
+        self.assertFalse(self.scrape_all(scraper).archive_complete)
+
+    def test_archive_early_stop_does_not_fall_back(self):
+        manifest = ScrapeManifest({'https://example.substack.com/p/post-0': {'status': 'saved'}}, archive_complete=True)
+        session = FakeSession({
+            'https://example.substack.com/api/v1/archive': self.make_archive(ARCHIVE_PAGE_SIZE),
+        })
+        scraper = self.make_scraper(session, manifest)
+
+        # Nothing is new, which must not be mistaken for a broken archive API
+        self.assertEqual(scraper.post_urls, [])
+        self.assertTrue(scraper.reached_known_post)
+
+    def test_nested_sitemaps_are_streamed(self):
+        index = (
+            b'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            b'<sitemap><loc>https://example.substack.com/sitemap-posts.xml</loc></sitemap>'
+            b'</sitemapindex>'
+        )
+        posts = (
+            b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            + b''.join(
+                b'<url><loc>https://example.substack.com/p/post-%d</loc><lastmod>2025-05-10</lastmod></url>' % i
+                for i in range(20)
+            )
+            + b'</urlset>'
+        )
+        responses = {
+            'https://example.substack.com/sitemap.xml': FakeResponse(content=index),
+            'https://example.substack.com/sitemap-posts.xml': FakeResponse(content=posts),
+        }
+        session = FakeSession(dict(responses, **{
+            'https://example.substack.com/api/v1/archive': FakeResponse(status_code=404),
+        }))
+        with mock.patch('scrape.FEED_CHUNK_SIZE', 7):
+            scraper = self.make_scraper(session)
+            urls = scraper.post_urls
+
+        self.assertEqual(urls, [f'https://example.substack.com/p/post-{i}' for i in range(20)])
+        self.assertEqual(scraper.pub_dates[urls[-1]], '2025-05-10T00:00:00+00:00')
+        self.assertTrue(all(response.closed for response in responses.values()))
+
+    def test_normalize_pub_date(self):
+        self.assertEqual(normalize_pub_date('Sat, 10 May 2025 12:00:00 GMT'), '2025-05-10T12:00:00+00:00')
+        self.assertEqual(normalize_pub_date('2025-05-10T12:00:00.000Z'), '2025-05-10T12:00:00+00:00')
+        self.assertIsNone(normalize_pub_date(None))
+
+
+def make_feed(links):
+    items = b''.join(
+        b'<item><title>Post</title><link>%s</link><pubDate>Sat, 10 May 2025 12:00:00 GMT</pubDate></item>'
+        % link.encode('utf-8')
+        for link in links
+    )
+    return b'<?xml version="1.0"?><rss version="2.0"><channel><title>Example</title>%s</channel></rss>' % items
+
+
+class TestFeedDiscovery(unittest.TestCase):
+
+    def make_scraper(self, feed, manifest=None, **kwargs):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        session = FakeSession({'https://example.substack.com/feed.xml': feed})
+        return SubstackScraper(
+            'https://example.substack.com', self.temp_dir.name, self.temp_dir.name,
+            requests_per_second=0, session=session, manifest=manifest, discovery='feed', **kwargs,
+        )
+
+    def test_feed_is_parsed_in_small_chunks(self):
+        links = ['https://example.substack.com/p/first', 'https://example.substack.com/about',
+                 'https://example.substack.com/p/second']
+        feed = FakeResponse(content=make_feed(links))
+        with mock.patch('scrape.FEED_CHUNK_SIZE', 5):
+            scraper = self.make_scraper(feed)
+            urls = scraper.post_urls
+
+        self.assertEqual(urls, ['https://example.substack.com/p/first', 'https://example.substack.com/p/second'])
+        self.assertEqual(scraper.pub_dates[urls[0]], '2025-05-10T12:00:00+00:00')
+        self.assertEqual(feed.bytes_read, len(feed.content))
+        self.assertTrue(feed.closed)
+        self.assertTrue(scraper.discovery_finished)
+
+    def test_feed_stops_at_known_post_once_complete(self):
+        links = [f'https://example.substack.com/p/post-{i}' for i in range(20)]
+        manifest = ScrapeManifest({links[2]: {'status': 'saved'}}, archive_complete=True)
+        feed = FakeResponse(content=make_feed(links))
+        with mock.patch('scrape.FEED_CHUNK_SIZE', 64):
+            scraper = self.make_scraper(feed, manifest)
+            urls = scraper.post_urls
+
+        self.assertEqual(urls, links[:2])
+        # The rest of the feed is never downloaded
+        self.assertLess(feed.bytes_read, len(feed.content) / 2)
+        self.assertTrue(feed.closed)
+
+    def test_malformed_feed_keeps_urls_read_so_far(self):
+        content = make_feed(['https://example.substack.com/p/first']).replace(b'</channel>', b'<item><link>')
+        scraper = self.make_scraper(FakeResponse(content=content))
+
+        self.assertEqual(scraper.post_urls, ['https://example.substack.com/p/first'])
+
+    def test_posts_are_fetched_while_discovery_runs(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        urls = [f'https://example.substack.com/p/post-{i}' for i in range(10)]
+        scraper = FixtureScraper(urls, 'https://example.substack.com', temp_dir.name, temp_dir.name,
+                                 max_workers=1, requests_per_second=0)
+        # Constructing the scraper does not start discovery
+        self.assertFalse(hasattr(scraper, 'discovered'))
+
+        scraper.scrape_posts(num_posts_to_scrape=2)
+
+        self.assertEqual([essay['title'] for essay in scraper.essays_data], ['post-0', 'post-1'])
+        # Discovery only ran as far as the worker window needed
+        self.assertLess(len(scraper.discovered), len(urls))
+
+
+class TestPartialParse(unittest.TestCase):
+
+    def setUp(self):
+        self.scraper = FixtureScraper(
+            [], 'https://example.substack.com', 'md', 'html', requests_per_second=0, sink=MemorySink()
+        )
+
+    def test_partial_parse_extracts_the_same_post(self):
+        partial = parse_post_page(POST_HTML.encode('utf-8'))
+        full = BeautifulSoup(POST_HTML, 'html.parser')
+
+        self.assertEqual(self.scraper.extract_post_data(partial), self.scraper.extract_post_data(full))
+        self.assertIsNone(partial.find('div', class_='nav-title'))
+        self.assertIsNotNone(partial.find('script', type='application/ld+json'))
+        self.assertNotIn('window._preloads', str(partial))
+        self.assertIsNotNone(partial.select_one('div.available-content img'))
+
+    def test_paywall_marker_is_kept(self):
+        html = POST_HTML.replace(
+            '<div class="available-content">',
+            '<h2 class="paywall-title">This post is for paid subscribers</h2><div class="available-content">',
+        )
+        self.assertIsNotNone(parse_post_page(html.encode('utf-8')).find('h2', class_='paywall-title'))
+
+    def test_unexpected_layout_falls_back_to_full_parse(self):
+        html = '<html><body><article><h1 class="headline">Title</h1><p>Body</p></article></body></html>'
+        soup = parse_post_page(html.encode('utf-8'))
+        self.assertEqual(soup.find('p').text, 'Body')
+
+
+class TestStructuredMetadata(unittest.TestCase):
+
+    def setUp(self):
+        self.scraper = FixtureScraper(
+            [], 'https://example.substack.com', 'md', 'html', requests_per_second=0, sink=MemorySink()
+        )
+
+    def test_reads_ld_json_and_meta_tags_from_the_head(self):
+        self.assertEqual(extract_structured_metadata(BeautifulSoup(POST_HTML, 'html.parser')), {
+            'title': 'Friends and Trees and Fascism',
+            'published': '2025-05-10T12:00:00+00:00',
+        })
+        body_ld_json = POST_HTML.replace('</body>', '<script type="application/ld+json">{"headline": "Related"}</script></body>')
+        body_ld_json = re.sub(r'<head>.*</head>', '<head></head>', body_ld_json, flags=re.DOTALL)
+        self.assertEqual(extract_structured_metadata(BeautifulSoup(body_ld_json, 'html.parser')), {})
+
+    def test_structured_data_wins_over_markup(self):
+        html = (POST_HTML
+                .replace('"headline":"Friends and Trees and Fascism"', '"headline":"From ld+json"')
+                .replace('"datePublished":"2025-05-10T12:00:00+00:00"', '"datePublished":"2025-06-03T23:00:00-04:00"'))
+        for soup in (BeautifulSoup(html, 'html.parser'), parse_post_page(html.encode('utf-8'))):
+            with self.subTest(partial=soup.head is None):
+                title, _, _, date, published, _ = self.scraper.extract_post_fields(soup)
+                self.assertEqual(title, 'From ld+json')
+                self.assertEqual(published, '2025-06-04T03:00:00+00:00')
+                # Formatted from the timestamp, not read from the rendered date div ("May 10, 2025")
+                self.assertEqual(date, 'Jun 3, 2025')
+
+    def test_display_date_without_date_markup(self):
+        html = re.sub(r'<div class="[^"]*pencraft[^"]*">May 10, 2025</div>', '', POST_HTML)
+        html = html.replace('"datePublished":"2025-05-10T12:00:00+00:00"', '"datePublished":"2025-06-04T01:30:00Z"')
+        self.assertNotIn('May 10, 2025</div>', html)
+        date = self.scraper.extract_post_fields(BeautifulSoup(html, 'html.parser'))[3]
+        # Not zero-padded, and on the publication's day rather than the UTC one
+        self.assertEqual(date, 'Jun 3, 2025')
+        self.assertEqual(display_date('2025-06-04T01:30:00Z', timezone.utc), 'Jun 4, 2025')
+        self.assertIsNone(display_date('yesterday'))
+
+    def test_falls_back_to_css_without_structured_data(self):
+        html = re.sub(r'<script type="application/ld\+json">.*?</script>|<meta property="[^"]+" content="[^"]+">', '', POST_HTML)
+        fields = self.scraper.extract_post_fields(BeautifulSoup(html, 'html.parser'))
+        self.assertEqual(fields[:5], (
+            'Friends and Trees and Fascism', 'What the old oak taught us about staying put', '42', 'May 10, 2025', None,
+        ))
+
+
+class TestSelectorProfile(unittest.TestCase):
+
+    def test_profile_file_overrides_selectors(self):
+        html = POST_HTML.replace('<h3 class="subtitle">', '<p class="standfirst">').replace(
+            'staying put</h3>', 'staying put</p>')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'selectors.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'selectors': {'subtitle': 'p.standfirst'}}, f)
+            profile = SelectorProfile.load(path)
+            scraper = FixtureScraper(
+                [], 'https://example.substack.com', temp_dir, temp_dir, requests_per_second=0, selectors=profile
+            )
+
+        self.assertFalse(profile.partial_parse)
+        self.assertEqual(profile.selectors['title'], DEFAULT_SELECTOR_PROFILE.selectors['title'])
+        soup = parse_post_page(html.encode('utf-8'), selectors=profile)
+        self.assertEqual(scraper.extract_post_fields(soup)[1], 'What the old oak taught us about staying put')
+
+    def test_invalid_profiles_are_rejected(self):
+        with self.assertRaises(ValueError):
+            SelectorProfile.from_dict({'version': 2, 'selectors': {}})
+        with self.assertRaises(ValueError):
+            SelectorProfile.from_dict({'version': 1, 'selectors': {'byline': 'div.byline'}})
+        with self.assertRaises(ValueError):
+            SelectorProfile({'title': 'h1[['})
+
+    def test_default_profile_round_trips(self):
+        self.assertIs(SelectorProfile.load(None), DEFAULT_SELECTOR_PROFILE)
+        self.assertEqual(
+            SelectorProfile.from_dict(DEFAULT_SELECTOR_PROFILE.to_dict()).selectors, DEFAULT_SELECTOR_PROFILE.selectors
+        )
+
+
+class TestHtmlRender(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def scrape_fixture(self, html_render):
+        url = 'https://example.substack.com/p/friends-and-trees'
+        scraper = FixtureScraper(
+            [url], 'https://example.substack.com', self.temp_dir.name, self.temp_dir.name,
+            requests_per_second=0, html_render=html_render,
+        )
+        return scraper.process_post(url)
+
+    def test_sanitize_keeps_semantic_html_only(self):
+        soup = BeautifulSoup(
+            '<div class="available-content"><div class="body" data-x="1">'
+            '<p style="color: red" onclick="x()">Hi <a href="javascript:alert(1)">there</a></p>'
+            '<script>track()</script><iframe src="https://youtube.com/embed/x"></iframe>'
+            '<span class="caption"><em>Note</em></span></div></div>', 'html.parser'
+        )
+        self.assertEqual(
+            sanitize_content(soup.select_one('div.available-content')),
+            '<p>Hi <a>there</a></p><em>Note</em>',
+        )
+        self.assertEqual(sanitize_content(None), '')
+
+    def test_direct_render_skips_the_markdown_round_trip(self):
+        with mock.patch.object(BaseSubstackScraper, 'md_to_html', side_effect=AssertionError('round trip')):
+            direct = self.scrape_fixture('direct')
+        converted = self.scrape_fixture('markdown')
+
+        self.assertEqual(direct['md'], converted['md'])
+        # Both renders start with the same header
+        self.assertEqual(direct['html'].split('<p>The oak')[0], converted['html'].split('<p>The oak')[0])
+        self.assertIn('<figcaption>The old oak, 1998</figcaption>', direct['html'])
+        self.assertIn('width="1456"', direct['html'])
+        self.assertNotIn('<script', direct['html'])
+
+    def test_unknown_render_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.scrape_fixture('pdf')
+
+
+class TestConverterReuse(unittest.TestCase):
+
+    def test_converters_are_per_thread_and_reused(self):
+        self.assertIs(get_markdown_converter(), get_markdown_converter())
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(get_markdown_converter()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], get_markdown_converter())
+
+    def test_no_state_leaks_between_documents(self):
+        import html2text
+        import markdown
+        first = 'Claim[^1] and [a link][ref].\n\n[^1]: Source\n\n[ref]: https://example.com/a\n'
+        second = 'Another claim[^1] and [a link][ref].\n\n[^1]: Other source\n'
+        BaseSubstackScraper.md_to_html(first)
+        self.assertEqual(BaseSubstackScraper.md_to_html(second), markdown.markdown(second, extensions=['extra']))
+
+        html = '<p><a href="https://example.com/a">A</a> <em>open'
+        BaseSubstackScraper.html_to_md(html)
+        fresh = html2text.HTML2Text(bodywidth=0)
+        self.assertEqual(BaseSubstackScraper.html_to_md('<p>Plain</p>'), fresh.handle('<p>Plain</p>'))
+
+
+class TestParserSelection(unittest.TestCase):
+
+    def test_auto_picks_the_first_installed_builder(self):
+        installed = {'html.parser'}
+        with mock.patch('scrape.builder_registry.lookup', side_effect=lambda name: object() if name in installed else None):
+            self.assertEqual(resolve_parser('auto'), 'html.parser')
+            installed.add('lxml')
+            self.assertEqual(resolve_parser('auto'), 'lxml')
+
+    def test_missing_builder_falls_back(self):
+        with mock.patch('scrape.builder_registry.lookup', side_effect=lambda name: object() if name == 'html.parser' else None):
+            self.assertEqual(resolve_parser('lxml'), 'html.parser')
+            self.assertEqual(resolve_parser('html5lib'), 'html.parser')
+
+    def test_unknown_parser_is_rejected(self):
+        with self.assertRaises(ValueError):
+            resolve_parser('beautiful')
+
+    def test_scraper_uses_the_resolved_parser(self):
+        scraper = FixtureScraper(
+            [], 'https://example.substack.com', 'md', 'html', requests_per_second=0, parser='html.parser',
+            sink=MemorySink(),
+        )
+        self.assertEqual(scraper.parser, 'html.parser')
+
+
+class TestHostRateLimiter(unittest.TestCase):
+
+    def test_requests_to_same_host_are_spaced(self):
+        limiter = HostRateLimiter(requests_per_second=20)
+        start = time.monotonic()
+        threads = [
+            threading.Thread(target=limiter.wait, args=('https://example.substack.com/p/a',))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_disabled_limiter_does_not_wait(self):
+        limiter = HostRateLimiter(requests_per_second=0)
+        start = time.monotonic()
+        for _ in range(100):
+            limiter.wait('https://example.substack.com/p/a')
+        self.assertLess(time.monotonic() - start, 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add the lambda directory to the python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lambda')))
+
+sys.path.append(os.path.dirname(__file__))
+
+from botocore.stub import ANY, Stubber
+from sinks import LocalSink, MemorySink, S3Sink, output_key
+from test_s3_utils import make_client
+from test_scrape import FixtureScraper
+
+
+class TestSinks(unittest.TestCase):
+
+    def test_output_keys(self):
+        self.assertEqual(output_key(os.path.join('md_files', 'example', 'post.md')), 'post.md')
+        self.assertEqual(
+            output_key(os.path.join('html_files', 'example', 'assets', 'media', 'abc.png')), 'assets/media/abc.png'
+        )
+
+    def test_local_sink_keeps_existing_immutable_files(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sink = LocalSink()
+            path = os.path.join(temp_dir, 'nested', 'abc.png')
+            sink.write(path, b'v1', immutable=True)
+            sink.write(path, b'v2', immutable=True)
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), b'v1')
+            self.assertTrue(sink.exists(path))
+
+    def test_s3_sink_uploads_from_memory(self):
+        client = make_client()
+        sink = S3Sink(
+            client, 'bucket', existing={'assets/media/old.png'}, accept=lambda key: not key.endswith('.html')
+        )
+        with Stubber(client) as stubber:
+            stubber.add_response('put_object', {'ETag': '"a"'}, {'Bucket': 'bucket', 'Key': 'post.md', 'Body': ANY})
+            stubber.add_response(
+                'put_object', {'ETag': '"b"'},
+                {'Bucket': 'bucket', 'Key': 'assets/media/new.png', 'Body': ANY, 'ContentType': 'image/png'},
+            )
+            sink.write('md/example/post.md', b'# Post')
+            sink.write('html/example/post.html', b'<h1>Post</h1>')
+            sink.write('html/example/assets/media/old.png', b'old', immutable=True)
+            sink.write('html/example/assets/media/new.png', b'new', {'ContentType': 'image/png'}, immutable=True)
+            self.assertTrue(sink.exists('md/example/post.md'))
+            uploaded, failed = sink.close()
+
+        self.assertEqual(sorted(uploaded), ['assets/media/new.png', 'post.md'])
+        self.assertEqual(failed, {})
+
+    def test_s3_sink_bounds_pending_uploads(self):
+        client = make_client()
+        lock = threading.Lock()
+        active = []
+        peak = []
+
+        def slow_put(**kwargs):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+
+        client.meta.events.register('before-parameter-build.s3.PutObject', slow_put)
+        sink = S3Sink(client, 'bucket', max_concurrency=8, max_pending=2)
+        with Stubber(client) as stubber:
+            for i in range(6):
+                stubber.add_response('put_object', {'ETag': f'"{i}"'})
+            for i in range(6):
+                sink.write(f'md/example/post-{i}.md', b'# Post')
+            uploaded, failed = sink.close()
+
+        self.assertEqual(len(uploaded), 6)
+        self.assertEqual(failed, {})
+        # A write returns once at most max_pending uploads are left, so one more can be starting
+        self.assertLessEqual(max(peak), 3)
+
+    def test_s3_sink_reports_failures(self):
+        client = make_client()
+        sink = S3Sink(client, 'bucket')
+        with Stubber(client) as stubber:
+            stubber.add_client_error('put_object', 'AccessDenied')
+            sink.write('md/example/post.md', b'# Post')
+            uploaded, failed = sink.close()
+
+        self.assertEqual(uploaded, [])
+        self.assertEqual(list(failed), ['post.md'])
+
+    def test_scraper_writes_through_sink(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            md_dir = os.path.join(temp_dir, 'md')
+            html_dir = os.path.join(temp_dir, 'html')
+            sink = MemorySink()
+            scraper = FixtureScraper(
+                ['https://example.substack.com/p/first'], 'https://example.substack.com', md_dir, html_dir,
+                requests_per_second=0, sink=sink,
+            )
+            scraper.scrape_posts()
+
+            self.assertFalse(os.path.exists(md_dir))
+            self.assertFalse(os.path.exists(html_dir))
+
+        md = sink.files[os.path.join(md_dir, 'example', 'first.md')].decode('utf-8')
+        self.assertTrue(md.startswith('# first'))
+        self.assertIn(os.path.join(html_dir, 'example', 'first.html'), sink.files)
+        self.assertEqual(scraper.essays_data[0]['file_link'], 'posts/example/first.md')
+
+
+if __name__ == '__main__':
+    unittest.main()